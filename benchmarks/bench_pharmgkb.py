@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the PharmGKB matching path (main.py / pharmgkb package)
+
+For each size this script:
+1. Generates a synthetic single-sample VCF (seeded, so runs are reproducible)
+   whose rsIDs are drawn partly from the real clinical_annotations.tsv
+2. Runs a fresh worker process that measures
+   - parse time (pharmgkb.vcf.iter_vcf_rsids)
+   - match time (AnnotationIndex.match, result cache disabled)
+   - end-to-end POST /predict_drugs latency through FastAPI's TestClient
+   - peak RSS of the worker
+3. Writes all results as JSON, optionally comparing against a baseline
+
+Usage:
+    python benchmarks/bench_pharmgkb.py
+    python benchmarks/bench_pharmgkb.py --sizes 100 10000 1000000 --bgzip
+    python benchmarks/bench_pharmgkb.py --output new.json --compare baseline.json
+"""
+
+import argparse
+import gzip
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+DEFAULT_SIZES = [100, 1_000, 10_000, 100_000, 1_000_000, 5_000_000]
+# Timings compared against a baseline; a result slower by more than --tolerance fails
+COMPARED_METRICS = ["parse_s", "match_s", "e2e_s"]
+
+VCF_HEADER = (
+    "##fileformat=VCFv4.2\n"
+    "##source=bench_pharmgkb\n"
+    '##FORMAT=<ID=GT,Number=1,Type=String,Description="Genotype">\n'
+    "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\tSAMPLE\n"
+)
+
+def annotated_rsids(tsv_path: str) -> List[str]:
+    """All rsIDs that appear in the PharmGKB annotations"""
+    from pharmgkb.annotations import split_variant_tokens
+    from pharmgkb.store import read_tsv_columns
+    from pharmgkb.variants import normalize_rsid
+
+    rsids = set()
+    for value in read_tsv_columns(tsv_path)["Variant/Haplotypes"]:
+        for token in split_variant_tokens(value):
+            rsid = normalize_rsid(token)
+            if rsid:
+                rsids.add(rsid)
+    return sorted(rsids)
+
+def generate_vcf(path: str, size: int, known_rsids: List[str], hit_rate: float, seed: int, bgzip: bool) -> None:
+    """Write a VCF with `size` data lines; about hit_rate of them carry an annotated rsID"""
+    rng = random.Random(seed + size)
+    opener = gzip.open if bgzip else open
+    with opener(path, "wt") as f:
+        f.write(VCF_HEADER)
+        batch = []
+        for i in range(size):
+            if rng.random() < hit_rate:
+                rsid = rng.choice(known_rsids)
+            else:
+                # Above the dbSNP range, so it never matches an annotation
+                rsid = f"rs{9_000_000_000 + i}"
+            genotype = rng.choice(("0/1", "1/1", "0|1"))
+            batch.append(f"{1 + i % 22}\t{1000 + i * 10}\t{rsid}\tA\tG\t50\tPASS\t.\tGT\t{genotype}\n")
+            if len(batch) >= 10_000:
+                f.writelines(batch)
+                batch.clear()
+        f.writelines(batch)
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def timed(fn, repeat: int):
+    """Median wall time of `repeat` calls, and the last result"""
+    times = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result
+
+def run_worker(vcf_path: str, size: int, repeat: int, e2e: bool) -> Dict[str, Any]:
+    """Measure one VCF in this (fresh) process"""
+    # Disable the result cache so repeats measure real matching work
+    os.environ["PHARMGKB_RESULT_CACHE_SIZE"] = "0"
+    os.chdir(REPO_ROOT)
+
+    start = time.perf_counter()
+    import main
+    from pharmgkb.vcf import iter_vcf_rsids
+    startup_s = time.perf_counter() - start
+    index = main.annotations.current
+
+    parse_s, rsids = timed(lambda: list(iter_vcf_rsids(vcf_path)), repeat)
+    match_s, predictions = timed(lambda: index.match(rsids), repeat)
+
+    result = {
+        "size": size,
+        "file_bytes": os.path.getsize(vcf_path),
+        "startup_s": startup_s,
+        "annotation_source": index.source,
+        "rsids": len(rsids),
+        "predictions": len(predictions),
+        "parse_s": parse_s,
+        "parse_rows_per_s": size / parse_s if parse_s else None,
+        "match_s": match_s,
+    }
+
+    if e2e:
+        from fastapi.testclient import TestClient
+        client = TestClient(main.app)
+        filename = os.path.basename(vcf_path)
+
+        def post():
+            with open(vcf_path, "rb") as f:
+                response = client.post("/predict_drugs", files={"file": (filename, f)})
+            response.raise_for_status()
+            return response
+
+        result["e2e_s"], _ = timed(post, repeat)
+
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+def compare(results: List[Dict[str, Any]], baseline_path: str, tolerance: float) -> List[str]:
+    """Names of size/metric pairs that got slower than the baseline by more than tolerance"""
+    with open(baseline_path) as f:
+        baseline = {r["size"]: r for r in json.load(f)["results"]}
+    regressions = []
+    for result in results:
+        base = baseline.get(result["size"])
+        if not base:
+            continue
+        for metric in COMPARED_METRICS:
+            if metric in result and metric in base and base[metric] > 0:
+                ratio = result[metric] / base[metric]
+                if ratio > 1 + tolerance:
+                    regressions.append(f"size={result['size']} {metric}: {base[metric]:.4f}s -> {result[metric]:.4f}s ({ratio:.2f}x)")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PharmGKB VCF parsing and drug matching")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Variants per synthetic VCF")
+    parser.add_argument("--hit-rate", type=float, default=0.01, help="Fraction of variants with an annotated rsID")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (median is reported)")
+    parser.add_argument("--bgzip", action="store_true", help="Write the synthetic VCFs gzip-compressed")
+    parser.add_argument("--e2e-max", type=int, default=1_000_000, help="Skip /predict_drugs above this size")
+    parser.add_argument("--tsv", default=os.path.join(REPO_ROOT, "clinical_annotations.tsv"))
+    parser.add_argument("--output", default="bench_pharmgkb.json")
+    parser.add_argument("--compare", help="Baseline JSON from an earlier run")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown vs baseline (0.25 = 25%%)")
+    # Internal: measure one file in a fresh process
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--worker-size", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--worker-e2e", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.worker_size, args.repeat, args.worker_e2e)))
+        return
+
+    known_rsids = annotated_rsids(args.tsv)
+    print(f"Using {len(known_rsids)} annotated rsIDs from {args.tsv}")
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="bench_pharmgkb_") as tmp:
+        for size in args.sizes:
+            vcf_path = os.path.join(tmp, f"synthetic_{size}.vcf" + (".gz" if args.bgzip else ""))
+            start = time.perf_counter()
+            generate_vcf(vcf_path, size, known_rsids, args.hit_rate, args.seed, args.bgzip)
+            generate_s = time.perf_counter() - start
+
+            command = [
+                sys.executable, os.path.abspath(__file__),
+                "--worker", vcf_path, "--worker-size", str(size), "--repeat", str(args.repeat)
+            ]
+            if size <= args.e2e_max:
+                command.append("--worker-e2e")
+            completed = subprocess.run(command, capture_output=True, text=True, check=True)
+            result = json.loads(completed.stdout.strip().splitlines()[-1])
+            result["generate_s"] = generate_s
+            results.append(result)
+
+            e2e = f"{result['e2e_s'] * 1000:9.1f}ms" if "e2e_s" in result else "      n/a"
+            print(
+                f"size={size:>9,}  parse={result['parse_s'] * 1000:9.1f}ms  "
+                f"match={result['match_s'] * 1000:8.2f}ms  e2e={e2e}  "
+                f"peak_rss={result['peak_rss_mb']:7.1f}MB  predictions={result['predictions']}"
+            )
+            os.remove(vcf_path)
+
+    report = {
+        "benchmark": "pharmgkb",
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {k: v for k, v in vars(args).items() if not k.startswith("worker") and k not in ("output", "compare")},
+        "platform": {"python": platform.python_version(), "machine": platform.machine(), "system": platform.system()},
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.compare}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Benchmark int8 dynamic quantization of BiomedCLIP against fp32 on CPU
+
+Both variants classify the same fixed image set against MEDICAL_CONDITIONS
+(label embeddings are encoded by each variant's own text tower):
+- median batch latency over --repeat runs, per batch size
+- serialized weight size in bytes (what the on-disk int8 cache holds; not RSS)
+- top-1 agreement and mean top-k overlap of the int8 ranking with fp32
+- mean cosine similarity between fp32 and int8 image embeddings
+
+Usage:
+    python benchmarks/bench_quantization.py
+    python benchmarks/bench_quantization.py --images path/to/scans --batch-sizes 1 8 --repeat 10
+    python benchmarks/bench_quantization.py --model ViT-B-16 --pretrained ""   # offline, random weights
+"""
+
+import argparse
+import copy
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import open_clip
+import torch
+from PIL import Image
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from vision_api.loader import BiomedCLIPLoader, MEDICAL_CONDITIONS, quantize_int8  # noqa: E402
+from vision_api.zero_shot import LOGIT_SCALE, encode_labels  # noqa: E402
+
+IMAGE_SUFFIXES = (".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp")
+
+def synthetic_images(count: int, size: int, seed: int) -> List[Image.Image]:
+    """Seeded smooth color fields plus noise, so rankings are stable between runs"""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:size, 0:size].astype(np.float32)
+    images = []
+    for _ in range(count):
+        freq = rng.uniform(10, 90, 3)
+        phase = rng.uniform(0, np.pi, 3)
+        base = np.stack([
+            128 + 100 * np.sin(x / freq[0] + phase[0]),
+            128 + 100 * np.cos(y / freq[1] + phase[1]),
+            128 + 100 * np.sin((x + y) / freq[2] + phase[2])
+        ], axis=-1)
+        noise = rng.normal(0, 10, (size, size, 3))
+        images.append(Image.fromarray(np.clip(base + noise, 0, 255).astype(np.uint8)))
+    return images
+
+def load_images(directory: str) -> List[Image.Image]:
+    names = sorted(name for name in os.listdir(directory) if name.lower().endswith(IMAGE_SUFFIXES))
+    return [Image.open(os.path.join(directory, name)).convert("RGB") for name in names]
+
+def load_fp32(model_name: str, pretrained: str) -> Tuple[torch.nn.Module, Any, Any]:
+    if model_name.startswith("hf-hub:"):
+        model, preprocess_fn = open_clip.create_model_from_pretrained(model_name, device="cpu")
+    else:
+        model, _, preprocess_fn = open_clip.create_model_and_transforms(model_name, pretrained=pretrained or None, device="cpu")
+    return model.eval(), preprocess_fn, open_clip.get_tokenizer(model_name)
+
+def weights_bytes(model: torch.nn.Module) -> int:
+    """Size of the serialized state_dict (what the on-disk cache holds), not process memory"""
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell()
+
+def encode_images(model: torch.nn.Module, pixels: torch.Tensor, batch_size: int) -> torch.Tensor:
+    features = []
+    with torch.inference_mode():
+        for start in range(0, len(pixels), batch_size):
+            batch = model.encode_image(pixels[start:start + batch_size]).float()
+            features.append(batch / batch.norm(dim=-1, keepdim=True))
+    return torch.cat(features)
+
+def batch_latency(model: torch.nn.Module, pixels: torch.Tensor, batch_size: int, repeat: int) -> float:
+    """Median seconds for one encode_image call on batch_size images (one untimed warmup call first)"""
+    batch = pixels[:batch_size]
+    times = []
+    with torch.inference_mode():
+        model.encode_image(batch)
+        for _ in range(repeat):
+            start = time.perf_counter()
+            model.encode_image(batch)
+            times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+def rankings(image_features: torch.Tensor, label_features: np.ndarray, top_k: int) -> np.ndarray:
+    logits = LOGIT_SCALE * image_features @ torch.from_numpy(label_features).T
+    return logits.topk(top_k, dim=-1).indices.numpy()
+
+def agreement(reference: np.ndarray, candidate: np.ndarray) -> Dict[str, float]:
+    top_k = reference.shape[1]
+    overlaps = [len(set(ref) & set(cand)) / top_k for ref, cand in zip(reference, candidate)]
+    return {
+        "top1_agreement": float(np.mean(reference[:, 0] == candidate[:, 0])),
+        f"top{top_k}_overlap": float(np.mean(overlaps)),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark int8 dynamic quantization vs fp32 BiomedCLIP on CPU")
+    parser.add_argument("--model", default=BiomedCLIPLoader().model_name, help="open_clip model name or hf-hub: id")
+    parser.add_argument("--pretrained", default="", help="open_clip pretrained tag for non hf-hub models (empty = random init)")
+    parser.add_argument("--images", default="", help="Directory of images; default is a seeded synthetic set")
+    parser.add_argument("--count", type=int, default=32, help="Synthetic images when --images is not given")
+    parser.add_argument("--size", type=int, default=256, help="Synthetic image side length")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per latency measurement (median is reported)")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--threads", type=int, default=0, help="torch intra-op threads (0 = torch default)")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", default="bench_quantization.json")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    images = load_images(args.images) if args.images else synthetic_images(args.count, args.size, args.seed)
+    fp32, preprocess_fn, tokenizer = load_fp32(args.model, args.pretrained)
+    pixels = torch.stack([preprocess_fn(image) for image in images])
+
+    start = time.perf_counter()
+    int8 = quantize_int8(copy.deepcopy(fp32))
+    quantize_s = time.perf_counter() - start
+
+    variants = {"fp32": fp32, "int8": int8}
+    measured: Dict[str, Dict[str, Any]] = {}
+    for name, model in variants.items():
+        image_features = encode_images(model, pixels, max(args.batch_sizes))
+        label_features = encode_labels(model, tokenizer, MEDICAL_CONDITIONS)
+        measured[name] = {
+            "weights_bytes": weights_bytes(model),
+            "image_features": image_features,
+            "ranking": rankings(image_features, label_features, args.top_k),
+            "latency_s": {size: batch_latency(model, pixels, size, args.repeat)
+                          for size in args.batch_sizes if size <= len(pixels)},
+        }
+
+    reference = measured["fp32"]
+    results: List[Dict[str, Any]] = []
+    for name, m in measured.items():
+        cosine = float((m["image_features"] * reference["image_features"]).sum(dim=-1).mean())
+        quality = agreement(reference["ranking"], m["ranking"])
+        for size, latency in m["latency_s"].items():
+            row = {
+                "variant": name,
+                "batch_size": size,
+                "latency_s": latency,
+                "images_per_s": size / latency,
+                "speedup": reference["latency_s"][size] / latency,
+                "weights_bytes": m["weights_bytes"],
+                "embedding_cosine": cosine,
+                **quality,
+            }
+            results.append(row)
+            print(
+                f"{name:<5}  batch={size:>3}  latency={latency * 1000:8.1f}ms  speedup={row['speedup']:5.2f}x  "
+                f"weights={row['weights_bytes'] / (1024 * 1024):7.1f}MB  top1_agree={quality['top1_agreement']:.3f}  cos={cosine:.4f}"
+            )
+
+    report = {
+        "benchmark": "quantization",
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {**{k: v for k, v in vars(args).items() if k != "output"}, "image_count": len(images)},
+        "platform": {
+            "python": platform.python_version(), "machine": platform.machine(), "system": platform.system(),
+            "torch": torch.__version__, "threads": torch.get_num_threads()
+        },
+        "quantize_s": quantize_s,
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for the vision feature extraction (vision_api/image_stats.py)
+
+For each image size this script compares the reference implementation
+(inference.compute_image_statistics + compute_texture_features) with the
+fused kernel (image_stats.compute_features) and the tiled variant:
+- median wall time over --repeat runs
+- peak traced allocation (tracemalloc sees numpy buffers, not PIL's)
+- largest relative difference of each feature from the reference
+
+Usage:
+    python benchmarks/bench_vision_features.py
+    python benchmarks/bench_vision_features.py --sizes 512 2048 4096 --repeat 5
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+from PIL import Image
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from vision_api.image_stats import compute_features, compute_features_tiled  # noqa: E402
+from vision_api.inference import compute_image_statistics, compute_texture_features  # noqa: E402
+
+DEFAULT_SIZES = [512, 1024, 2048, 4096]
+FEATURES = ["brightness", "contrast", "color_variance", "texture_complexity"]
+
+def synthetic_image(size: int, seed: int) -> Image.Image:
+    """Smooth color gradients plus noise, roughly like a stained tissue scan"""
+    rng = np.random.default_rng(seed + size)
+    y, x = np.mgrid[0:size, 0:size].astype(np.float32)
+    noise = rng.normal(0, 12, (size, size, 3)).astype(np.float32)
+    base = np.stack([
+        170 + 40 * np.sin(x / 57),
+        110 + 50 * np.cos(y / 43),
+        190 + 30 * np.sin((x + y) / 91)
+    ], axis=-1)
+    return Image.fromarray(np.clip(base + noise, 0, 255).astype(np.uint8))
+
+def reference(image: Image.Image) -> Dict[str, Any]:
+    img_array = np.array(image)
+    features = compute_image_statistics(img_array, image)
+    features.update(compute_texture_features(img_array))
+    return features
+
+def fused(image: Image.Image) -> Dict[str, Any]:
+    return compute_features(np.asarray(image))
+
+def tiled(image: Image.Image) -> Dict[str, Any]:
+    return compute_features_tiled(image)
+
+VARIANTS: Dict[str, Callable[[Image.Image], Dict[str, Any]]] = {
+    "reference": reference,
+    "fused": fused,
+    "tiled": tiled,
+}
+
+def measure(fn: Callable[[Image.Image], Dict[str, Any]], image: Image.Image, repeat: int) -> Dict[str, Any]:
+    """Median time of `repeat` untraced runs, then one traced run for peak allocation"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(image)
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    features = fn(image)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"time_s": statistics.median(times), "peak_alloc_mb": peak / (1024 * 1024), "features": features}
+
+def max_relative_error(features: Dict[str, Any], expected: Dict[str, Any]) -> float:
+    errors = [abs(float(features[name]) - float(expected[name])) / max(abs(float(expected[name])), 1e-9) for name in FEATURES]
+    return max(errors)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fused vs reference image feature extraction")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Square image side lengths")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (median is reported)")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", default="bench_vision_features.json")
+    args = parser.parse_args()
+
+    results: List[Dict[str, Any]] = []
+    for size in args.sizes:
+        image = synthetic_image(size, args.seed)
+        measured = {name: measure(fn, image, args.repeat) for name, fn in VARIANTS.items()}
+        expected = measured["reference"]["features"]
+        base = measured["reference"]
+        for name, m in measured.items():
+            row = {
+                "size": size,
+                "variant": name,
+                "time_s": m["time_s"],
+                "peak_alloc_mb": m["peak_alloc_mb"],
+                "speedup": base["time_s"] / m["time_s"] if m["time_s"] else None,
+                "max_relative_error": max_relative_error(m["features"], expected),
+                "is_grayscale_matches": bool(m["features"]["is_grayscale"]) == bool(expected["is_grayscale"]),
+            }
+            results.append(row)
+            print(
+                f"size={size:>5}  {name:<9}  time={row['time_s'] * 1000:9.1f}ms  "
+                f"speedup={row['speedup']:5.2f}x  peak_alloc={row['peak_alloc_mb']:8.1f}MB  "
+                f"max_rel_err={row['max_relative_error']:.2e}"
+            )
+
+    report = {
+        "benchmark": "vision_features",
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "platform": {"python": platform.python_version(), "machine": platform.machine(), "system": platform.system()},
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
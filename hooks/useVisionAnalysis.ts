@@ -30,6 +30,15 @@ interface VisionAnalysisResult {
     processing_time?: string
   }
   heatmap_available?: boolean
+  heatmap?: {
+    method: 'attention' | 'gradient_energy'
+    format: 'png'
+    encoding: 'base64'
+    width: number
+    height: number
+    value_range: [number, number]
+    data: string // grayscale PNG, one pixel per grid cell
+  } | null
   attention_regions?: Array<{
     region: string
     attention: number
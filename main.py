@@ -1,10 +1,17 @@
 import os
-from fastapi import FastAPI, File, UploadFile, HTTPException
-from fastapi.responses import JSONResponse
+import json
+import asyncio
+from fastapi import FastAPI, File, UploadFile, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-import pandas as pd
-# import vcfpy  # Commented out due to missing dependency
-from typing import List, Dict, Any
+from pydantic import BaseModel
+from typing import List, Dict, Any, Iterator, Optional
+
+from pharmgkb.annotations import EVIDENCE_LEVELS, AnnotationIndex
+from pharmgkb.registry import AnnotationRegistry
+from pharmgkb.store import default_store_path
+from pharmgkb.vcf import iter_vcf_rsids, aiter_vcf_rsids, collect_sample_rsids
 
 # Initialize FastAPI app
 app = FastAPI(title="PharmGKB Drug Recommendation API")
@@ -20,60 +27,70 @@ app.add_middleware(
 
 # Load PharmGKB clinical annotations
 PHARMGKB_TSV = "clinical_annotations.tsv"  # Place this file in the same directory
-if not os.path.exists(PHARMGKB_TSV):
+# Compiled copy of the TSV (python -m pharmgkb.store clinical_annotations.tsv); used when fresh
+PHARMGKB_STORE = default_store_path(PHARMGKB_TSV)
+if not os.path.exists(PHARMGKB_TSV) and not os.path.exists(PHARMGKB_STORE):
     raise FileNotFoundError(f"PharmGKB data file '{PHARMGKB_TSV}' not found.")
 try:
-    pharmgkb_df = pd.read_csv(PHARMGKB_TSV, sep='\t', dtype=str).fillna("")
-    # Use the actual column names from the user's file
-    required_cols = [
-        "Gene",                # Gene
-        "Variant/Haplotypes", # Variant
-        "Drug(s)",            # Drug
-        "Phenotype Category", # Phenotype Category
-        "Level of Evidence",  # Level of Evidence
-        "Phenotype(s)"        # Annotation/Reasoning
-    ]
-    for col in required_cols:
-        if col not in pharmgkb_df.columns:
-            raise ValueError(f"Missing required column in TSV: {col}")
+    # Build the rsID / haplotype index once so matching is a dict lookup per variant.
+    # The registry can later swap in a reloaded index without a restart.
+    annotations = AnnotationRegistry(
+        PHARMGKB_TSV,
+        PHARMGKB_STORE,
+        cache_size=int(os.getenv("PHARMGKB_RESULT_CACHE_SIZE", "256"))
+    )
 except Exception as e:
     raise RuntimeError(f"Failed to load PharmGKB data: {e}")
+# Optionally poll the data files and hot-reload when they change (every worker does this itself)
+annotations.watch(float(os.getenv("PHARMGKB_RELOAD_INTERVAL", "0")))
+
+def parse_vcf_rsids(file_path: str) -> Iterator[str]:
+    """Stream rsIDs from a plain or bgzipped VCF, one data line at a time."""
+    return iter_vcf_rsids(file_path)
+
+def match_variants_to_drugs(
+    rsids: List[str],
+    limit: Optional[int] = None,
+    min_level: Optional[str] = None,
+    drugs: Optional[List[str]] = None,
+    index: Optional[AnnotationIndex] = None
+) -> List[Dict[str, Any]]:
+    """Match rsIDs to PharmGKB and extract drug recommendations, strongest evidence first."""
+    index = index or annotations.current
+    return index.match(rsids, limit, min_level, drugs)
 
-def parse_vcf_rsids(file_path: str):
-    """Dummy parser: returns a hardcoded list of rsIDs for testing."""
-    return ["rs123", "rs456", "rs789"]
-
-def match_variants_to_drugs(rsids: List[str]) -> List[Dict[str, Any]]:
-    """Match rsIDs to PharmGKB and extract drug recommendations."""
-    matches = []
-    for rsid in rsids:
-        matched = pharmgkb_df[pharmgkb_df["Variant/Haplotypes"].str.contains(rsid, case=False, na=False)]
-        for _, row in matched.iterrows():
-            matches.append({
-                "gene": row["Gene"],
-                "variant": row["Variant/Haplotypes"],
-                "drug": row["Drug(s)"],
-                "phenotype": row["Phenotype Category"],
-                "evidence": row["Level of Evidence"],
-                "annotation": row["Phenotype(s)"]
-            })
-    return matches
+def validate_min_level(min_level: Optional[str]) -> Optional[str]:
+    """Normalize the min_level query parameter to a PharmGKB evidence level."""
+    if min_level is None:
+        return None
+    level = min_level.strip().upper()
+    if level not in EVIDENCE_LEVELS:
+        raise HTTPException(status_code=422, detail=f"min_level must be one of {', '.join(EVIDENCE_LEVELS)}")
+    return level
+
+VCF_SUFFIXES = (".vcf", ".vcf.gz", ".vcf.bgz")
 
 @app.post("/predict_drugs")
-async def predict_drugs(file: UploadFile = File(...)):
+async def predict_drugs(
+    file: UploadFile = File(...),
+    limit: Optional[int] = Query(None, ge=1, description="Return at most this many predictions"),
+    min_level: Optional[str] = Query(None, description="Weakest level of evidence to include (1A, 1B, 2A, 2B, 3, 4)"),
+    drugs: Optional[List[str]] = Query(None, description="Only return predictions for these drugs (repeat the parameter)")
+):
     # Validate file type
-    if not file.filename.endswith(".vcf"):
-        raise HTTPException(status_code=400, detail="Only .vcf files are accepted.")
-    # Save uploaded file temporarily
-    temp_path = f"temp_{file.filename}"
+    if not file.filename.endswith(VCF_SUFFIXES):
+        raise HTTPException(status_code=400, detail="Only .vcf or bgzipped .vcf.gz files are accepted.")
+    min_level = validate_min_level(min_level)
     try:
-        with open(temp_path, "wb") as f:
-            f.write(await file.read())
-        rsids = parse_vcf_rsids(temp_path)
-        predictions = match_variants_to_drugs(rsids)
+        # Parse the upload chunk by chunk; it is never copied to disk or read whole
+        rsids = [rsid async for rsid in aiter_vcf_rsids(file)]
+        index = annotations.current
+        # Matching and ranking are CPU-bound; keep them off the event loop
+        predictions = await run_in_threadpool(match_variants_to_drugs, rsids, limit, min_level, drugs, index)
         response = {
             "variants": rsids,
-            "predictions": predictions
+            "predictions": predictions,
+            "annotation_version": index.version
         }
         if not predictions:
             response["message"] = "No drug recommendations found for provided variants."
@@ -82,32 +99,166 @@ async def predict_drugs(file: UploadFile = File(...)):
         raise HTTPException(status_code=422, detail=str(ve))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
-    finally:
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
+
+# :path keeps combination drugs such as "sulfamethoxazole / trimethoprim" in one parameter
+@app.get("/drug_variants/{drug:path}")
+async def drug_variants(
+    drug: str,
+    limit: Optional[int] = Query(None, ge=1, description="Return at most this many annotations"),
+    min_level: Optional[str] = Query(None, description="Weakest level of evidence to include (1A, 1B, 2A, 2B, 3, 4)")
+):
+    """Reverse lookup: which annotated variants affect this drug, strongest evidence first."""
+    index = annotations.current
+    if not index.has_drug(drug):
+        raise HTTPException(status_code=404, detail=f"No PharmGKB annotations found for drug: {drug}")
+    min_level = validate_min_level(min_level)
+    return JSONResponse(content={
+        "drug": drug,
+        "annotations": index.match_drug(drug, limit, min_level),
+        "annotation_version": index.version
+    })
+
+class VariantCallsRequest(BaseModel):
+    """rsIDs and/or PharmCAT-style star-allele calls, e.g. ["rs4680", "CYP2D6*1/*4", "HLA-B*15:02"]"""
+    variants: List[str]
+
+@app.post("/predict_drugs/calls")
+async def predict_drugs_from_calls(
+    request: VariantCallsRequest,
+    limit: Optional[int] = Query(None, ge=1, description="Return at most this many predictions"),
+    min_level: Optional[str] = Query(None, description="Weakest level of evidence to include (1A, 1B, 2A, 2B, 3, 4)"),
+    drugs: Optional[List[str]] = Query(None, description="Only return predictions for these drugs (repeat the parameter)")
+):
+    """Drug predictions for already-called variants (no VCF), e.g. PharmCAT diplotypes."""
+    min_level = validate_min_level(min_level)
+    index = annotations.current
+    predictions = await run_in_threadpool(match_variants_to_drugs, request.variants, limit, min_level, drugs, index)
+    response = {
+        "variants": request.variants,
+        "predictions": predictions,
+        "annotation_version": index.version
+    }
+    if not predictions:
+        response["message"] = "No drug recommendations found for provided variants."
+    return JSONResponse(content=response)
+
+def match_vcf_samples(
+    source,
+    filename: str,
+    limit: Optional[int] = None,
+    min_level: Optional[str] = None,
+    drugs: Optional[List[str]] = None
+) -> List[Dict[str, Any]]:
+    """Parse one (possibly multi-sample) VCF and match every sample in a joined lookup."""
+    index = annotations.current
+    sample_rsids = collect_sample_rsids(source)
+    sample_predictions = index.match_samples(sample_rsids, limit, min_level, drugs)
+    results = []
+    for sample, rsids in sample_rsids.items():
+        result = {
+            "patient": f"{filename}:{sample}" if len(sample_rsids) > 1 else filename,
+            "file": filename,
+            "sample": sample,
+            "variants": rsids,
+            "predictions": sample_predictions[sample],
+            "annotation_version": index.version
+        }
+        if not result["predictions"]:
+            result["message"] = "No drug recommendations found for provided variants."
+        results.append(result)
+    return results
+
+@app.post("/predict_drugs/batch")
+async def predict_drugs_batch(
+    files: List[UploadFile] = File(...),
+    limit: Optional[int] = Query(None, ge=1, description="Return at most this many predictions per patient"),
+    min_level: Optional[str] = Query(None, description="Weakest level of evidence to include (1A, 1B, 2A, 2B, 3, 4)"),
+    drugs: Optional[List[str]] = Query(None, description="Only return predictions for these drugs (repeat the parameter)")
+):
+    """
+    Drug predictions for many patients in one request
+
+    Accepts several VCFs and/or multi-sample VCFs and streams one NDJSON line
+    per patient as soon as that file has been matched. A file that fails to
+    parse yields an {"file", "error"} line instead of aborting the batch.
+    """
+    for file in files:
+        if not file.filename.endswith(VCF_SUFFIXES):
+            raise HTTPException(status_code=400, detail=f"Only .vcf or bgzipped .vcf.gz files are accepted: {file.filename}")
+    min_level = validate_min_level(min_level)
+
+    async def process(file: UploadFile) -> List[Dict[str, Any]]:
+        try:
+            # Parse straight from the upload's spooled file, off the event loop
+            return await run_in_threadpool(match_vcf_samples, file.file, file.filename, limit, min_level, drugs)
+        except Exception as e:
+            return [{"file": file.filename, "error": str(e)}]
+
+    async def stream_results():
+        for finished in asyncio.as_completed([process(file) for file in files]):
+            for result in await finished:
+                yield json.dumps(result) + "\n"
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+@app.get("/annotations/status")
+async def annotations_status():
+    """Which PharmGKB release (max Latest History Date) this worker is serving, plus result-cache stats."""
+    return annotations.status()
+
+@app.post("/annotations/reload")
+async def reload_annotations(wait: bool = Query(False, description="Block until the reload has finished")):
+    """
+    Rebuild the annotation indexes from disk and swap them in without downtime
+
+    Requests in flight keep using the previous index. If the new data fails
+    validation the previous version keeps serving and the error is reported.
+    """
+    if not wait:
+        started = annotations.reload_in_background()
+        return JSONResponse(status_code=202, content={"reload_started": started, **annotations.status()})
+    try:
+        await run_in_threadpool(annotations.reload)
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=f"Reload failed, still serving previous annotations: {e}")
+    return annotations.status()
 
 # --- Suggestions for Improvements ---
-# 1. Rank predictions by evidence level (A > B > C > D > E).
-# 2. Integrate LLM (e.g., GPT-4) to generate patient-friendly explanations.
-# 3. Add authentication for sensitive data.
-# 4. Support batch VCF uploads or multiple patients.
-# 5. Add logging and monitoring for production use.
+# 1. Integrate LLM (e.g., GPT-4) to generate patient-friendly explanations.
+# 2. Add authentication for sensitive data.
+# 3. Add logging and monitoring for production use.
 
 # --- Run Instructions ---
 # 1. Install dependencies:
-#    pip install fastapi uvicorn pandas python-multipart vcfpy
+#    pip install fastapi uvicorn pandas python-multipart
 # 2. Place clinical_annotations.tsv in the same directory as main.py.
-# 3. Run the server:
+# 3. (Optional) Compile it into a memory-mapped store for fast startup:
+#    python -m pharmgkb.store clinical_annotations.tsv
+# 4. Run the server:
 #    uvicorn main:app --reload
-# 4. Access Swagger UI for testing:
+#    Set PHARMGKB_RELOAD_INTERVAL=<seconds> to hot-reload updated annotation files,
+#    or POST /annotations/reload after replacing them.
+# 5. Access Swagger UI for testing:
 #    http://localhost:8000/docs
 #
 # --- Sample Frontend Fetch Request ---
 # const formData = new FormData();
 # formData.append('file', fileInput.files[0]);
+# // Optional: ?limit=20&min_level=2A returns the 20 best predictions at level 2A or stronger
 # fetch('http://localhost:8000/predict_drugs', {
 #   method: 'POST',
 #   body: formData
 # })
 #   .then(res => res.json())
-#   .then(data => console.log(data)); 
\ No newline at end of file
+#   .then(data => console.log(data));
+#
+# --- Reverse Lookup / Patient x Drug List ---
+# curl http://localhost:8000/drug_variants/warfarin?min_level=1B
+# curl -F file=@patient.vcf 'http://localhost:8000/predict_drugs?drugs=warfarin&drugs=clopidogrel'
+#
+# --- Called Variants (rsIDs or PharmCAT-style diplotypes) ---
+# curl -X POST http://localhost:8000/predict_drugs/calls -H 'Content-Type: application/json' \
+#   -d '{"variants": ["rs9923231", "CYP2C9*1/*3", "CYP2D6*1/*4"]}'
+#
+# --- Batch Request (one NDJSON line per patient) ---
+# curl -N -F files=@patient1.vcf -F files=@cohort.vcf.gz http://localhost:8000/predict_drugs/batch 
\ No newline at end of file
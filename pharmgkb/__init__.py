@@ -0,0 +1,5 @@
+"""
+PharmGKB drug recommendation package
+"""
+
+__version__ = "0.1.0"
@@ -0,0 +1,313 @@
+"""
+PharmGKB clinical annotation loading and variant index
+"""
+
+import logging
+from typing import Dict, List, Any, Iterable, Optional
+
+import numpy as np
+
+from .cache import ResultCache, variant_set_key
+from .store import Column, load_columns, take_column
+from .variants import (
+    AlleleKey, copy_number_fallback, normalize_rsid, normalize_star_allele, parse_haplotype_call
+)
+
+logger = logging.getLogger(__name__)
+
+# Columns the API depends on, using the names from the PharmGKB export
+REQUIRED_COLUMNS = [
+    "Gene",                # Gene
+    "Variant/Haplotypes", # Variant
+    "Drug(s)",            # Drug
+    "Phenotype Category", # Phenotype Category
+    "Level of Evidence",  # Level of Evidence
+    "Phenotype(s)"        # Annotation/Reasoning
+]
+
+# Prediction field -> source column
+PREDICTION_FIELDS = {
+    "gene": "Gene",
+    "variant": "Variant/Haplotypes",
+    "drug": "Drug(s)",
+    "phenotype": "Phenotype Category",
+    "evidence": "Level of Evidence",
+    "annotation": "Phenotype(s)",
+    "score": "Score",
+    "pmid_count": "PMID Count"
+}
+
+# Last-modified date of each annotation; its maximum identifies the data release
+HISTORY_DATE_COLUMN = "Latest History Date (YYYY-MM-DD)"
+
+# PharmGKB levels of evidence, strongest first; anything else ranks last
+EVIDENCE_LEVELS = ["1A", "1B", "2A", "2B", "3", "4"]
+LEVEL_RANK = {level: rank for rank, level in enumerate(EVIDENCE_LEVELS)}
+
+_NO_ROWS = np.empty(0, dtype=np.intp)
+
+def split_drugs(value: str) -> List[str]:
+    """Split a semicolon-separated Drug(s) cell into normalized drug names"""
+    return [drug.strip().lower() for drug in value.split(";") if drug.strip()]
+
+def split_variant_tokens(value: str) -> List[str]:
+    """Split a Variant/Haplotypes cell into its comma-separated entries"""
+    return [token.strip() for token in value.split(",") if token.strip()]
+
+class AnnotationIndex:
+    """PharmGKB annotations (packed columns) with an inverted variant index"""
+
+    def __init__(self, columns: Dict[str, Column], source: str = "", cache_size: int = 256):
+        for col in REQUIRED_COLUMNS + ["Score", "PMID Count"]:
+            if col not in columns:
+                raise ValueError(f"Missing required column in TSV: {col}")
+        self.columns = columns
+        self.source = source
+        self._rows = len(columns["Variant/Haplotypes"])
+
+        # Prediction fields are decoded straight from the packed columns for matched rows only
+        self._fields = {field: columns[column] for field, column in PREDICTION_FIELDS.items()}
+        self._build_variant_index(columns["Variant/Haplotypes"])
+        self._drug_index = self._build_drug_index(columns["Drug(s)"])
+        self._level, self._rank = self._build_sort_keys(columns)
+        # ISO dates compare correctly as strings
+        self.version = max(columns[HISTORY_DATE_COLUMN], default="") if HISTORY_DATE_COLUMN in columns else ""
+        # Results for repeated variant sets; lives and dies with this index, so a reload starts empty
+        self.result_cache = ResultCache(cache_size)
+
+        logger.info(
+            f"Indexed {self._rows} annotations (version {self.version or 'unknown'}) from {source}: {len(self._rsid_index)} rsIDs, "
+            f"{len(self._allele_index)} star alleles, {len(self._token_index)} other haplotypes, "
+            f"{len(self._drug_index)} drugs"
+        )
+
+    def _build_variant_index(self, variants: Iterable[str]) -> None:
+        """
+        Tokenize Variant/Haplotypes once into exact-match hash indexes
+
+        rsIDs and GENE*ALLELE entries get their own normalized indexes; any
+        other entry (e.g. 'SLC6A4 HTTLPR long form (L allele)') is indexed
+        by its lower-cased text.
+        """
+        rsids: Dict[str, List[int]] = {}
+        alleles: Dict[AlleleKey, List[int]] = {}
+        other: Dict[str, List[int]] = {}
+        for position, value in enumerate(variants):
+            for token in split_variant_tokens(value):
+                rsid = normalize_rsid(token)
+                allele = normalize_star_allele(token) if rsid is None else None
+                if rsid is not None:
+                    rsids.setdefault(rsid, []).append(position)
+                elif allele is not None:
+                    alleles.setdefault(allele, []).append(position)
+                else:
+                    other.setdefault(token.lower(), []).append(position)
+
+        def freeze(postings):
+            return {key: np.asarray(rows, dtype=np.intp) for key, rows in postings.items()}
+
+        self._rsid_index = freeze(rsids)
+        self._allele_index = freeze(alleles)
+        self._token_index = freeze(other)
+
+    @staticmethod
+    def _build_drug_index(drugs: Iterable[str]) -> Dict[str, np.ndarray]:
+        """Map every drug name in Drug(s) to the row positions that mention it"""
+        postings: Dict[str, List[int]] = {}
+        for position, value in enumerate(drugs):
+            for drug in split_drugs(value):
+                postings.setdefault(drug, []).append(position)
+        return {drug: np.asarray(rows, dtype=np.intp) for drug, rows in postings.items()}
+
+    @staticmethod
+    def _build_sort_keys(columns: Dict[str, Column]):
+        """
+        Precompute per-row evidence level and overall rank
+
+        Rank orders rows by level of evidence (1A first), then Score, then
+        PMID Count, both descending; ties keep TSV order.
+        """
+        level = np.array(
+            [LEVEL_RANK.get(value.strip().upper(), len(EVIDENCE_LEVELS)) for value in columns["Level of Evidence"]],
+            dtype=np.int8
+        )
+        order = np.lexsort((-np.asarray(columns["PMID Count"]), -np.asarray(columns["Score"]), level))
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        return level, rank
+
+    def __len__(self) -> int:
+        return self._rows
+
+    def lookup_allele(self, key: AlleleKey) -> np.ndarray:
+        """Row positions for one (GENE, ALLELE) key; e.g. *2x3 falls back to the *2xN entry"""
+        rows = self._allele_index.get(key)
+        if rows is None:
+            fallback = copy_number_fallback(key)
+            rows = self._allele_index.get(fallback) if fallback else None
+        return _NO_ROWS if rows is None else rows
+
+    def lookup(self, variant: str) -> np.ndarray:
+        """
+        Row positions for an rsID, a star allele or diplotype call, or another haplotype name
+
+        Examples: 'rs4680', 'CYP2C9*3', 'CYP2D6*1/*4', 'HLA-B*15:02'
+        """
+        rsid = normalize_rsid(variant)
+        if rsid is not None:
+            return self._rsid_index.get(rsid, _NO_ROWS)
+
+        rows = self._token_index.get(variant.strip().lower())
+        if rows is not None:
+            return rows
+
+        hits = [rows for rows in map(self.lookup_allele, parse_haplotype_call(variant)) if len(rows)]
+        if not hits:
+            return _NO_ROWS
+        return hits[0] if len(hits) == 1 else np.unique(np.concatenate(hits))
+
+    def has_drug(self, drug: str) -> bool:
+        return drug.strip().lower() in self._drug_index
+
+    def drug_rows(self, drugs: Iterable[str]) -> np.ndarray:
+        """Row positions annotated with any of the given drugs"""
+        hits = [self._drug_index.get(drug.strip().lower(), _NO_ROWS) for drug in drugs]
+        hits = [rows for rows in hits if len(rows)]
+        if not hits:
+            return _NO_ROWS
+        return np.unique(np.concatenate(hits))
+
+    def rows_for(self, variants: Iterable[str]) -> np.ndarray:
+        """Concatenated row positions for a sequence of variants, in input order"""
+        hits = [rows for rows in map(self.lookup, variants) if len(rows)]
+        if not hits:
+            return _NO_ROWS
+        return np.concatenate(hits)
+
+    def predictions(self, rows: np.ndarray) -> List[Dict[str, Any]]:
+        """Build prediction dicts for the given row positions from column arrays"""
+        if len(rows) == 0:
+            return []
+        fields = list(self._fields)
+        columns = [take_column(self._fields[field], rows) for field in fields]
+        return [dict(zip(fields, values)) for values in zip(*columns)]
+
+    def drug_mask(self, drugs: Optional[Iterable[str]]) -> Optional[np.ndarray]:
+        """Boolean row mask for a drug list (None means no drug filter)"""
+        if drugs is None:
+            return None
+        mask = np.zeros(self._rows, dtype=bool)
+        mask[self.drug_rows(drugs)] = True
+        return mask
+
+    def rank(
+        self,
+        rows: np.ndarray,
+        limit: Optional[int] = None,
+        min_level: Optional[str] = None,
+        drug_mask: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Distinct rows ordered by precomputed rank, optionally filtered and capped
+
+        Args:
+            rows: Matched row positions (duplicates allowed)
+            limit: Keep only the best `limit` rows (bounded partial selection)
+            min_level: Weakest evidence level to keep, e.g. "2A" keeps 1A/1B/2A
+            drug_mask: Keep only rows set in this mask (see drug_mask())
+        """
+        rows = np.unique(rows)
+        if drug_mask is not None:
+            rows = rows[drug_mask[rows]]
+        if min_level is not None:
+            rows = rows[self._level[rows] <= LEVEL_RANK[min_level]]
+        keys = self._rank[rows]
+        if limit is not None and limit < len(rows):
+            best = np.argpartition(keys, limit - 1)[:limit]
+            rows, keys = rows[best], keys[best]
+        return rows[np.argsort(keys)]
+
+    def match(
+        self,
+        variants: Iterable[str],
+        limit: Optional[int] = None,
+        min_level: Optional[str] = None,
+        drugs: Optional[Iterable[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Match rsIDs / haplotype tokens to their drug annotations, best evidence first
+
+        Results are cached per variant set and options; callers get copies,
+        so changing them never affects later cache hits.
+        """
+        variants = list(variants)
+        drugs = list(drugs) if drugs is not None else None
+        key = variant_set_key(variants, self.version, limit=limit, min_level=min_level, drugs=drugs)
+        result = self.result_cache.get(key)
+        if result is None:
+            result = self.predictions(self.rank(self.rows_for(variants), limit, min_level, self.drug_mask(drugs)))
+            self.result_cache.put(key, result)
+        return [dict(prediction) for prediction in result]
+
+    def match_drug(self, drug: str, limit: Optional[int] = None, min_level: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Reverse lookup: every annotated variant affecting a drug, best evidence first"""
+        return self.predictions(self.rank(self.drug_rows([drug]), limit, min_level))
+
+    def match_samples(
+        self,
+        sample_variants: Dict[str, List[str]],
+        limit: Optional[int] = None,
+        min_level: Optional[str] = None,
+        drugs: Optional[Iterable[str]] = None
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Match several patients in one joined lookup
+
+        Samples whose variant set is already cached are answered from the cache.
+        For the rest, each distinct variant is looked up once and each matched
+        row is decoded once, then shared between every sample that carries it.
+
+        Args:
+            sample_variants: Dict of sample name -> rsIDs / haplotype tokens
+            limit, min_level: As for rank()
+            drugs: Optional drug list to restrict predictions to
+
+        Returns:
+            Dict of sample name -> predictions, in the same order as match()
+        """
+        drugs = list(drugs) if drugs is not None else None
+        results: Dict[str, List[Dict[str, Any]]] = {}
+        pending: Dict[str, str] = {}
+        for sample, variants in sample_variants.items():
+            key = variant_set_key(variants, self.version, limit=limit, min_level=min_level, drugs=drugs)
+            cached = self.result_cache.get(key)
+            if cached is not None:
+                results[sample] = [dict(prediction) for prediction in cached]
+            else:
+                pending[sample] = key
+
+        distinct = {variant for sample in pending for variant in sample_variants[sample]}
+        variant_rows = {variant: self.lookup(variant) for variant in distinct}
+        mask = self.drug_mask(drugs) if pending else None
+
+        sample_rows = {}
+        for sample in pending:
+            variants = sample_variants[sample]
+            hits = [variant_rows[variant] for variant in variants if len(variant_rows[variant])]
+            rows = np.concatenate(hits) if hits else _NO_ROWS
+            sample_rows[sample] = self.rank(rows, limit, min_level, mask).tolist()
+
+        unique_rows = np.unique([row for rows in sample_rows.values() for row in rows]).astype(np.intp)
+        decoded = dict(zip(unique_rows.tolist(), self.predictions(unique_rows)))
+
+        for sample, rows in sample_rows.items():
+            self.result_cache.put(pending[sample], [decoded[row] for row in rows])
+            results[sample] = [dict(decoded[row]) for row in rows]
+
+        # Keep the caller's sample order
+        return {sample: results[sample] for sample in sample_variants}
+
+def load_annotation_index(tsv_path: str, store_path: Optional[str] = None, cache_size: int = 256) -> AnnotationIndex:
+    """Load annotations from the compiled store when fresh, else the TSV, and build the index"""
+    columns, source = load_columns(tsv_path, store_path)
+    return AnnotationIndex(columns, source, cache_size)
@@ -0,0 +1,72 @@
+"""
+Bounded LRU cache for PharmGKB match results
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional
+
+def variant_set_key(variants: Iterable[str], version: str, **params: Any) -> str:
+    """
+    Canonical hash of a variant set plus the annotation version and query options
+
+    Matching ignores order and repeats, so the key is built from the sorted,
+    de-duplicated, case-folded variants.
+    """
+    digest = hashlib.sha256()
+    digest.update(version.encode())
+    for name in sorted(params):
+        value = params[name]
+        if isinstance(value, (list, tuple, set)):
+            value = sorted(str(v).strip().lower() for v in value)
+        digest.update(f"\0{name}={value}".encode())
+    digest.update(b"\0\0")
+    digest.update("\n".join(sorted({v.strip().lower() for v in variants})).encode())
+    return digest.hexdigest()
+
+class ResultCache:
+    """Thread-safe LRU mapping with hit/miss counters"""
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
@@ -0,0 +1,140 @@
+"""
+Hot-swappable holder for the active PharmGKB annotation index
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from .annotations import AnnotationIndex, load_annotation_index
+from .store import default_store_path
+
+logger = logging.getLogger(__name__)
+
+# A reload is rejected if it would shrink the annotation set below this fraction
+MIN_ROWS_RATIO = 0.5
+
+class AnnotationRegistry:
+    """
+    Serves one AnnotationIndex and replaces it without downtime
+
+    Reloads build and validate a complete new index off to the side and then
+    swap a single reference. Requests that already took `current` finish on
+    the index they started with; a failed reload leaves the old one serving.
+    Each index carries its own result cache, so a swap also invalidates it.
+    """
+
+    def __init__(self, tsv_path: str, store_path: Optional[str] = None, cache_size: int = 256):
+        self.tsv_path = tsv_path
+        self.store_path = store_path or default_store_path(tsv_path)
+        self.cache_size = cache_size
+        self._reload_lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self.last_error: Optional[str] = None
+
+        self._stamp = self._source_stamp()
+        self._index = load_annotation_index(self.tsv_path, self.store_path, self.cache_size)
+        self.loaded_at = time.time()
+
+    @property
+    def current(self) -> AnnotationIndex:
+        """The index to use for one request; read it once and keep the reference"""
+        return self._index
+
+    @property
+    def reloading(self) -> bool:
+        return self._reload_lock.locked()
+
+    def _source_stamp(self) -> Tuple:
+        stamps = []
+        for path in (self.tsv_path, self.store_path):
+            if os.path.exists(path):
+                stat = os.stat(path)
+                stamps.append((path, stat.st_size, stat.st_mtime_ns))
+        return tuple(stamps)
+
+    def _validate(self, index: AnnotationIndex) -> None:
+        if len(index) == 0:
+            raise ValueError("Reloaded annotation data is empty")
+        if len(index) < MIN_ROWS_RATIO * len(self._index):
+            raise ValueError(
+                f"Reloaded annotation data has {len(index)} rows, "
+                f"less than {MIN_ROWS_RATIO:.0%} of the {len(self._index)} currently served"
+            )
+
+    def reload(self) -> AnnotationIndex:
+        """
+        Build, validate and swap in a fresh index (blocking)
+
+        Raises:
+            ValueError/OSError if the new data cannot be loaded or fails validation;
+            the previous index keeps serving in that case.
+        """
+        with self._reload_lock:
+            stamp = self._source_stamp()
+            start = time.perf_counter()
+            try:
+                index = load_annotation_index(self.tsv_path, self.store_path, self.cache_size)
+                self._validate(index)
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Annotation reload failed, still serving version {self._index.version}: {e}")
+                raise
+
+            previous = self._index
+            self._index = index
+            self._stamp = stamp
+            self.loaded_at = time.time()
+            self.last_error = None
+            logger.info(
+                f"Annotations reloaded in {time.perf_counter() - start:.2f}s: "
+                f"version {previous.version} -> {index.version}, {len(index)} rows"
+            )
+            return index
+
+    def reload_in_background(self) -> bool:
+        """Start a reload thread; returns False if one is already running"""
+        if self.reloading:
+            return False
+
+        def run():
+            try:
+                self.reload()
+            except Exception:
+                pass  # already logged and recorded in last_error
+
+        threading.Thread(target=run, name="pharmgkb-reload", daemon=True).start()
+        return True
+
+    def watch(self, interval: float) -> None:
+        """Poll the TSV / compiled store every `interval` seconds and reload on change"""
+        if self._watcher is not None or interval <= 0:
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                if self._source_stamp() != self._stamp and not self.reloading:
+                    logger.info("Annotation source changed on disk, reloading")
+                    try:
+                        self.reload()
+                    except Exception:
+                        # Don't retry the same broken file every interval
+                        self._stamp = self._source_stamp()
+
+        self._watcher = threading.Thread(target=run, name="pharmgkb-watch", daemon=True)
+        self._watcher.start()
+
+    def status(self) -> Dict[str, Any]:
+        index = self._index
+        return {
+            "version": index.version,
+            "source": index.source,
+            "annotations": len(index),
+            "loaded_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.loaded_at)),
+            "reloading": self.reloading,
+            "last_error": self.last_error,
+            "result_cache": index.result_cache.stats()
+        }
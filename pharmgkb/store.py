@@ -0,0 +1,221 @@
+"""
+Compiled, memory-mappable columnar store for PharmGKB annotations
+
+The TSV is compiled once into a single file of packed UTF-8 columns:
+
+    8 bytes   magic b"PGKBSTR1"
+    8 bytes   little-endian header length
+    N bytes   JSON header (row count, source TSV stamp, column layout)
+    ...       8-byte aligned column arrays: int64 offsets + uint8 data for
+              text columns, raw float64/int64 values for numeric ones
+
+Opening it maps the file read-only, so startup does no parsing and every
+uvicorn worker shares the same page-cache pages.
+
+Build it with:
+    python -m pharmgkb.store clinical_annotations.tsv
+"""
+
+import argparse
+import json
+import logging
+import os
+import struct
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+STORE_MAGIC = b"PGKBSTR1"
+STORE_VERSION = 2
+STORE_SUFFIX = ".pgkb"
+_ALIGN = 8
+
+# Columns stored as typed arrays instead of text (missing/invalid values become 0)
+NUMERIC_COLUMNS = {
+    "Score": np.float64,
+    "PMID Count": np.int64,
+    "Evidence Count": np.int64,
+}
+
+class StringColumn:
+    """Variable-length UTF-8 strings packed into one byte buffer plus row offsets"""
+
+    __slots__ = ("offsets", "data")
+
+    def __init__(self, offsets: np.ndarray, data: np.ndarray):
+        self.offsets = offsets
+        self.data = data
+
+    @classmethod
+    def from_values(cls, values: Iterable[str]) -> "StringColumn":
+        encoded = [value.encode("utf-8") for value in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return cls(offsets, data)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row: int) -> str:
+        return self.data[self.offsets[row]:self.offsets[row + 1]].tobytes().decode("utf-8")
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
+
+    def take(self, rows: Iterable[int]) -> List[str]:
+        """Decode the given rows, in order"""
+        return [self[row] for row in rows]
+
+def default_store_path(tsv_path: str) -> str:
+    """clinical_annotations.tsv -> clinical_annotations.pgkb"""
+    return os.path.splitext(tsv_path)[0] + STORE_SUFFIX
+
+def source_stamp(tsv_path: str) -> Dict[str, Any]:
+    """Identity of a source TSV used to detect a stale compiled store"""
+    stat = os.stat(tsv_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+Column = Union[StringColumn, np.ndarray]
+
+def take_column(column: Column, rows: np.ndarray) -> List[Any]:
+    """Python values of a packed text or numeric column for the given rows"""
+    if isinstance(column, StringColumn):
+        return column.take(rows)
+    return column[rows].tolist()
+
+def read_tsv_columns(tsv_path: str) -> Dict[str, Column]:
+    """Parse the TSV with pandas and pack every column (the DataFrame is not kept)"""
+    df = pd.read_csv(tsv_path, sep='\t', dtype=str).fillna("")
+    columns: Dict[str, Column] = {}
+    for column in df.columns:
+        if column in NUMERIC_COLUMNS:
+            values = pd.to_numeric(df[column], errors="coerce").fillna(0)
+            columns[column] = values.to_numpy(dtype=NUMERIC_COLUMNS[column])
+        else:
+            columns[column] = StringColumn.from_values(df[column])
+    return columns
+
+def _pad(offset: int) -> int:
+    return (-offset) % _ALIGN
+
+def write_store(columns: Dict[str, Column], store_path: str, source: Optional[Dict[str, Any]] = None) -> None:
+    """Serialize packed columns to store_path (written to a temp file, then renamed)"""
+    rows = len(next(iter(columns.values()))) if columns else 0
+
+    layout = []
+    arrays = []
+    position = 0
+    for name, column in columns.items():
+        if isinstance(column, StringColumn):
+            entry = {"name": name, "kind": "str"}
+            parts = (("offsets", column.offsets), ("data", column.data))
+        else:
+            entry = {"name": name, "kind": column.dtype.name}
+            parts = (("values", column),)
+        for part, array in parts:
+            position += _pad(position)
+            entry[part] = [position, int(array.size)]
+            arrays.append((position, array))
+            position += array.nbytes
+        layout.append(entry)
+
+    header = json.dumps({
+        "version": STORE_VERSION,
+        "rows": rows,
+        "source": source or {},
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "columns": layout,
+    }).encode("utf-8")
+    header += b" " * _pad(len(header))
+
+    tmp_path = f"{store_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(STORE_MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        written = 0
+        for offset, array in arrays:
+            f.write(b"\0" * (offset - written))
+            f.write(array.tobytes())
+            written = offset + array.nbytes
+    os.replace(tmp_path, store_path)
+
+def read_store_header(store_path: str) -> Tuple[Dict[str, Any], int]:
+    """Read only the JSON header; returns (header, byte offset of the column body)"""
+    with open(store_path, "rb") as f:
+        if f.read(len(STORE_MAGIC)) != STORE_MAGIC:
+            raise ValueError(f"Not a PharmGKB annotation store: {store_path}")
+        (header_len,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_len))
+    return header, len(STORE_MAGIC) + 8 + header_len
+
+def open_store(store_path: str) -> Tuple[Dict[str, Column], Dict[str, Any]]:
+    """Memory-map a compiled store; returns (columns, header)"""
+    header, body = read_store_header(store_path)
+    mapped = np.memmap(store_path, dtype=np.uint8, mode="r")
+
+    def view(part, dtype):
+        offset, count = part
+        return np.frombuffer(mapped, dtype=dtype, count=count, offset=body + offset)
+
+    columns: Dict[str, Column] = {}
+    for entry in header["columns"]:
+        if entry["kind"] == "str":
+            columns[entry["name"]] = StringColumn(view(entry["offsets"], np.int64), view(entry["data"], np.uint8))
+        else:
+            columns[entry["name"]] = view(entry["values"], np.dtype(entry["kind"]))
+    return columns, header
+
+def is_store_fresh(store_path: str, tsv_path: str) -> bool:
+    """True when the store exists and was compiled from the current TSV"""
+    if not os.path.exists(store_path):
+        return False
+    try:
+        header, _ = read_store_header(store_path)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable annotation store {store_path}: {e}")
+        return False
+    if not os.path.exists(tsv_path):
+        # Deployments may ship only the compiled store
+        return header.get("version") == STORE_VERSION
+    return header.get("version") == STORE_VERSION and header.get("source") == source_stamp(tsv_path)
+
+def load_columns(tsv_path: str, store_path: Optional[str] = None) -> Tuple[Dict[str, Column], str]:
+    """
+    Load annotation columns from the compiled store, falling back to the TSV
+
+    Returns:
+        Tuple of (columns, path actually loaded)
+    """
+    store_path = store_path or default_store_path(tsv_path)
+    if is_store_fresh(store_path, tsv_path):
+        columns, _ = open_store(store_path)
+        return columns, store_path
+    if os.path.exists(store_path):
+        logger.warning(f"Annotation store {store_path} is stale, reading {tsv_path} instead")
+    return read_tsv_columns(tsv_path), tsv_path
+
+def build_store(tsv_path: str, store_path: Optional[str] = None) -> str:
+    """Compile the TSV into a store next to it (or at store_path)"""
+    store_path = store_path or default_store_path(tsv_path)
+    write_store(read_tsv_columns(tsv_path), store_path, source=source_stamp(tsv_path))
+    return store_path
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile PharmGKB clinical annotations into a memory-mappable store")
+    parser.add_argument("tsv", help="Path to clinical_annotations.tsv")
+    parser.add_argument("-o", "--output", help=f"Output path (default: <tsv>{STORE_SUFFIX})")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    store_path = build_store(args.tsv, args.output)
+    print(f"Wrote {store_path} ({os.path.getsize(store_path)} bytes) in {time.perf_counter() - start:.2f}s")
+
+if __name__ == "__main__":
+    main()
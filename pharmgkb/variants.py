@@ -0,0 +1,58 @@
+"""
+Normalization of rsIDs, star alleles and diplotype calls into index keys
+"""
+
+import re
+from typing import List, Optional, Tuple
+
+RSID_RE = re.compile(r"^rs\d+$", re.IGNORECASE)
+# GENE*ALLELE, e.g. CYP2D6*4, CYP2D6*4xN, HLA-B*15:02, CYP2C19 *17
+STAR_ALLELE_RE = re.compile(r"^([A-Za-z0-9-]+)\s*\*\s*([A-Za-z0-9:.]+)$")
+# Copy-number suffix on an allele, e.g. 1X2 -> (1, 2)
+COPY_NUMBER_RE = re.compile(r"^(.+)X(\d+)$")
+
+AlleleKey = Tuple[str, str]
+
+def normalize_rsid(value: str) -> Optional[str]:
+    """'RS4680 ' -> 'rs4680'; None when the value is not an rsID"""
+    value = value.strip()
+    return value.lower() if RSID_RE.match(value) else None
+
+def normalize_star_allele(value: str, gene: Optional[str] = None) -> Optional[AlleleKey]:
+    """
+    'CYP2D6*4xN' -> ('CYP2D6', '4XN'); '*4' with gene='CYP2D6' -> the same
+
+    Returns None when the value is not a star allele.
+    """
+    value = value.strip()
+    if gene and value.startswith("*"):
+        value = gene.strip() + value
+    match = STAR_ALLELE_RE.match(value)
+    if not match:
+        return None
+    return match.group(1).upper(), match.group(2).upper()
+
+def parse_haplotype_call(value: str, gene: Optional[str] = None) -> List[AlleleKey]:
+    """
+    Split a PharmCAT-style call into allele keys
+
+    Accepts single alleles and diplotypes in the usual spellings:
+    'CYP2D6*1/*4', 'CYP2C19*2/CYP2C19*17', 'CYP2D6 *1/*4', or '*1/*4'
+    together with gene='CYP2D6'.
+    """
+    keys: List[AlleleKey] = []
+    for part in value.replace("|", "/").split("/"):
+        key = normalize_star_allele(part, gene)
+        if key is None:
+            continue
+        # Alleles after the first inherit its gene ('CYP2D6*1/*4')
+        gene = key[0]
+        keys.append(key)
+    return keys
+
+def copy_number_fallback(key: AlleleKey) -> Optional[AlleleKey]:
+    """('CYP2D6', '2X3') -> ('CYP2D6', '2XN'), the way PharmGKB lists duplications"""
+    match = COPY_NUMBER_RE.match(key[1])
+    if not match:
+        return None
+    return key[0], f"{match.group(1)}XN"
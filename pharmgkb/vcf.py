@@ -0,0 +1,220 @@
+"""
+Streaming VCF readers for plain and bgzipped files and uploads
+"""
+
+import gzip
+import io
+import logging
+import zlib
+from typing import AsyncIterator, BinaryIO, Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# bgzip blocks are ordinary gzip members, so the gzip magic is enough to detect them
+GZIP_MAGIC = b"\x1f\x8b"
+# Read size for uploads parsed straight from the request
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+class VcfRecord(NamedTuple):
+    """The subset of a VCF data line that drug matching needs"""
+    chrom: str
+    pos: int
+    ids: Tuple[str, ...]
+    genotypes: Tuple[str, ...]
+
+def open_vcf(stream: BinaryIO) -> BinaryIO:
+    """Wrap a binary VCF stream, transparently decompressing gzip/bgzip"""
+    if not hasattr(stream, "peek"):
+        stream = io.BufferedReader(stream)
+    if stream.peek(2)[:2] == GZIP_MAGIC:
+        # GzipFile reads multi-member (bgzip) input block by block
+        return gzip.GzipFile(fileobj=stream, mode="rb")
+    return stream
+
+def _genotype_index(format_field: bytes) -> Optional[int]:
+    keys = format_field.split(b":")
+    return keys.index(b"GT") if b"GT" in keys else None
+
+class VcfLineParser:
+    """Turns raw VCF lines into VcfRecords; shared by the file and upload readers"""
+
+    def __init__(self, samples: Optional[List[str]] = None):
+        self.samples = samples
+        self._gt_format = None
+        self._gt_index = None
+
+    def parse(self, line: bytes) -> Optional[VcfRecord]:
+        """Parse one line; returns None for header, blank and truncated lines"""
+        if line.startswith(b"#"):
+            if self.samples is not None and line.startswith(b"#CHROM"):
+                self.samples.extend(name.decode() for name in line.rstrip(b"\r\n").split(b"\t")[9:])
+            return None
+        fields = line.rstrip(b"\r\n").split(b"\t")
+        if len(fields) < 8:
+            return None
+
+        ids = tuple(i.decode() for i in fields[2].split(b";") if i and i != b".")
+
+        genotypes: Tuple[str, ...] = ()
+        if len(fields) > 9:
+            # FORMAT is almost always identical line to line, so reuse the GT position
+            if fields[8] != self._gt_format:
+                self._gt_format = fields[8]
+                self._gt_index = _genotype_index(self._gt_format)
+            gt_index = self._gt_index
+            if gt_index is not None:
+                genotypes = tuple(
+                    sample.split(b":")[gt_index].decode() if sample.count(b":") >= gt_index else "."
+                    for sample in fields[9:]
+                )
+
+        return VcfRecord(fields[0].decode(), int(fields[1]), ids, genotypes)
+
+def iter_vcf_records(source: Union[str, BinaryIO], samples: Optional[List[str]] = None) -> Iterator[VcfRecord]:
+    """
+    Yield one VcfRecord per data line without loading the file into memory
+
+    Args:
+        source: File path or binary stream (plain VCF or bgzip/gzip)
+        samples: Optional list that is filled with the sample names from the #CHROM header
+
+    Yields:
+        VcfRecord with CHROM, POS, the non-missing IDs and the GT of every sample
+    """
+    raw = open(source, "rb") if isinstance(source, str) else source
+    stream = open_vcf(raw)
+    parser = VcfLineParser(samples)
+    try:
+        for line in stream:
+            record = parser.parse(line)
+            if record is not None:
+                yield record
+    finally:
+        if raw is not source:
+            raw.close()
+
+class _GzipChunkDecoder:
+    """Incremental gzip decoder for pushed chunks; restarts at each bgzip member"""
+
+    def __init__(self):
+        self._decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        # True while the current member has been fed input but not reached its end
+        self._open = False
+
+    def decompress(self, data: bytes) -> bytes:
+        out = []
+        try:
+            while data:
+                out.append(self._decoder.decompress(data))
+                self._open = not self._decoder.eof
+                if self._open:
+                    break
+                data = self._decoder.unused_data
+                self._decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        except zlib.error as e:
+            raise ValueError(f"Corrupt gzip data: {e}") from e
+        return b"".join(out)
+
+    def finish(self) -> None:
+        """Raise ValueError if the input stopped in the middle of a gzip member"""
+        if self._open:
+            raise ValueError("Truncated gzip data: the upload ended before the end of the compressed stream")
+
+async def aiter_vcf_records(
+    upload,
+    samples: Optional[List[str]] = None,
+    chunk_size: int = UPLOAD_CHUNK_SIZE
+) -> AsyncIterator[VcfRecord]:
+    """
+    Async variant of iter_vcf_records that pulls an upload chunk by chunk
+
+    Args:
+        upload: Anything with `async read(size)`, e.g. a FastAPI UploadFile
+        samples: As for iter_vcf_records
+        chunk_size: Bytes requested per read; bounds memory and event-loop stalls
+
+    Raises:
+        ValueError if a gzip/bgzip upload is corrupt or truncated
+    """
+    parser = VcfLineParser(samples)
+    decoder: Optional[_GzipChunkDecoder] = None
+    pending = b""
+    # Sniff the gzip magic from the first two bytes, however the reads are split
+    head: Optional[bytes] = b""
+    while True:
+        chunk = await upload.read(chunk_size)
+        if not chunk:
+            if not head:
+                break
+            chunk, head = head, None
+        elif head is not None:
+            head += chunk
+            if len(head) < len(GZIP_MAGIC):
+                continue
+            if head.startswith(GZIP_MAGIC):
+                decoder = _GzipChunkDecoder()
+            chunk, head = head, None
+        if decoder is not None:
+            chunk = decoder.decompress(chunk)
+
+        # Keep the trailing partial line for the next chunk
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            record = parser.parse(line)
+            if record is not None:
+                yield record
+
+    if decoder is not None:
+        decoder.finish()
+    if pending:
+        record = parser.parse(pending)
+        if record is not None:
+            yield record
+
+def iter_vcf_rsids(source: Union[str, BinaryIO]) -> Iterator[str]:
+    """Yield the dbSNP rsIDs found in the ID column of a VCF"""
+    for record in iter_vcf_records(source):
+        for variant_id in record.ids:
+            if variant_id.lower().startswith("rs"):
+                yield variant_id
+
+async def aiter_vcf_rsids(upload, chunk_size: int = UPLOAD_CHUNK_SIZE) -> AsyncIterator[str]:
+    """Yield the dbSNP rsIDs of an uploaded VCF as its chunks arrive"""
+    async for record in aiter_vcf_records(upload, chunk_size=chunk_size):
+        for variant_id in record.ids:
+            if variant_id.lower().startswith("rs"):
+                yield variant_id
+
+def has_alt_allele(genotype: str) -> bool:
+    """True when a GT call (e.g. 0/1, 1|1) carries a non-reference allele"""
+    return any(allele not in ("0", ".", "") for allele in genotype.replace("|", "/").split("/"))
+
+def collect_sample_rsids(source: Union[str, BinaryIO]) -> Dict[str, List[str]]:
+    """
+    Collect rsIDs per sample in a single pass over a VCF
+
+    Single-sample files keep every rsID (as parse_vcf_rsids does). In
+    multi-sample files a site only counts for the samples whose GT carries
+    an ALT allele, since the site list is shared across the cohort.
+
+    Returns:
+        Dict of sample name -> rsIDs, in file order
+    """
+    samples: List[str] = []
+    per_sample: Dict[str, List[str]] = {}
+    for record in iter_vcf_records(source, samples):
+        rsids = [i for i in record.ids if i.lower().startswith("rs")]
+        if not rsids:
+            continue
+        if len(samples) <= 1:
+            per_sample.setdefault(samples[0] if samples else "", []).extend(rsids)
+            continue
+        for sample, genotype in zip(samples, record.genotypes):
+            if has_alt_allele(genotype):
+                per_sample.setdefault(sample, []).extend(rsids)
+
+    # Report samples without any hits too, so every patient gets a result line
+    for sample in samples or [""]:
+        per_sample.setdefault(sample, [])
+    return per_sample
@@ -0,0 +1,19 @@
+"""
+Shared pytest setup
+
+Tests import the repo's packages (pharmgkb, vision_api) from the checkout
+and run the vision API in-process: analyses use threads instead of a
+spawned process pool, and no result cache is written to disk.
+"""
+
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+# Read by vision_api.config at import time, so set before any test imports it
+os.environ["VISION_INFERENCE_WORKERS"] = "0"
+os.environ["VISION_BIOMEDCLIP_ENABLED"] = "false"
+os.environ["VISION_PRELOAD_MODEL"] = "false"
+os.environ["VISION_RESULT_CACHE_DIR"] = ""
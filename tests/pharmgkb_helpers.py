@@ -0,0 +1,41 @@
+"""A small clinical_annotations.tsv (PharmGKB export columns) for pharmgkb tests"""
+
+import os
+from typing import List, Sequence
+
+COLUMNS = [
+    "Clinical Annotation ID", "Variant/Haplotypes", "Gene", "Level of Evidence", "Score",
+    "Phenotype Category", "PMID Count", "Evidence Count", "Drug(s)", "Phenotype(s)",
+    "Latest History Date (YYYY-MM-DD)"
+]
+
+# Row order matters: tests refer to rows by position
+ROWS = [
+    ["1001", "rs4680", "COMT", "3", "2.0", "Efficacy", "2", "2", "morphine", "Pain", "2021-03-24"],
+    ["1002", "rs9923231", "VKORC1", "1A", "100.0", "Dosage", "40", "45", "warfarin", "", "2022-01-10"],
+    ["1003", "CYP2D6*1, CYP2D6*4, CYP2D6*2xN", "CYP2D6", "1A", "80.0", "Metabolism/PK", "30", "31",
+     "codeine;tramadol", "", "2023-05-01"],
+    ["1004", "rs4680", "COMT", "2B", "5.0", "Toxicity", "3", "3", "warfarin", "", "2020-01-01"],
+    ["1005", "HLA-B*15:02", "HLA-B", "1A", "90.0", "Toxicity", "50", "52", "carbamazepine",
+     "Stevens-Johnson Syndrome", "2019-07-15"],
+    ["1006", "SLC6A4 HTTLPR long form (L allele)", "SLC6A4", "3", "1.0", "Efficacy", "1", "1",
+     "citalopram", "Depression", "2018-02-02"],
+    ["1007", "rs9923231", "VKORC1", "1A", "100.0", "Dosage", "60", "70", "Warfarin", "", "2022-02-01"],
+    ["1008", "rs3909184", "HLA-B", "3", "0.5", "Toxicity", "1", "1",
+     "sulfamethoxazole / trimethoprim", "Drug Hypersensitivity", "2017-11-20"],
+]
+
+def write_tsv(path: str, rows: Sequence[List[str]] = ROWS) -> str:
+    with open(path, "w") as f:
+        f.write("\t".join(COLUMNS) + "\n")
+        for row in rows:
+            f.write("\t".join(row) + "\n")
+    return os.fspath(path)
+
+def write_vcf(path: str, lines: Sequence[str], samples: Sequence[str] = ("NA12878",)) -> str:
+    """A plain VCF with the given tab-separated data lines"""
+    header = "\t".join(["#CHROM", "POS", "ID", "REF", "ALT", "QUAL", "FILTER", "INFO", "FORMAT", *samples])
+    with open(path, "w") as f:
+        f.write("##fileformat=VCFv4.2\n" + header + "\n")
+        f.writelines(line + "\n" for line in lines)
+    return os.fspath(path)
@@ -0,0 +1,99 @@
+"""AnnotationIndex: variant index lookups and prediction decoding"""
+
+import pytest
+
+from pharmgkb.annotations import AnnotationIndex, load_annotation_index
+from pharmgkb.store import read_tsv_columns
+
+from pharmgkb_helpers import write_tsv
+
+@pytest.fixture
+def index(tmp_path):
+    return load_annotation_index(write_tsv(tmp_path / "clinical_annotations.tsv"))
+
+def test_rsid_lookup_is_case_and_whitespace_insensitive(index):
+    assert index.lookup("rs4680").tolist() == [0, 3]
+    assert index.lookup(" RS4680 ").tolist() == [0, 3]
+    assert len(index.lookup("rs1")) == 0
+
+def test_predictions_decode_matched_rows(index):
+    (prediction,) = index.predictions(index.lookup("rs4680")[:1])
+    assert prediction == {
+        "gene": "COMT",
+        "variant": "rs4680",
+        "drug": "morphine",
+        "phenotype": "Efficacy",
+        "evidence": "3",
+        "annotation": "Pain",
+        "score": 2.0,
+        "pmid_count": 2
+    }
+
+def test_match_returns_every_annotation_of_each_variant(index):
+    drugs = {prediction["drug"] for prediction in index.match(["rs4680", "rs9923231", "rs1"])}
+    assert drugs == {"morphine", "warfarin", "Warfarin"}
+    assert index.match([]) == []
+
+def test_version_is_latest_history_date(index):
+    assert index.version == "2023-05-01"
+
+def test_missing_required_column_is_rejected(tmp_path):
+    columns = read_tsv_columns(write_tsv(tmp_path / "clinical_annotations.tsv"))
+    del columns["Drug(s)"]
+    with pytest.raises(ValueError, match="Drug"):
+        AnnotationIndex(columns)
+
+def test_rank_orders_by_level_then_score_then_pmid_count(index):
+    rows = index.rank(index.rows_for(["rs4680", "rs9923231", "CYP2D6*4", "HLA-B*15:02"]))
+    # 1A rows by Score (100, 100, 90, 80), the Score tie broken by PMID Count (60 > 40), then 2B, then 3
+    assert rows.tolist() == [6, 1, 4, 2, 3, 0]
+
+def test_rank_deduplicates_rows(index):
+    assert index.rank(index.rows_for(["rs4680", "RS4680", "rs4680"])).tolist() == [3, 0]
+
+def test_limit_keeps_the_best_rows(index):
+    rows = index.rows_for(["rs4680", "rs9923231", "CYP2D6*4", "HLA-B*15:02"])
+    for limit in range(1, 7):
+        assert index.rank(rows, limit=limit).tolist() == index.rank(rows)[:limit].tolist()
+    assert index.rank(rows, limit=50).tolist() == index.rank(rows).tolist()
+
+def test_min_level_drops_weaker_evidence(index):
+    predictions = index.match(["rs4680", "rs9923231"], min_level="2B")
+    assert [p["evidence"] for p in predictions] == ["1A", "1A", "2B"]
+    assert index.match(["rs4680"], min_level="1B") == []
+
+def test_star_alleles_are_indexed_per_comma_separated_entry(index):
+    assert index.lookup("CYP2D6*4").tolist() == [2]
+    assert index.lookup("cyp2d6*1").tolist() == [2]
+    assert index.lookup("HLA-B*15:02").tolist() == [4]
+    assert len(index.lookup("CYP2D6*10")) == 0
+
+def test_diplotype_call_matches_each_allele_once(index):
+    assert index.lookup("CYP2D6*1/*4").tolist() == [2]
+    assert index.lookup("CYP2D6*10/*4").tolist() == [2]
+
+def test_copy_number_call_falls_back_to_xn_entry(index):
+    assert index.lookup("CYP2D6*2x3").tolist() == [2]
+    assert len(index.lookup("CYP2D6*3x2")) == 0
+
+def test_other_haplotype_names_match_exactly(index):
+    assert index.lookup("slc6a4 HTTLPR long form (L allele)").tolist() == [5]
+    assert len(index.lookup("SLC6A4 HTTLPR")) == 0
+
+def test_match_drug_is_case_insensitive_and_ranked(index):
+    predictions = index.match_drug(" warfarin")
+    assert [(p["variant"], p["evidence"], p["pmid_count"]) for p in predictions] == [
+        ("rs9923231", "1A", 60), ("rs9923231", "1A", 40), ("rs4680", "2B", 3)
+    ]
+    assert [p["drug"] for p in index.match_drug("TRAMADOL")] == ["codeine;tramadol"]
+    assert index.match_drug("aspirin") == []
+
+def test_has_drug_splits_multi_drug_cells(index):
+    assert index.has_drug("Codeine") and index.has_drug("tramadol")
+    assert not index.has_drug("codeine;tramadol")
+
+def test_match_applies_drug_filter(index):
+    predictions = index.match(["rs4680", "rs9923231", "CYP2D6*1"], drugs=["WARFARIN "])
+    assert [(p["gene"], p["evidence"]) for p in predictions] == [("VKORC1", "1A"), ("VKORC1", "1A"), ("COMT", "2B")]
+    assert index.match(["rs4680"], drugs=["aspirin"]) == []
+    assert len(index.match(["rs4680"], drugs=[])) == 0
@@ -0,0 +1,144 @@
+"""PharmGKB API endpoints (main.py), served from a small annotation file"""
+
+import gzip
+import importlib
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from pharmgkb.registry import AnnotationRegistry
+
+from conftest import REPO_ROOT
+from pharmgkb_helpers import ROWS, write_tsv, write_vcf
+
+@pytest.fixture
+def main(tmp_path, monkeypatch):
+    # main.py loads clinical_annotations.tsv relative to the working directory on import
+    monkeypatch.chdir(REPO_ROOT)
+    module = importlib.import_module("main")
+    registry = AnnotationRegistry(write_tsv(tmp_path / "clinical_annotations.tsv"))
+    monkeypatch.setattr(module, "annotations", registry)
+    return module
+
+@pytest.fixture
+def client(main):
+    with TestClient(main.app) as client:
+        yield client
+
+def ndjson(response):
+    return [json.loads(line) for line in response.text.splitlines()]
+
+def test_batch_streams_one_line_per_patient(client, tmp_path):
+    single = write_vcf(tmp_path / "patient.vcf", ["1\t100\trs9923231\tC\tT\t.\tPASS\t.\tGT\t0/1"])
+    cohort = write_vcf(
+        tmp_path / "cohort.vcf",
+        ["1\t100\trs4680\tG\tA\t.\tPASS\t.\tGT\t0/1\t0/0"],
+        samples=("P1", "P2")
+    )
+    with open(single, "rb") as a, open(cohort, "rb") as b:
+        response = client.post("/predict_drugs/batch", files=[
+            ("files", ("patient.vcf", a.read())),
+            ("files", ("cohort.vcf", b.read())),
+        ])
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    lines = {line["patient"]: line for line in ndjson(response)}
+    assert set(lines) == {"patient.vcf", "cohort.vcf:P1", "cohort.vcf:P2"}
+    assert [p["drug"] for p in lines["patient.vcf"]["predictions"]] == ["Warfarin", "warfarin"]
+    assert lines["cohort.vcf:P1"]["variants"] == ["rs4680"]
+    assert lines["cohort.vcf:P2"]["predictions"] == []
+    assert "message" in lines["cohort.vcf:P2"]
+    assert lines["cohort.vcf:P1"]["annotation_version"] == "2023-05-01"
+
+def test_batch_reports_unparsable_file_without_aborting(client, tmp_path):
+    good = write_vcf(tmp_path / "patient.vcf", ["1\t100\trs4680\tG\tA\t.\tPASS\t.\tGT\t0/1"])
+    with open(good, "rb") as f:
+        response = client.post("/predict_drugs/batch", files=[
+            ("files", ("broken.vcf.gz", b"\x1f\x8bnot gzip")),
+            ("files", ("patient.vcf", f.read())),
+        ])
+    assert response.status_code == 200
+    lines = ndjson(response)
+    assert any(line.get("file") == "broken.vcf.gz" and "error" in line for line in lines)
+    assert any(line.get("patient") == "patient.vcf" and line["predictions"] for line in lines)
+
+def test_batch_rejects_non_vcf_upload(client):
+    response = client.post("/predict_drugs/batch", files=[("files", ("notes.txt", b"rs4680"))])
+    assert response.status_code == 400
+
+def test_calls_match_rsids_and_diplotypes(client):
+    response = client.post("/predict_drugs/calls", json={"variants": ["CYP2D6*1/*4", "HLA-B*15:02", "rs1"]})
+    assert response.status_code == 200
+    body = response.json()
+    assert [p["gene"] for p in body["predictions"]] == ["HLA-B", "CYP2D6"]
+    assert body["variants"] == ["CYP2D6*1/*4", "HLA-B*15:02", "rs1"]
+
+def test_calls_without_matches_explain_why(client):
+    body = client.post("/predict_drugs/calls", json={"variants": ["CYP2D6*10/*10"]}).json()
+    assert body["predictions"] == []
+    assert "message" in body
+
+def test_drug_variants_reverse_lookup(client):
+    body = client.get("/drug_variants/Warfarin", params={"min_level": "1a"}).json()
+    assert body["drug"] == "Warfarin"
+    assert [a["variant"] for a in body["annotations"]] == ["rs9923231", "rs9923231"]
+
+def test_drug_variants_unknown_drug_is_404(client):
+    assert client.get("/drug_variants/aspirin").status_code == 404
+
+def test_invalid_min_level_is_422(client):
+    assert client.get("/drug_variants/warfarin", params={"min_level": "5"}).status_code == 422
+
+def test_reload_endpoint_serves_new_version(client, main):
+    write_tsv(main.annotations.tsv_path, [row[:-1] + ["2025-01-01"] for row in ROWS])
+    response = client.post("/annotations/reload", params={"wait": True})
+    assert response.status_code == 200
+    assert response.json()["version"] == "2025-01-01"
+    assert client.get("/annotations/status").json()["version"] == "2025-01-01"
+
+def test_failed_reload_endpoint_is_422(client, main):
+    write_tsv(main.annotations.tsv_path, [])
+    response = client.post("/annotations/reload", params={"wait": True})
+    assert response.status_code == 422
+    assert client.get("/annotations/status").json()["version"] == "2023-05-01"
+
+def test_predict_drugs_parses_gzipped_upload(client, tmp_path):
+    path = write_vcf(tmp_path / "patient.vcf", [
+        "1\t100\trs4680\tG\tA\t.\tPASS\t.\tGT\t0/1",
+        "2\t300\trs9923231\tC\tT\t.\tPASS\t.\tGT\t1/1",
+    ])
+    with open(path, "rb") as f:
+        data = gzip.compress(f.read())
+    response = client.post("/predict_drugs", params={"limit": 2}, files={"file": ("patient.vcf.gz", data)})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["variants"] == ["rs4680", "rs9923231"]
+    assert [(p["variant"], p["pmid_count"]) for p in body["predictions"]] == [("rs9923231", 60), ("rs9923231", 40)]
+
+def test_predict_drugs_rejects_non_vcf_upload(client):
+    response = client.post("/predict_drugs", files={"file": ("notes.txt", b"rs4680")})
+    assert response.status_code == 400
+
+def test_predict_drugs_rejects_truncated_gzip_upload(client, tmp_path):
+    lines = [f"1\t{pos}\trs{pos}\tG\tA\t.\tPASS\t.\tGT\t0/1" for pos in range(1, 2000)]
+    with open(write_vcf(tmp_path / "patient.vcf", lines), "rb") as f:
+        data = gzip.compress(f.read())
+    response = client.post("/predict_drugs", files={"file": ("patient.vcf.gz", data[:len(data) // 2])})
+    assert response.status_code == 422
+    assert "Truncated" in response.json()["detail"]
+
+def test_predict_drugs_rejects_corrupt_gzip_upload(client):
+    data = b"\x1f\x8b\x08\x00" + b"\xff" * 64
+    response = client.post("/predict_drugs", files={"file": ("patient.vcf.gz", data)})
+    assert response.status_code == 422
+    assert "Corrupt" in response.json()["detail"]
+
+def test_drug_variants_accepts_combination_drug_names(client):
+    for path in ("/drug_variants/sulfamethoxazole / trimethoprim", "/drug_variants/sulfamethoxazole%20%2F%20trimethoprim"):
+        response = client.get(path)
+        assert response.status_code == 200
+        body = response.json()
+        assert body["drug"] == "sulfamethoxazole / trimethoprim"
+        assert [a["variant"] for a in body["annotations"]] == ["rs3909184"]
@@ -0,0 +1,83 @@
+"""Variant-set result cache: canonical keys, LRU bounds and cached matching"""
+
+import pytest
+
+from pharmgkb.annotations import load_annotation_index
+from pharmgkb.cache import ResultCache, variant_set_key
+
+from pharmgkb_helpers import write_tsv
+
+@pytest.fixture
+def index(tmp_path):
+    return load_annotation_index(write_tsv(tmp_path / "clinical_annotations.tsv"), cache_size=8)
+
+def test_key_ignores_order_repeats_and_case():
+    key = variant_set_key(["rs4680", "rs9923231"], "v1", limit=None)
+    assert variant_set_key([" RS9923231", "rs4680", "rs4680"], "v1", limit=None) == key
+    assert variant_set_key(["rs4680"], "v1", limit=None) != key
+
+def test_key_covers_version_and_options():
+    key = variant_set_key(["rs4680"], "v1", limit=None, min_level=None, drugs=None)
+    assert variant_set_key(["rs4680"], "v2", limit=None, min_level=None, drugs=None) != key
+    assert variant_set_key(["rs4680"], "v1", limit=5, min_level=None, drugs=None) != key
+    assert variant_set_key(["rs4680"], "v1", limit=None, min_level="1A", drugs=None) != key
+    assert variant_set_key(["rs4680"], "v1", limit=None, min_level=None, drugs=["warfarin"]) != key
+    assert (variant_set_key(["rs4680"], "v1", drugs=["Warfarin", "codeine"])
+            == variant_set_key(["rs4680"], "v1", drugs=["codeine", "warfarin"]))
+
+def test_lru_evicts_least_recently_used():
+    cache = ResultCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats() == {"size": 2, "maxsize": 2, "hits": 3, "misses": 1, "hit_rate": 0.75}
+
+def test_zero_size_cache_stores_nothing():
+    cache = ResultCache(0)
+    cache.put("a", 1)
+    assert len(cache) == 0 and cache.get("a") is None
+
+def test_repeated_variant_set_is_served_from_cache(index):
+    first = index.match(["rs4680", "rs9923231"], limit=3)
+    again = index.match(["RS9923231", "rs4680", "rs4680"], limit=3)
+    assert again == first
+    assert index.result_cache.hits == 1 and len(index.result_cache) == 1
+
+def test_caller_cannot_corrupt_cached_list(index):
+    index.match(["rs4680"]).clear()
+    assert len(index.match(["rs4680"])) == 2
+
+def test_match_samples_agrees_with_match_and_fills_cache(index):
+    samples = {"P1": ["rs4680"], "P2": ["rs9923231", "CYP2D6*1/*4"], "P3": []}
+    results = index.match_samples(samples, limit=2)
+    assert list(results) == ["P1", "P2", "P3"]
+    assert len(index.result_cache) == 3
+
+    for sample, variants in samples.items():
+        assert results[sample] == index.match(variants, limit=2)
+    assert index.result_cache.hits == 3
+
+def test_match_samples_reuses_cached_sets(index):
+    expected = index.match(["rs4680"], drugs=["warfarin"])
+    results = index.match_samples({"P1": ["rs4680"], "P2": ["rs4680"]}, drugs=["WARFARIN"])
+    assert results == {"P1": expected, "P2": expected}
+    assert index.result_cache.hits == 2
+    # Copies: editing one patient's predictions leaves the other and the cache intact
+    results["P1"][0]["drug"] = "edited"
+    assert results["P2"][0]["drug"] == "warfarin"
+    assert index.match(["rs4680"], drugs=["warfarin"])[0]["drug"] == "warfarin"
+
+def test_mutating_a_result_does_not_change_later_hits(index):
+    first = index.match(["rs4680", "rs9923231"])
+    expected = [dict(prediction) for prediction in first]
+    first[0]["drug"] = "edited"
+    first[1].clear()
+
+    hit = index.match(["rs9923231", "rs4680"])
+    assert hit == expected
+    hit[0]["evidence"] = "4"
+    assert index.match(["rs4680", "rs9923231"]) == expected
+    assert index.match_samples({"P1": ["rs4680", "rs9923231"]})["P1"] == expected
@@ -0,0 +1,70 @@
+"""AnnotationRegistry: validated hot reloads that never leave a gap in service"""
+
+import time
+
+import pytest
+
+from pharmgkb.registry import AnnotationRegistry
+
+from pharmgkb_helpers import ROWS, write_tsv
+
+UPDATED = ROWS + [["1009", "rs1057910", "CYP2C9", "1A", "70.0", "Dosage", "20", "20", "warfarin", "", "2024-06-30"]]
+
+@pytest.fixture
+def tsv(tmp_path):
+    return write_tsv(tmp_path / "clinical_annotations.tsv")
+
+def test_reload_swaps_in_new_index(tsv):
+    registry = AnnotationRegistry(tsv)
+    before = registry.current
+    write_tsv(tsv, UPDATED)
+
+    after = registry.reload()
+    assert registry.current is after and after is not before
+    assert after.version == "2024-06-30"
+    assert after.lookup("rs1057910").tolist() == [len(ROWS)]
+    # A request that took the old index keeps a consistent view
+    assert len(before) == len(ROWS) and len(before.lookup("rs1057910")) == 0
+
+def test_reload_starts_with_empty_result_cache(tsv):
+    registry = AnnotationRegistry(tsv)
+    registry.current.match(["rs4680"])
+    assert len(registry.current.result_cache) == 1
+    registry.reload()
+    assert len(registry.current.result_cache) == 0
+
+@pytest.mark.parametrize("rows", [[], ROWS[:2]])
+def test_rejected_reload_keeps_serving_previous_index(tsv, rows):
+    registry = AnnotationRegistry(tsv)
+    before = registry.current
+    write_tsv(tsv, rows)
+
+    with pytest.raises(ValueError):
+        registry.reload()
+    assert registry.current is before
+    assert registry.status()["last_error"]
+
+def test_unreadable_reload_keeps_serving_previous_index(tsv):
+    registry = AnnotationRegistry(tsv)
+    with open(tsv, "w") as f:
+        f.write("Gene\nCOMT\n")
+    with pytest.raises(ValueError):
+        registry.reload()
+    assert len(registry.current) == len(ROWS)
+
+def test_status_reports_version_and_cache(tsv):
+    status = AnnotationRegistry(tsv).status()
+    assert status["version"] == "2023-05-01"
+    assert status["annotations"] == len(ROWS)
+    assert status["reloading"] is False and status["last_error"] is None
+    assert status["result_cache"]["size"] == 0
+
+def test_watch_reloads_when_the_file_changes(tsv):
+    registry = AnnotationRegistry(tsv)
+    registry.watch(0.02)
+    write_tsv(tsv, UPDATED)
+
+    deadline = time.monotonic() + 5
+    while registry.current.version != "2024-06-30" and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert registry.current.version == "2024-06-30"
@@ -0,0 +1,73 @@
+"""Compiled annotation store: round trip, staleness and TSV fallback"""
+
+import os
+
+import numpy as np
+import pytest
+
+from pharmgkb.annotations import load_annotation_index
+from pharmgkb.store import (
+    StringColumn, build_store, is_store_fresh, load_columns, open_store, read_tsv_columns, take_column
+)
+
+from pharmgkb_helpers import ROWS, write_tsv
+
+@pytest.fixture
+def tsv(tmp_path):
+    return write_tsv(tmp_path / "clinical_annotations.tsv")
+
+def test_string_column_packs_utf8():
+    column = StringColumn.from_values(["rs4680", "", "Stevens–Johnson"])
+    assert len(column) == 3
+    assert list(column) == ["rs4680", "", "Stevens–Johnson"]
+    assert take_column(column, np.array([2, 0])) == ["Stevens–Johnson", "rs4680"]
+
+def test_store_round_trips_every_column(tsv):
+    store = build_store(tsv)
+    assert store.endswith(".pgkb")
+
+    expected = read_tsv_columns(tsv)
+    columns, header = open_store(store)
+    assert header["rows"] == len(ROWS)
+    assert list(columns) == list(expected)
+    for name, column in expected.items():
+        if isinstance(column, StringColumn):
+            assert list(columns[name]) == list(column)
+        else:
+            assert columns[name].dtype == column.dtype
+            assert columns[name].tolist() == column.tolist()
+
+def test_fresh_store_is_preferred(tsv):
+    store = build_store(tsv)
+    assert is_store_fresh(store, tsv)
+    _, source = load_columns(tsv)
+    assert source == store
+
+def test_stale_store_falls_back_to_tsv(tsv):
+    store = build_store(tsv)
+    write_tsv(tsv, ROWS[:3])
+    assert not is_store_fresh(store, tsv)
+
+    columns, source = load_columns(tsv)
+    assert source == tsv
+    assert len(columns["Gene"]) == 3
+
+def test_store_alone_is_served_without_tsv(tsv):
+    store = build_store(tsv)
+    os.remove(tsv)
+    assert is_store_fresh(store, tsv)
+    assert len(load_annotation_index(tsv, store)) == len(ROWS)
+
+def test_unreadable_store_is_ignored(tsv):
+    store = os.path.splitext(tsv)[0] + ".pgkb"
+    with open(store, "wb") as f:
+        f.write(b"not a store")
+    assert not is_store_fresh(store, tsv)
+    assert load_columns(tsv)[1] == tsv
+
+def test_index_from_store_matches_index_from_tsv(tsv):
+    from_tsv = load_annotation_index(tsv).match(["rs4680", "CYP2D6*4", "rs9923231"])
+    build_store(tsv)
+    index = load_annotation_index(tsv)
+    assert index.source.endswith(".pgkb")
+    assert index.match(["rs4680", "CYP2D6*4", "rs9923231"]) == from_tsv
@@ -0,0 +1,39 @@
+"""Normalization of rsIDs, star alleles and diplotype calls"""
+
+import pytest
+
+from pharmgkb.variants import copy_number_fallback, normalize_rsid, normalize_star_allele, parse_haplotype_call
+
+def test_normalize_rsid():
+    assert normalize_rsid(" RS4680 ") == "rs4680"
+    assert normalize_rsid("rs") is None
+    assert normalize_rsid("CYP2D6*4") is None
+
+@pytest.mark.parametrize("value, gene, expected", [
+    ("CYP2D6*4", None, ("CYP2D6", "4")),
+    ("cyp2d6*4xn", None, ("CYP2D6", "4XN")),
+    ("CYP2C19 *17", None, ("CYP2C19", "17")),
+    ("HLA-B*15:02", None, ("HLA-B", "15:02")),
+    ("*4", "CYP2D6", ("CYP2D6", "4")),
+    ("*4", None, None),
+    ("rs4680", None, None),
+])
+def test_normalize_star_allele(value, gene, expected):
+    assert normalize_star_allele(value, gene) == expected
+
+@pytest.mark.parametrize("call, gene", [
+    ("CYP2D6*1/*4", None),
+    ("CYP2D6*1/CYP2D6*4", None),
+    ("CYP2D6 *1|*4", None),
+    ("*1/*4", "CYP2D6"),
+])
+def test_parse_diplotype_spellings(call, gene):
+    assert parse_haplotype_call(call, gene) == [("CYP2D6", "1"), ("CYP2D6", "4")]
+
+def test_parse_drops_unparsable_parts():
+    assert parse_haplotype_call("CYP2C19*2/unknown") == [("CYP2C19", "2")]
+    assert parse_haplotype_call("rs4680") == []
+
+def test_copy_number_fallback():
+    assert copy_number_fallback(("CYP2D6", "2X3")) == ("CYP2D6", "2XN")
+    assert copy_number_fallback(("CYP2D6", "2")) is None
@@ -0,0 +1,127 @@
+"""Streaming VCF readers: plain, gzip/bgzip and multi-sample files"""
+
+import asyncio
+import gzip
+import io
+
+import pytest
+
+from pharmgkb.vcf import (
+    aiter_vcf_records, aiter_vcf_rsids, collect_sample_rsids, has_alt_allele, iter_vcf_records, iter_vcf_rsids
+)
+
+from pharmgkb_helpers import write_vcf
+
+LINES = [
+    "1\t100\trs4680\tG\tA\t.\tPASS\t.\tGT\t0/1",
+    "1\t200\t.\tC\tT\t.\tPASS\t.\tGT\t1/1",
+    "2\t300\trs9923231;COSV1\tC\tT\t.\tPASS\t.\tGT:DP\t1|1:30",
+    "2\t400\tRS1057910\tA\tC\t.\tPASS\t.\tGT\t0/0",
+]
+
+def bgzip(path, data: bytes) -> str:
+    """Write data as several concatenated gzip members, the way bgzip blocks it"""
+    with open(path, "wb") as f:
+        for start in range(0, len(data), 64):
+            f.write(gzip.compress(data[start:start + 64]))
+    return str(path)
+
+def test_records_carry_ids_and_genotypes(tmp_path):
+    samples = []
+    records = list(iter_vcf_records(write_vcf(tmp_path / "sample.vcf", LINES), samples))
+    assert samples == ["NA12878"]
+    assert [(r.chrom, r.pos) for r in records] == [("1", 100), ("1", 200), ("2", 300), ("2", 400)]
+    assert records[1].ids == ()
+    assert records[2].ids == ("rs9923231", "COSV1")
+    assert records[2].genotypes == ("1|1",)
+
+def test_rsids_skip_missing_and_non_dbsnp_ids(tmp_path):
+    path = write_vcf(tmp_path / "sample.vcf", LINES)
+    assert list(iter_vcf_rsids(path)) == ["rs4680", "rs9923231", "RS1057910"]
+
+def test_gzip_and_bgzip_match_plain(tmp_path):
+    plain = write_vcf(tmp_path / "sample.vcf", LINES)
+    with open(plain, "rb") as f:
+        data = f.read()
+    gzipped = tmp_path / "sample.vcf.gz"
+    gzipped.write_bytes(gzip.compress(data))
+    expected = list(iter_vcf_rsids(plain))
+    assert list(iter_vcf_rsids(str(gzipped))) == expected
+    assert list(iter_vcf_rsids(bgzip(tmp_path / "sample.vcf.bgz", data))) == expected
+
+def test_stream_source_is_not_closed(tmp_path):
+    with open(write_vcf(tmp_path / "sample.vcf", LINES), "rb") as f:
+        assert len(list(iter_vcf_rsids(f))) == 3
+        assert not f.closed
+
+def test_truncated_and_crlf_lines(tmp_path):
+    path = tmp_path / "sample.vcf"
+    path.write_bytes(b"#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\r\n1\t100\trs4680\tG\tA\t.\tPASS\t.\r\n1\t200\trs1\r\n")
+    assert list(iter_vcf_rsids(str(path))) == ["rs4680"]
+
+def test_has_alt_allele():
+    assert has_alt_allele("0/1") and has_alt_allele("1|1") and has_alt_allele("2")
+    assert not has_alt_allele("0/0") and not has_alt_allele("./.") and not has_alt_allele("0|.")
+
+def test_multi_sample_sites_count_only_for_carriers(tmp_path):
+    lines = [
+        "1\t100\trs4680\tG\tA\t.\tPASS\t.\tGT\t0/1\t0/0\t./.",
+        "2\t300\trs9923231\tC\tT\t.\tPASS\t.\tGT:DP\t0/0:12\t1|1:30\t0/0:8",
+    ]
+    path = write_vcf(tmp_path / "cohort.vcf", lines, samples=("P1", "P2", "P3"))
+    assert collect_sample_rsids(path) == {"P1": ["rs4680"], "P2": ["rs9923231"], "P3": []}
+
+def test_single_sample_keeps_every_rsid(tmp_path):
+    assert collect_sample_rsids(write_vcf(tmp_path / "sample.vcf", LINES)) == {
+        "NA12878": ["rs4680", "rs9923231", "RS1057910"]
+    }
+
+class Upload:
+    """Minimal stand-in for UploadFile.read(size)"""
+
+    def __init__(self, data: bytes):
+        self._stream = io.BytesIO(data)
+
+    async def read(self, size: int) -> bytes:
+        return self._stream.read(size)
+
+def collect(agen):
+    async def run():
+        return [item async for item in agen]
+    return asyncio.run(run())
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 7, 64, 1 << 20])
+def test_upload_reader_matches_file_reader_for_any_chunking(tmp_path, chunk_size):
+    path = write_vcf(tmp_path / "sample.vcf", LINES)
+    with open(path, "rb") as f:
+        data = f.read()
+    samples = []
+    records = collect(aiter_vcf_records(Upload(data), samples, chunk_size=chunk_size))
+    assert records == list(iter_vcf_records(path))
+    assert samples == ["NA12878"]
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 100, 1 << 20])
+def test_upload_reader_decompresses_bgzip_chunks(tmp_path, chunk_size):
+    path = write_vcf(tmp_path / "sample.vcf", LINES)
+    with open(path, "rb") as f:
+        data = f.read()
+    with open(bgzip(tmp_path / "sample.vcf.gz", data), "rb") as f:
+        compressed = f.read()
+    assert collect(aiter_vcf_rsids(Upload(compressed), chunk_size=chunk_size)) == list(iter_vcf_rsids(path))
+
+def test_upload_reader_handles_missing_final_newline_and_tiny_uploads():
+    data = b"#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n1\t100\trs4680\tG\tA\t.\tPASS\t."
+    assert collect(aiter_vcf_rsids(Upload(data), chunk_size=3)) == ["rs4680"]
+    assert collect(aiter_vcf_rsids(Upload(b"#"))) == []
+    assert collect(aiter_vcf_rsids(Upload(b""))) == []
+
+@pytest.mark.parametrize("chunk_size", [7, 1 << 20])
+def test_upload_reader_rejects_truncated_gzip(tmp_path, chunk_size):
+    with open(write_vcf(tmp_path / "sample.vcf", LINES * 50), "rb") as f:
+        compressed = gzip.compress(f.read())
+    with pytest.raises(ValueError, match="Truncated"):
+        collect(aiter_vcf_rsids(Upload(compressed[:len(compressed) // 2]), chunk_size=chunk_size))
+
+def test_upload_reader_rejects_corrupt_gzip():
+    with pytest.raises(ValueError, match="Corrupt"):
+        collect(aiter_vcf_rsids(Upload(b"\x1f\x8b\x08\x00" + b"\xff" * 64)))
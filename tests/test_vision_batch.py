@@ -0,0 +1,79 @@
+"""/predict/batch: NDJSON records per image, zip expansion and the summary line"""
+
+import io
+import json
+import zipfile
+
+import pytest
+from fastapi.testclient import TestClient
+
+from vision_api import server
+from vision_api.result_cache import result_cache
+
+from vision_helpers import png_bytes
+
+@pytest.fixture
+def client():
+    result_cache.clear()
+    with TestClient(server.app) as client:
+        yield client
+    result_cache.clear()
+
+def zip_bytes(members) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+def post_batch(client, files):
+    response = client.post("/predict/batch", files=[("files", file) for file in files])
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    return lines[:-1], lines[-1]["summary"]
+
+def test_files_and_zip_members_are_analyzed(client):
+    archive = zip_bytes({
+        "scans/a.png": png_bytes(1),
+        "scans/b.png": png_bytes(2),
+        "__MACOSX/scans/._a.png": b"metadata",
+        "scans/.DS_Store": b"metadata",
+    })
+    records, summary = post_batch(client, [("one.png", png_bytes(3)), ("set.zip", archive)])
+
+    assert sorted(record["filename"] for record in records) == ["one.png", "scans/a.png", "scans/b.png"]
+    assert sorted(record["index"] for record in records) == [0, 1, 2]
+    assert all(record["status"] == "success" and record["analysis"]["success"] for record in records)
+    assert summary["total"] == 3 and summary["succeeded"] == 3 and summary["failed"] == 0
+
+def test_bad_member_is_reported_as_error(client):
+    archive = zip_bytes({"good.png": png_bytes(4), "corrupt.png": b"not an image"})
+    records, summary = post_batch(client, [("set.zip", archive), ("renamed.png", b"%PDF-1.4")])
+
+    by_name = {record["filename"]: record for record in records}
+    assert by_name["good.png"]["status"] == "success"
+    for name in ("corrupt.png", "renamed.png"):
+        assert by_name[name]["status"] == "error"
+        assert "Failed to load image" in by_name[name]["error"]
+        assert "analysis" not in by_name[name]
+    assert summary["succeeded"] == 1 and summary["failed"] == 2
+
+def test_invalid_zip_is_reported_as_error(client):
+    records, summary = post_batch(client, [("broken.zip", b"not a zip")])
+    assert records[0]["status"] == "error"
+    assert "Invalid zip archive" in records[0]["error"]
+    assert summary["failed"] == 1
+
+def test_repeat_uploads_share_the_predict_cache(client):
+    image = png_bytes(5)
+    client.post("/predict", files={"file": ("same.png", image, "image/png")})
+    records, summary = post_batch(client, [("same.png", image)])
+    assert records[0]["cached"] == "memory"
+    assert summary["cached"] == 1
+
+def test_too_many_images_is_rejected(client, monkeypatch):
+    monkeypatch.setattr(server, "PREDICT_BATCH_MAX_FILES", 2)
+    archive = zip_bytes({f"{i}.png": png_bytes(i) for i in range(3)})
+    response = client.post("/predict/batch", files=[("files", ("set.zip", archive))])
+    assert response.status_code == 413
@@ -0,0 +1,95 @@
+"""DICOM ingestion: detection, header metadata, middle-frame decoding and windowing"""
+
+import io
+
+import numpy as np
+import pytest
+from pydicom.dataset import Dataset, FileMetaDataset
+from pydicom.uid import ExplicitVRLittleEndian, generate_uid
+
+from vision_api.dicom import apply_window, decode_dicom, is_dicom, routing_hint, read_header
+from vision_api.inference import classify, determine_findings
+
+def dicom_bytes(frames: np.ndarray, **fields) -> bytes:
+    """Uncompressed MONOCHROME2 DICOM with one 16-bit frame per leading index"""
+    meta = FileMetaDataset()
+    meta.MediaStorageSOPClassUID = "1.2.840.10008.5.1.4.1.1.4"
+    meta.MediaStorageSOPInstanceUID = generate_uid()
+    meta.TransferSyntaxUID = ExplicitVRLittleEndian
+
+    ds = Dataset()
+    ds.file_meta = meta
+    ds.SOPClassUID = meta.MediaStorageSOPClassUID
+    ds.SOPInstanceUID = meta.MediaStorageSOPInstanceUID
+    ds.Modality = "MR"
+    ds.BodyPartExamined = "HEAD"
+    ds.PhotometricInterpretation = "MONOCHROME2"
+    ds.SamplesPerPixel = 1
+    ds.Rows, ds.Columns = frames.shape[1:]
+    ds.NumberOfFrames = frames.shape[0]
+    ds.BitsAllocated = ds.BitsStored = 16
+    ds.HighBit = 15
+    ds.PixelRepresentation = 0
+    for name, value in fields.items():
+        setattr(ds, name, value)
+    ds.PixelData = frames.astype(np.uint16).tobytes()
+
+    buffer = io.BytesIO()
+    ds.save_as(buffer, enforce_file_format=True)
+    return buffer.getvalue()
+
+def test_detects_dicom_by_magic_or_name():
+    data = dicom_bytes(np.zeros((1, 4, 4)))
+    assert is_dicom(data)
+    assert is_dicom(b"no preamble", "scan.DCM")
+    assert not is_dicom(b"\x89PNG" + b"\0" * 200, "scan.png")
+
+def test_header_is_read_without_pixels():
+    ds = read_header(dicom_bytes(np.zeros((1, 4, 4))))
+    assert "PixelData" not in ds
+    assert routing_hint(ds) == "mri head"
+
+def test_decodes_the_middle_frame():
+    frames = np.stack([np.full((8, 8), value) for value in (0, 1000, 2000)])
+    frames[:, 0, 0] = 0  # a dark corner so each frame has a range to window over
+    image, metadata, hint = decode_dicom(dicom_bytes(frames))
+
+    assert metadata["NumberOfFrames"] == 3
+    assert metadata["analyzed_frame"] == 1
+    assert metadata["Modality"] == "MR"
+    assert hint == "mri head"
+    assert image.mode == "RGB" and image.size == (8, 8)
+    assert np.asarray(image)[4, 4, 0] == 255
+
+def test_window_clips_and_monochrome1_inverts():
+    frame = np.array([[0, 50, 100, 150]], dtype=np.uint16)
+    assert apply_window(frame, center=100, width=100).tolist() == [[0, 0, 127, 255]]
+    assert apply_window(frame, center=100, width=100, invert=True).tolist() == [[255, 255, 127, 0]]
+
+def ct_frames():
+    frames = np.zeros((1, 16, 16))
+    frames[0, 4:12, 4:12] = 1200
+    return frames
+
+@pytest.mark.parametrize("body_part, category", [("CHEST", "CT"), ("STOMACH", "CT Abdomen")])
+def test_ct_dicom_routes_through_ct_findings(body_part, category):
+    data = dicom_bytes(ct_frames(), Modality="CT", BodyPartExamined=body_part)
+    assert routing_hint(read_header(data)) == f"ct {body_part.lower()}"
+
+    result = classify(data, "series.dcm")
+    assert result["success"]
+    assert result["image_info"]["category"] == category
+    assert "Radiology" in result["specialty_analysis"]
+
+FEATURES = {"brightness": 100, "contrast": 50, "texture_complexity": 20}
+
+@pytest.mark.parametrize("name, image_type", [
+    ("ct_scan.png", "CT"),
+    ("head-CT.jpg", "CT"),
+    ("scan.dcm ct head", "CT"),
+    ("picture.png", "Medical Image"),
+    ("octopus.png", "Medical Image"),
+    ("pathology_ct.png", "Histopathology"),
+])
+def test_ct_routing_matches_whole_words_only(name, image_type):
+    assert determine_findings(FEATURES, name, "0" * 32)["image_type"] == image_type
@@ -0,0 +1,80 @@
+"""InferenceExecutor: per-call timeout, bounded pending calls and the 504 mapping"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from vision_api import server
+from vision_api.executor import InferenceExecutor, InferenceTimeout
+from vision_api.result_cache import result_cache
+
+from vision_helpers import png_bytes
+
+def test_timeout_releases_its_slot():
+    executor = InferenceExecutor(max_workers=0, timeout=0.05, max_pending=1)
+
+    async def scenario():
+        with pytest.raises(InferenceTimeout):
+            await executor.run(time.sleep, 0.5)
+        # The timed-out call still holds a worker thread, but not the pending slot
+        return await asyncio.wait_for(executor.run(abs, -3), 1)
+
+    assert asyncio.run(scenario()) == 3
+
+def test_pending_calls_are_bounded():
+    executor = InferenceExecutor(max_workers=0, timeout=5, max_pending=2)
+    lock = threading.Lock()
+    running = {"now": 0, "peak": 0}
+
+    def work():
+        with lock:
+            running["now"] += 1
+            running["peak"] = max(running["peak"], running["now"])
+        time.sleep(0.05)
+        with lock:
+            running["now"] -= 1
+
+    async def scenario():
+        await asyncio.gather(*[executor.run(work) for _ in range(6)])
+
+    asyncio.run(scenario())
+    assert running["peak"] == 2
+
+def test_process_pool_timeout_keeps_pool_usable():
+    executor = InferenceExecutor(max_workers=1, timeout=0.2, max_pending=2)
+
+    async def scenario():
+        with pytest.raises(InferenceTimeout):
+            await executor.run(time.sleep, 1)
+        # The only worker is busy until the sleep ends; later calls still get through
+        executor.timeout = 30
+        return await executor.run(abs, -3)
+
+    try:
+        assert asyncio.run(scenario()) == 3
+    finally:
+        executor.shutdown()
+
+def test_predict_times_out_with_504_and_recovers(monkeypatch):
+    classify = server.classify
+
+    def slow_classify(file_content, filename):
+        if filename == "slow.png":
+            time.sleep(0.5)
+        return classify(file_content, filename)
+
+    result_cache.clear()
+    monkeypatch.setattr(server, "classify", slow_classify)
+    monkeypatch.setattr(server.inference_executor, "timeout", 0.1)
+    with TestClient(server.app) as client:
+        response = client.post("/predict", files={"file": ("slow.png", png_bytes(1), "image/png")})
+        assert response.status_code == 504
+        assert "timed out" in response.json()["detail"]
+
+        response = client.post("/predict", files={"file": ("fast.png", png_bytes(2), "image/png")})
+        assert response.status_code == 200
+        assert response.json()["analysis"]["success"]
+    result_cache.clear()
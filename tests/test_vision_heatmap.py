@@ -0,0 +1,90 @@
+"""/predict-with-heatmap: response shape must not depend on call order or cache state"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from vision_api import server
+from vision_api.heatmap import heatmap_cache
+from vision_api.result_cache import result_cache
+from vision_api.scheduler import MicroBatchScheduler
+
+from vision_helpers import fake_classify_batch, png_bytes
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    result_cache.clear()
+    heatmap_cache.clear()
+    yield
+    result_cache.clear()
+    heatmap_cache.clear()
+
+@pytest.fixture
+def model_client(monkeypatch):
+    """Server with the zero-shot model enabled (a stand-in batch function)"""
+    monkeypatch.setattr(server, "zero_shot_scheduler", MicroBatchScheduler(fake_classify_batch, name="test"))
+    monkeypatch.setattr(server, "zero_shot_signature", lambda: "fake-biomedclip", raising=False)
+    with TestClient(server.app) as client:
+        yield client
+
+@pytest.fixture
+def client():
+    with TestClient(server.app) as client:
+        yield client
+
+def post(client, path, data, filename="scan.png"):
+    response = client.post(path, files={"file": (filename, data, "image/png")})
+    assert response.status_code == 200
+    return response.json()
+
+def test_heatmap_after_predict_keeps_model_predictions(model_client):
+    image = png_bytes(1)
+    post(model_client, "/predict", image)
+
+    after_predict = post(model_client, "/predict-with-heatmap", image)["analysis"]
+    fresh = post(model_client, "/predict-with-heatmap", png_bytes(2))["analysis"]
+
+    assert after_predict["model_predictions"]["top_predictions"]
+    assert after_predict["heatmap"]["method"] == "attention"
+    assert set(after_predict) == set(fresh)
+
+def test_cached_heatmap_result_keeps_model_predictions(model_client):
+    image = png_bytes(3)
+    post(model_client, "/predict", image)
+    post(model_client, "/predict-with-heatmap", image)
+
+    cached = post(model_client, "/predict-with-heatmap", image)
+    assert cached["cached"] == "memory"
+    assert "model_predictions" in cached["analysis"]
+    assert cached["analysis"]["heatmap_available"]
+
+def test_heatmap_after_evicted_heatmap_reruns_model(model_client):
+    image = png_bytes(4)
+    post(model_client, "/predict", image)
+    heatmap_cache.clear()
+
+    analysis = post(model_client, "/predict-with-heatmap", image)["analysis"]
+    assert "model_predictions" in analysis
+    assert analysis["heatmap"]["method"] == "attention"
+
+def test_heatmap_does_not_change_cached_predict_result(model_client):
+    image = png_bytes(5)
+    post(model_client, "/predict", image)
+    post(model_client, "/predict-with-heatmap", image)
+
+    analysis = post(model_client, "/predict", image)["analysis"]
+    assert "heatmap" not in analysis
+
+def test_gradient_heatmap_without_model(client):
+    image = png_bytes(6)
+    post(client, "/predict", image)
+
+    analysis = post(client, "/predict-with-heatmap", image)["analysis"]
+    assert analysis["heatmap"]["method"] == "gradient_energy"
+    assert analysis["attention_regions"]
+    assert "model_predictions" not in analysis
+
+def test_result_without_model_predictions_is_not_cacheable(monkeypatch):
+    monkeypatch.setattr(server, "zero_shot_scheduler", MicroBatchScheduler(fake_classify_batch, name="test"))
+    assert not server.is_cacheable({"success": True})
+    assert not server.is_cacheable({"success": True, "model_predictions": {"error": "Model prediction failed"}})
+    assert server.is_cacheable({"success": True, "model_predictions": {"top_predictions": []}})
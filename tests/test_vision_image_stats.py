@@ -0,0 +1,148 @@
+"""Fused feature kernel (image_stats) against the reference numpy implementation"""
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from vision_api.image_stats import (
+    APPROXIMATED_FEATURES, compute_features, compute_features_pyramid, compute_features_tiled, iter_strips,
+    select_stats_mode, strip_rows
+)
+from vision_api.inference import compute_image_statistics, compute_texture_features
+
+# Moments are summed as exact integers; the gradient runs in float32
+MOMENT_RTOL = 1e-12
+TEXTURE_RTOL = 1e-5
+
+def random_image(size, mode="RGB", seed=0):
+    width, height = size
+    rng = np.random.default_rng(seed)
+    shape = (height, width, 3) if mode == "RGB" else (height, width)
+    return Image.fromarray(rng.integers(0, 256, shape, dtype=np.uint8), mode)
+
+def reference(image):
+    array = np.array(image)
+    features = compute_image_statistics(array, image)
+    if min(array.shape[:2]) > 1:
+        features.update(compute_texture_features(array))
+    else:
+        # np.gradient needs two samples per axis; a single row or column only varies along the other one
+        gray = array.mean(axis=2) if array.ndim == 3 else array.astype(np.float64)
+        features["texture_complexity"] = np.mean(np.abs(np.gradient(gray.ravel()))) if gray.size > 1 else 0.0
+        features["is_grayscale"] = compute_texture_features(np.repeat(np.repeat(array, 2, 0), 2, 1))["is_grayscale"]
+    return features
+
+def assert_matches(features, expected):
+    for name in ("brightness", "contrast", "color_variance"):
+        assert features[name] == pytest.approx(float(expected[name]), rel=MOMENT_RTOL, abs=1e-9), name
+    assert features["texture_complexity"] == pytest.approx(float(expected["texture_complexity"]), rel=TEXTURE_RTOL)
+    assert features["is_grayscale"] == bool(expected["is_grayscale"])
+
+SIZES = [(64, 48), (37, 2), (37, 3), (1, 40), (40, 1), (2, 2)]
+
+@pytest.mark.parametrize("mode", ["L", "RGB"])
+@pytest.mark.parametrize("size", SIZES)
+def test_fused_kernel_matches_reference(size, mode):
+    image = random_image(size, mode)
+    assert_matches(compute_features(np.asarray(image)), reference(image))
+
+@pytest.mark.parametrize("mode", ["L", "RGB"])
+@pytest.mark.parametrize("size", SIZES)
+@pytest.mark.parametrize("tile_pixels", [1, 80, 150])
+def test_strip_boundaries_match_reference(size, mode, tile_pixels):
+    # 1 pixel per tile still gives two-row strips; the others give 2-4 row strips on these widths
+    image = random_image(size, mode, seed=1)
+    expected = reference(image)
+    assert_matches(compute_features(np.asarray(image), tile_pixels=tile_pixels), expected)
+    assert_matches(compute_features_tiled(image, tile_pixels=tile_pixels), expected)
+
+def test_gray_rgb_image_matches_reference():
+    y, x = np.mgrid[0:50, 0:60]
+    array = np.clip(128 + 60 * np.sin(x / 7.0) * np.cos(y / 5.0), 0, 255).astype(np.uint8)
+    image = Image.fromarray(np.stack([array, array, array], axis=-1))
+    expected = reference(image)
+    assert expected["is_grayscale"]
+    assert_matches(compute_features_tiled(image, tile_pixels=120), expected)
+
+@pytest.mark.parametrize("mode", ["L", "RGB"])
+def test_iter_strips_covers_the_image_with_one_row_halos(mode):
+    image = random_image((23, 11), mode)
+    array = np.asarray(image)
+    rows = strip_rows(image.size, 23 * 3)
+    cores = []
+    for strip, start, stop in iter_strips(image, rows):
+        top = len(np.concatenate(cores)) if cores else 0
+        halo_top = max(top - 1, 0)
+        assert np.array_equal(strip, array[halo_top:min(top + stop - start + 1, 11)])
+        assert start == top - halo_top
+        cores.append(strip[start:stop])
+    assert np.array_equal(np.concatenate(cores), array)
+
+def test_pyramid_reports_relative_error():
+    image = random_image((300, 200))
+    features, info = compute_features_pyramid(image, max_pixels=100 * 100)
+    assert info["mode"] == "pyramid"
+    assert info["scale"] == pytest.approx(1 / 3)
+    assert info["analyzed_size"] == [100, 67]
+    errors = info["approximation"]["relative_error"]
+    assert set(errors) == set(APPROXIMATED_FEATURES)
+    # Box filtering removes most of the gradient energy of pure noise, and the estimate says so
+    assert errors["texture_complexity"] > 0.3
+    assert set(features) >= set(APPROXIMATED_FEATURES)
+
+def test_pyramid_without_reduction_is_exact():
+    image = random_image((50, 50))
+    features, info = compute_features_pyramid(image, max_pixels=50 * 50)
+    assert info["scale"] == 1 and info["approximation"] is None
+    assert_matches(features, reference(image))
+
+def test_auto_mode_is_exact_at_any_size():
+    assert select_stats_mode((100, 100), "auto", max_pixels=10_000) == "full"
+    assert select_stats_mode((101, 100), "auto", max_pixels=10_000) == "tiled"
+    assert select_stats_mode((101, 100), "pyramid", max_pixels=10_000) == "pyramid"
+    assert select_stats_mode((101, 100), "bogus", max_pixels=10_000) == "tiled"
+    # A single row or column has no strips to stream
+    assert select_stats_mode((100_000, 1), "auto", max_pixels=10_000) == "full"
+
+@pytest.mark.parametrize("pattern", ["noise", "checkerboard", "stripes"])
+def test_float32_gradient_stays_within_tolerance_of_float64(pattern):
+    # Worst cases for float32 accumulation: a large image of full-range steps
+    size = 1024
+    if pattern == "noise":
+        array = np.random.default_rng(7).integers(0, 256, (size, size, 3), dtype=np.uint8)
+    else:
+        y, x = np.mgrid[0:size, 0:size]
+        step = (x + y) % 2 if pattern == "checkerboard" else x % 2
+        array = np.repeat((step * 255).astype(np.uint8)[:, :, None], 3, axis=2)
+    expected = compute_texture_features(array)["texture_complexity"]
+    assert compute_features(array)["texture_complexity"] == pytest.approx(expected, rel=TEXTURE_RTOL)
+    assert compute_features_tiled(Image.fromarray(array), tile_pixels=size * 3)["texture_complexity"] == pytest.approx(
+        expected, rel=TEXTURE_RTOL
+    )
+
+def wrapped_channels(red_minus_green):
+    """RGB image with G=B=100 and R = G + red_minus_green (per pixel)"""
+    green = np.full(red_minus_green.shape, 100, dtype=np.int16)
+    return np.stack([green + red_minus_green, green, green], axis=-1).astype(np.uint8)
+
+def test_grayscale_uses_wrapping_uint8_differences():
+    # R is G-1 on half the pixels: |R-G| <= 1, but the uint8 difference wraps to 255 there
+    offsets = np.where(np.arange(40 * 30).reshape(30, 40) % 2 == 0, -1, 0)
+    array = wrapped_channels(offsets)
+    assert not compute_texture_features(array)["is_grayscale"]
+    assert compute_features(array)["is_grayscale"] is False
+
+def test_grayscale_with_constant_channel_offset():
+    # A constant R-G offset has zero spread, wrapped or not, so the reference calls it grayscale
+    array = wrapped_channels(np.full((30, 40), -60))
+    assert compute_texture_features(array)["is_grayscale"]
+    assert compute_features(array)["is_grayscale"] is True
+    assert compute_features_tiled(Image.fromarray(array), tile_pixels=80)["is_grayscale"] is True
+
+@pytest.mark.parametrize("spread, grayscale", [(9, True), (11, False)])
+def test_grayscale_threshold_matches_reference(spread, grayscale):
+    # Offsets of 0 or 2*spread on alternating pixels: a standard deviation of exactly `spread`
+    offsets = (np.arange(30 * 40).reshape(30, 40) % 2) * spread * 2
+    array = wrapped_channels(offsets)
+    assert bool(compute_texture_features(array)["is_grayscale"]) is grayscale
+    assert compute_features(array)["is_grayscale"] is grayscale
@@ -0,0 +1,87 @@
+"""On-disk label embedding cache (zero_shot.load_label_features) with a stand-in text tower"""
+
+import os
+
+import numpy as np
+import pytest
+
+# The text tower is torch-only (optional for the rest of the vision API)
+torch = pytest.importorskip("torch")
+
+from vision_api import zero_shot  # noqa: E402
+from vision_api.zero_shot import PROMPT_TEMPLATES, label_cache_path, load_label_features, read_label_cache  # noqa: E402
+
+LABELS = ["pneumonia", "normal chest", "fracture"]
+
+class FakeTextModel(torch.nn.Module):
+    """encode_text sums token embeddings; counts how often the text tower runs"""
+
+    def __init__(self, dim=8):
+        super().__init__()
+        generator = torch.Generator().manual_seed(0)
+        self.embedding = torch.nn.Parameter(torch.randn(256, dim, generator=generator))
+        self.calls = 0
+
+    def encode_text(self, tokens):
+        self.calls += 1
+        return self.embedding[tokens].sum(dim=1)
+
+def tokenizer(prompts):
+    return torch.tensor([[ord(char) % 256 for char in prompt[:12].ljust(12)] for prompt in prompts])
+
+@pytest.fixture
+def model():
+    return FakeTextModel()
+
+def test_cache_key_covers_model_labels_and_templates(tmp_path):
+    path = label_cache_path(str(tmp_path), "biomedclip|none", LABELS)
+    assert os.path.dirname(path) == str(tmp_path)
+    assert label_cache_path(str(tmp_path), "biomedclip|none", list(LABELS)) == path
+    assert label_cache_path(str(tmp_path), "biomedclip|int8", LABELS) != path
+    assert label_cache_path(str(tmp_path), "biomedclip|none", LABELS[:2]) != path
+    assert label_cache_path(str(tmp_path), "biomedclip|none", LABELS[::-1]) != path
+    assert label_cache_path(str(tmp_path), "biomedclip|none", LABELS, PROMPT_TEMPLATES[:1]) != path
+
+def test_miss_encodes_and_hit_skips_the_text_tower(tmp_path, model):
+    features = load_label_features(model, tokenizer, "fake", str(tmp_path), LABELS)
+    assert features.shape == (3, 8) and features.dtype == np.float32
+    assert np.allclose(np.linalg.norm(features, axis=1), 1)
+    assert model.calls == 1
+
+    again = load_label_features(model, tokenizer, "fake", str(tmp_path), LABELS)
+    assert model.calls == 1
+    assert np.array_equal(again, features)
+
+def test_write_leaves_only_the_final_file(tmp_path, model):
+    load_label_features(model, tokenizer, "fake", str(tmp_path / "labels"), LABELS)
+    assert os.listdir(tmp_path / "labels") == [os.path.basename(label_cache_path(str(tmp_path), "fake", LABELS))]
+
+def test_failed_write_never_leaves_a_partial_cache_file(tmp_path, model, monkeypatch):
+    def broken_save(f, array):
+        f.write(b"\x93NUMPY partial")
+        raise OSError("disk full")
+
+    monkeypatch.setattr(zero_shot.np, "save", broken_save)
+    with pytest.raises(OSError):
+        load_label_features(model, tokenizer, "fake", str(tmp_path), LABELS)
+    assert not os.path.exists(label_cache_path(str(tmp_path), "fake", LABELS))
+
+@pytest.mark.parametrize("stored", [
+    np.zeros((2, 8), dtype=np.float32),  # another label count
+    np.zeros(24, dtype=np.float32),      # not a matrix
+])
+def test_wrong_shaped_cache_is_ignored_and_replaced(tmp_path, model, stored):
+    path = label_cache_path(str(tmp_path), "fake", LABELS)
+    np.save(path, stored)
+    assert read_label_cache(path, len(LABELS)) is None
+
+    features = load_label_features(model, tokenizer, "fake", str(tmp_path), LABELS)
+    assert model.calls == 1
+    assert np.array_equal(np.load(path), features)
+
+def test_unreadable_cache_is_ignored(tmp_path):
+    path = label_cache_path(str(tmp_path), "fake", LABELS)
+    with open(path, "wb") as f:
+        f.write(b"not numpy")
+    assert read_label_cache(path, len(LABELS)) is None
+    assert read_label_cache(str(tmp_path / "missing.npy"), len(LABELS)) is None
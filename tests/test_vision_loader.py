@@ -0,0 +1,30 @@
+"""BiomedCLIP loader settings (no model weights are loaded)"""
+
+import logging
+
+import pytest
+
+from vision_api import loader
+from vision_api.loader import resolve_quantization
+
+@pytest.mark.parametrize("value, expected", [("none", "none"), ("int8", "int8"), (" INT8 ", "int8")])
+def test_supported_quantization(value, expected):
+    assert resolve_quantization(value) == expected
+
+@pytest.mark.parametrize("value", ["int4", "fp16", "", "8"])
+def test_unknown_quantization_falls_back_to_fp32(value, caplog):
+    with caplog.at_level(logging.WARNING, logger="vision_api.loader"):
+        assert resolve_quantization(value) == "none"
+    assert "Unknown quantization" in caplog.text
+
+def test_unknown_quantization_is_not_reported_or_cached_as_real(monkeypatch):
+    pytest.importorskip("torch")
+    monkeypatch.setattr(loader, "QUANTIZE", "int4")
+    monkeypatch.setattr(loader, "MODEL_BACKEND", "torch")
+    try:
+        # The loader is a singleton; re-running __init__ re-reads the settings
+        info = loader.BiomedCLIPLoader().get_model_info()
+        assert info["quantization"] == "none"
+    finally:
+        monkeypatch.undo()
+        loader.BiomedCLIPLoader()
@@ -0,0 +1,42 @@
+"""Content-addressed result cache: keys, LRU eviction and the disk tier"""
+
+from vision_api.result_cache import ResultCache, content_key
+
+def test_key_depends_on_bytes_and_params_not_param_order():
+    key = content_key(b"scan", endpoint="predict", filename="a.png")
+    assert key == content_key(b"scan", filename="a.png", endpoint="predict")
+    assert key != content_key(b"scan!", endpoint="predict", filename="a.png")
+    assert key != content_key(b"scan", endpoint="predict", filename="b.png")
+
+def test_memory_tier_is_lru():
+    cache = ResultCache(maxsize=2, directory="")
+    cache.put("a", {"n": 1})
+    cache.put("b", {"n": 2})
+    assert cache.get("a") == ({"n": 1}, "memory")
+    cache.put("c", {"n": 3})
+
+    assert cache.get("b") == (None, None)
+    assert cache.get("a")[0] == {"n": 1}
+    stats = cache.stats()
+    assert stats["size"] == 2 and stats["misses"] == 1
+
+def test_disk_tier_survives_a_new_cache(tmp_path):
+    ResultCache(maxsize=4, directory=str(tmp_path)).put("abcdef", {"n": 1})
+
+    restarted = ResultCache(maxsize=4, directory=str(tmp_path))
+    assert restarted.get("abcdef") == ({"n": 1}, "disk")
+    # Promoted to memory on the first disk hit
+    assert restarted.get("abcdef") == ({"n": 1}, "memory")
+
+def test_unreadable_disk_entry_is_a_miss(tmp_path):
+    cache = ResultCache(maxsize=0, directory=str(tmp_path))
+    cache.put("abcdef", {"n": 1})
+    with open(cache._path("abcdef"), "w") as f:
+        f.write("{truncated")
+    assert cache.get("abcdef") == (None, None)
+
+def test_disk_tier_is_pruned(tmp_path):
+    cache = ResultCache(maxsize=0, directory=str(tmp_path), disk_max=10)
+    for i in range(25):
+        cache.put(f"{i:04x}key", {"n": i})
+    assert len(list(cache._disk_files())) <= 10
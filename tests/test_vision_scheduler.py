@@ -0,0 +1,106 @@
+"""MicroBatchScheduler: coalescing, per-item failures and batch failures"""
+
+import asyncio
+import threading
+
+import pytest
+
+from vision_api.scheduler import MicroBatchScheduler
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+async def submit_all(scheduler, items):
+    try:
+        return await asyncio.gather(*(scheduler.submit(item) for item in items), return_exceptions=True)
+    finally:
+        await scheduler.shutdown()
+
+def test_concurrent_items_share_batches():
+    sizes = []
+
+    def double(items):
+        sizes.append(len(items))
+        return [item * 2 for item in items]
+
+    scheduler = MicroBatchScheduler(double, max_batch_size=4, max_wait_ms=50, name="test")
+    results = run(submit_all(scheduler, list(range(10))))
+
+    assert results == [item * 2 for item in range(10)]
+    assert max(sizes) == 4 and sum(sizes) == 10
+    info = scheduler.get_info()
+    assert info["items"] == 10 and info["batches"] == len(sizes)
+
+def test_item_exception_only_fails_that_item():
+    def check(items):
+        return [ValueError(f"bad {item}") if item < 0 else item for item in items]
+
+    scheduler = MicroBatchScheduler(check, max_batch_size=8, max_wait_ms=20, name="test")
+    results = run(submit_all(scheduler, [1, -1, 2]))
+
+    assert results[0] == 1 and results[2] == 2
+    assert isinstance(results[1], ValueError)
+
+def test_batch_failure_fails_every_item():
+    def broken(items):
+        raise RuntimeError("model crashed")
+
+    scheduler = MicroBatchScheduler(broken, max_batch_size=8, max_wait_ms=20, name="test")
+    results = run(submit_all(scheduler, [1, 2]))
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert scheduler.get_info()["failed_batches"] >= 1
+
+def test_wrong_result_count_is_a_batch_failure():
+    scheduler = MicroBatchScheduler(lambda items: items[:1], max_batch_size=8, max_wait_ms=20, name="test")
+    results = run(submit_all(scheduler, [1, 2]))
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+def test_single_item_waits_at_most_max_wait():
+    scheduler = MicroBatchScheduler(lambda items: items, max_batch_size=16, max_wait_ms=5, name="test")
+    assert run(submit_all(scheduler, ["only"])) == ["only"]
+    assert scheduler.get_info()["queue_wait_ms"]["max"] < 1000
+
+@pytest.mark.parametrize("max_batch_size", [1, 3])
+def test_batch_size_limit_is_respected(max_batch_size):
+    sizes = []
+
+    def record(items):
+        sizes.append(len(items))
+        return items
+
+    scheduler = MicroBatchScheduler(record, max_batch_size=max_batch_size, max_wait_ms=20, name="test")
+    run(submit_all(scheduler, list(range(7))))
+    assert max(sizes) <= max_batch_size
+
+def test_shutdown_fails_the_running_batch_and_the_queue():
+    started, release = threading.Event(), threading.Event()
+
+    def blocking(items):
+        started.set()
+        release.wait(5)
+        return items
+
+    async def scenario():
+        scheduler = MicroBatchScheduler(blocking, max_batch_size=2, max_wait_ms=1, name="test")
+        tasks = [asyncio.ensure_future(scheduler.submit(item)) for item in range(5)]
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        stopping = asyncio.ensure_future(scheduler.shutdown())
+        await asyncio.sleep(0.01)
+        release.set()
+        await stopping
+        return await asyncio.wait_for(asyncio.gather(*tasks, return_exceptions=True), 1)
+
+    results = run(scenario())
+    assert all(isinstance(result, RuntimeError) and "shut down" in str(result) for result in results)
+
+def test_shutdown_fails_a_batch_still_being_collected():
+    scheduler = MicroBatchScheduler(lambda items: items, max_batch_size=8, max_wait_ms=10_000, name="test")
+
+    async def scenario():
+        tasks = [asyncio.ensure_future(scheduler.submit(item)) for item in range(3)]
+        await asyncio.sleep(0.05)
+        await scheduler.shutdown()
+        return await asyncio.wait_for(asyncio.gather(*tasks, return_exceptions=True), 1)
+
+    assert all(isinstance(result, RuntimeError) for result in run(scenario()))
@@ -0,0 +1,59 @@
+"""Tiled whole-slide analysis: tissue filtering, reader lifetime and /predict-slide cleanup"""
+
+import io
+import os
+import tempfile
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from vision_api import server
+from vision_api.slide import SlideReader, analyze_tiles, plan_slide
+
+def slide_image(width: int = 1536, height: int = 1024) -> Image.Image:
+    """Blank glass with one stained block covering the top-left 512x512 tile"""
+    pixels = np.full((height, width, 3), 245, dtype=np.uint8)
+    rng = np.random.default_rng(0)
+    pixels[:512, :512] = np.clip(rng.normal([200, 110, 170], 20, (512, 512, 3)), 0, 255).astype(np.uint8)
+    return Image.fromarray(pixels)
+
+@pytest.fixture
+def slide_path(tmp_path):
+    path = str(tmp_path / "slide.png")
+    slide_image().save(path)
+    return path
+
+def test_plan_keeps_only_tissue_tiles(slide_path):
+    reader = SlideReader(slide_path)
+    try:
+        plan = plan_slide(reader, tile_size=512, min_tissue=0.25)
+    finally:
+        reader.close()
+    assert plan.tile_count == 6
+    assert [tile for tile, _ in plan.tissue_tiles()] == [(0, 0, 512, 512)]
+
+def test_worker_scores_a_run_of_tiles(slide_path):
+    results = analyze_tiles(slide_path, [((0, 0, 512, 512), 1.0), ((512, 0, 512, 512), 0.0)])
+    assert [result["tile"] for result in results] == [(0, 0, 512, 512), (512, 0, 512, 512)]
+    assert all(set(result["scores"]) for result in results)
+
+def test_pil_fallback_refuses_oversized_slides(slide_path):
+    with pytest.raises(ValueError, match="needs OpenSlide"):
+        SlideReader(slide_path, max_pil_pixels=1000)
+
+def test_predict_slide_removes_the_spooled_upload(tmp_path, monkeypatch):
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    buffer = io.BytesIO()
+    slide_image().save(buffer, format="PNG")
+
+    with TestClient(server.app) as client:
+        response = client.post("/predict-slide", files={"file": ("slide.png", buffer.getvalue(), "image/png")})
+
+    assert response.status_code == 200
+    analysis = response.json()["analysis"]
+    assert analysis["success"]
+    assert analysis["slide_info"]["tiles_analyzed"] == 1
+    assert analysis["slide_info"]["tiles_skipped_background"] == 5
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,50 @@
+"""Per-stage timings (StageTimer) reported in analysis_metadata"""
+
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from vision_api import server
+from vision_api.heatmap import heatmap_cache
+from vision_api.inference import StageTimer
+from vision_api.result_cache import result_cache
+
+from vision_helpers import png_bytes
+
+PREDICT_STAGES = {"decode", "stats", "findings", "report"}
+
+@pytest.fixture
+def client():
+    result_cache.clear()
+    heatmap_cache.clear()
+    with TestClient(server.app) as client:
+        yield client
+    result_cache.clear()
+    heatmap_cache.clear()
+
+def metadata(client, path, seed):
+    response = client.post(path, files={"file": ("scan.png", png_bytes(seed), "image/png")})
+    assert response.status_code == 200
+    return response.json()["analysis"]["analysis_metadata"]
+
+def assert_timings(meta, stages):
+    timings = meta["stage_timings_ms"]
+    assert set(timings) == stages
+    assert all(isinstance(value, float) and value >= 0 for value in timings.values())
+    assert sum(timings.values()) <= meta["processing_time_ms"]
+
+def test_predict_reports_every_stage(client):
+    assert_timings(metadata(client, "/predict", 1), PREDICT_STAGES)
+
+def test_heatmap_adds_its_own_stage(client):
+    assert_timings(metadata(client, "/predict-with-heatmap", 2), PREDICT_STAGES | {"heatmap"})
+
+def test_stage_is_recorded_when_it_raises():
+    timer = StageTimer()
+    with pytest.raises(ValueError):
+        with timer.stage("decode"):
+            time.sleep(0.01)
+            raise ValueError("corrupt")
+    assert timer.timings_ms["decode"] >= 10
+    assert timer.total_ms >= timer.timings_ms["decode"]
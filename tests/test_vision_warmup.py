@@ -0,0 +1,108 @@
+"""ModelWarmup states and the /ready endpoint, with stand-in batch functions"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from vision_api import server
+from vision_api.scheduler import MicroBatchScheduler
+from vision_api.warmup import ModelWarmup
+
+def warmup_for(batch_fn, passes=2, batch_size=3):
+    scheduler = MicroBatchScheduler(batch_fn, max_batch_size=8, max_wait_ms=5, name="test")
+    return ModelWarmup(scheduler, preload=True, passes=passes, batch_size=batch_size)
+
+def broken(items):
+    raise RuntimeError("weights missing")
+
+def test_successful_warmup_is_ready():
+    sizes = []
+
+    def batch_fn(items):
+        sizes.append(len(items))
+        return items
+
+    warmup = warmup_for(batch_fn)
+    assert warmup.state == "pending" and not warmup.ready
+
+    async def scenario():
+        warmup.start()
+        await warmup._task
+        await warmup.scheduler.shutdown()
+
+    asyncio.run(scenario())
+    status = warmup.status()
+    assert warmup.ready and status["state"] == "ready"
+    assert len(status["warmup_passes_ms"]) == 2 and status["warmup_seconds"] is not None
+    assert sum(sizes) == 6
+
+def test_failed_warmup_is_not_ready():
+    warmup = warmup_for(broken)
+
+    async def scenario():
+        await warmup.run()
+        await warmup.scheduler.shutdown()
+
+    asyncio.run(scenario())
+    assert warmup.state == "failed" and not warmup.ready
+    assert "weights missing" in warmup.status()["error"]
+
+def test_without_preload_or_model_counts_as_ready():
+    lazy = ModelWarmup(MicroBatchScheduler(lambda items: items, name="test"), preload=False, passes=1, batch_size=1)
+    assert lazy.state == "lazy" and lazy.ready
+    disabled = ModelWarmup(None, preload=True, passes=1, batch_size=1)
+    assert disabled.state == "disabled" and disabled.ready
+
+@pytest.fixture
+def release():
+    event = threading.Event()
+    yield event
+    event.set()
+
+def wait_for_ready(client, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        response = client.get("/ready")
+        if response.status_code == 200:
+            return response
+        time.sleep(0.02)
+    return response
+
+def test_ready_is_503_until_warmup_finishes(monkeypatch, release):
+    def blocking(items):
+        release.wait(5)
+        return items
+
+    warmup = warmup_for(blocking, passes=1)
+    monkeypatch.setattr(server, "model_warmup", warmup)
+    with TestClient(server.app) as client:
+        response = client.get("/ready")
+        assert response.status_code == 503
+        assert response.json()["state"] in ("pending", "loading") and response.json()["ready"] is False
+
+        release.set()
+        response = wait_for_ready(client)
+        assert response.status_code == 200
+        assert response.json()["state"] == "ready"
+        client.portal.call(warmup.scheduler.shutdown)
+
+def test_ready_stays_503_after_failed_warmup(monkeypatch):
+    warmup = warmup_for(broken, passes=1)
+    monkeypatch.setattr(server, "model_warmup", warmup)
+    with TestClient(server.app) as client:
+        response = wait_for_ready(client, timeout=0.5)
+        assert response.status_code == 503
+        body = response.json()
+        assert body["state"] == "failed" and "weights missing" in body["error"]
+        # Liveness is separate from readiness
+        assert client.get("/health").json()["readiness"]["state"] == "failed"
+        client.portal.call(warmup.scheduler.shutdown)
+
+def test_ready_without_model():
+    with TestClient(server.app) as client:
+        response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json()["state"] == "disabled"
@@ -0,0 +1,27 @@
+"""Image fixtures and a stand-in BiomedCLIP batch function for vision API tests"""
+
+import io
+from typing import List
+
+import numpy as np
+from PIL import Image
+
+from vision_api.heatmap import encode_heatmap
+
+def png_bytes(seed: int, size: int = 96) -> bytes:
+    rng = np.random.default_rng(seed)
+    buffer = io.BytesIO()
+    Image.fromarray(rng.integers(0, 256, (size, size, 3), dtype=np.uint8)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def fake_classify_batch(images: List[bytes], top_k: int = 5):
+    """Same result shape as zero_shot.classify_batch, without loading the model"""
+    return [
+        {
+            "model": "fake-biomedclip",
+            "batch_size": len(images),
+            "top_predictions": [{"condition": "pneumonia", "confidence": 0.9}],
+            "heatmap": encode_heatmap(np.eye(14, dtype=np.float32), "attention")
+        }
+        for _ in images
+    ]
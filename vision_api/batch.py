@@ -0,0 +1,165 @@
+"""
+Batch prediction over many uploads or zip archives, streamed as NDJSON
+
+Uploads are expanded into items up front (zip archives by their member
+list only), and member bytes are read just before each image is analyzed,
+so memory holds at most `concurrency` images regardless of archive size.
+Each finished image is written as one JSON line in completion order,
+tagged with its input index, followed by a final summary line.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+import zipfile
+from dataclasses import dataclass
+from typing import IO, Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from .config import PREDICT_BATCH_MAX_FILE_MB
+from .executor import InferenceTimeout
+
+logger = logging.getLogger(__name__)
+
+ZIP_SUFFIX = ".zip"
+
+@dataclass
+class BatchItem:
+    """One image of a batch: a name, a deferred read, or why it cannot be analyzed"""
+
+    name: str
+    read: Optional[Callable[[], bytes]] = None
+    error: Optional[str] = None
+
+def is_zip(filename: str, fileobj: IO[bytes]) -> bool:
+    if (filename or "").lower().endswith(ZIP_SUFFIX):
+        return True
+    position = fileobj.tell()
+    try:
+        return zipfile.is_zipfile(fileobj)
+    finally:
+        fileobj.seek(position)
+
+def too_large(size: int, max_bytes: int) -> Optional[str]:
+    if size > max_bytes:
+        return f"File exceeds the {max_bytes / (1024 * 1024):g} MB batch limit"
+    return None
+
+def zip_items(archive: zipfile.ZipFile, max_bytes: int) -> List[BatchItem]:
+    """Image members of an archive, skipping directories and macOS/hidden metadata files"""
+    items = []
+    for info in archive.infolist():
+        base = os.path.basename(info.filename)
+        if info.is_dir() or not base or base.startswith(".") or info.filename.startswith("__MACOSX/"):
+            continue
+        error = too_large(info.file_size, max_bytes)
+        read = (lambda info=info: archive.read(info)) if error is None else None
+        items.append(BatchItem(info.filename, read, error))
+    return items
+
+def expand_uploads(uploads: List[Tuple[str, IO[bytes]]],
+                   max_file_mb: float = PREDICT_BATCH_MAX_FILE_MB) -> Tuple[List[BatchItem], List[zipfile.ZipFile]]:
+    """
+    Turn (filename, file) uploads into batch items
+
+    Args:
+        uploads: Uploaded files; zip archives are expanded to their members
+        max_file_mb: Largest single image (or uncompressed member) analyzed
+
+    Returns:
+        (items, open archives the caller must close once the batch is done)
+    """
+    max_bytes = int(max_file_mb * 1024 * 1024)
+    items: List[BatchItem] = []
+    archives: List[zipfile.ZipFile] = []
+    for filename, fileobj in uploads:
+        if is_zip(filename, fileobj):
+            try:
+                archive = zipfile.ZipFile(fileobj)
+            except zipfile.BadZipFile as e:
+                items.append(BatchItem(filename, error=f"Invalid zip archive: {str(e)}"))
+                continue
+            archives.append(archive)
+            items.extend(zip_items(archive, max_bytes))
+        else:
+            fileobj.seek(0, os.SEEK_END)
+            error = too_large(fileobj.tell(), max_bytes)
+            fileobj.seek(0)
+            items.append(BatchItem(filename, fileobj.read if error is None else None, error))
+    return items, archives
+
+AnalyzeFn = Callable[[bytes, str], Awaitable[Tuple[Dict[str, Any], Optional[str]]]]
+
+async def analyze_item(index: int, item: BatchItem, analyze: AnalyzeFn) -> Dict[str, Any]:
+    """One NDJSON record; failures are reported in the record, never raised"""
+    record: Dict[str, Any] = {"index": index, "filename": item.name}
+    try:
+        if item.error is not None:
+            raise ValueError(item.error)
+        image_data = await run_in_threadpool(item.read)
+        result, tier = await analyze(image_data, item.name)
+        if result.get("success"):
+            record.update(status="success", cached=tier, analysis=result)
+        else:
+            # e.g. a corrupt member or a non-image with an image extension
+            record.update(status="error", error=result.get("error", "Analysis failed"))
+    except ValueError as e:
+        record.update(status="error", error=str(e))
+    except InferenceTimeout as e:
+        logger.error(f"Timed out processing batch item {item.name}: {str(e)}")
+        record.update(status="error", error="Analysis timed out")
+    except Exception as e:
+        logger.error(f"Error processing batch item {item.name}: {str(e)}")
+        record.update(status="error", error="Analysis failed")
+    return record
+
+async def stream_batch(items: List[BatchItem], analyze: AnalyzeFn, concurrency: int) -> AsyncIterator[str]:
+    """
+    Analyze items with at most `concurrency` in flight, yielding NDJSON lines as they finish
+
+    Args:
+        items: Expanded batch items
+        analyze: Async analysis of one upload, returning (result, cache tier)
+        concurrency: Most images read and analyzed at once
+
+    Yields:
+        One JSON line per item, then a summary line
+    """
+    start = time.perf_counter()
+    counts = {"success": 0, "error": 0, "cached": 0}
+    pending = set()
+
+    def finished(task: "asyncio.Future[Dict[str, Any]]") -> str:
+        record = task.result()
+        counts[record["status"]] += 1
+        counts["cached"] += bool(record.get("cached"))
+        return json.dumps(record) + "\n"
+
+    try:
+        for index, item in enumerate(items):
+            if len(pending) >= max(concurrency, 1):
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield finished(task)
+            pending.add(asyncio.ensure_future(analyze_item(index, item, analyze)))
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield finished(task)
+    finally:
+        # Client disconnected: stop the images still in flight
+        for task in pending:
+            task.cancel()
+
+    summary = {
+        "total": len(items),
+        "succeeded": counts["success"],
+        "failed": counts["error"],
+        "cached": counts["cached"],
+        "processing_time_ms": round((time.perf_counter() - start) * 1000, 3)
+    }
+    logger.info(f"Batch prediction completed: {summary}")
+    yield json.dumps({"summary": summary}) + "\n"
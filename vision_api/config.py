@@ -15,5 +15,58 @@ GEMINI_MODEL_ID = os.getenv("GEMINI_MODEL_ID", "gemini-1.5-flash")
 # API Configuration
 API_TIMEOUT = 15  # seconds
 
+# Inference process pool (0 workers = run in a thread of the server process)
+INFERENCE_WORKERS = int(os.getenv("VISION_INFERENCE_WORKERS", str(os.cpu_count() or 1)))
+INFERENCE_TIMEOUT = float(os.getenv("VISION_INFERENCE_TIMEOUT", "30"))  # seconds per request
+INFERENCE_MAX_PENDING = int(os.getenv("VISION_INFERENCE_MAX_PENDING", str(max(INFERENCE_WORKERS, 1) * 4)))
+
+# Image statistics on large inputs: auto | full | tiled | pyramid
+# (auto = full up to STATS_MAX_PIXELS, tiled above; both exact. pyramid is approximate
+# and opt-in: faster, but its error grows on high-frequency images)
+STATS_MODE = os.getenv("VISION_STATS_MODE", "auto").lower()
+STATS_MAX_PIXELS = int(os.getenv("VISION_STATS_MAX_PIXELS", str(2048 * 2048)))
+STATS_TILE_PIXELS = int(os.getenv("VISION_STATS_TILE_PIXELS", str(1 << 20)))
+
+# Whole-slide analysis (/predict-slide)
+SLIDE_TILE_SIZE = int(os.getenv("VISION_SLIDE_TILE_SIZE", "512"))
+SLIDE_MIN_TISSUE = float(os.getenv("VISION_SLIDE_MIN_TISSUE", "0.25"))  # tissue fraction to analyze a tile
+SLIDE_THUMBNAIL_SIZE = int(os.getenv("VISION_SLIDE_THUMBNAIL_SIZE", "2048"))  # tissue mask resolution
+SLIDE_MAX_IN_FLIGHT = int(os.getenv("VISION_SLIDE_MAX_IN_FLIGHT", str(INFERENCE_MAX_PENDING)))
+SLIDE_TILES_PER_TASK = int(os.getenv("VISION_SLIDE_TILES_PER_TASK", "16"))  # OpenSlide tiles read per worker call
+# Largest slide decoded with PIL when OpenSlide cannot read it (decoded once, in the server process)
+SLIDE_MAX_PIL_PIXELS = int(os.getenv("VISION_SLIDE_MAX_PIL_PIXELS", str(1 << 26)))
+
+# /predict/batch: images analyzed at once per request (default keeps every worker busy with one
+# queued, leaving the remaining pool slots to interactive /predict calls), and input limits
+PREDICT_BATCH_CONCURRENCY = int(os.getenv("VISION_PREDICT_BATCH_CONCURRENCY", str(max(INFERENCE_WORKERS, 1) * 2)))
+PREDICT_BATCH_MAX_FILES = int(os.getenv("VISION_PREDICT_BATCH_MAX_FILES", "1000"))
+PREDICT_BATCH_MAX_FILE_MB = float(os.getenv("VISION_PREDICT_BATCH_MAX_FILE_MB", "200"))  # per image, incl. zip members
+
+# Content-addressed result cache (empty dir = memory tier only)
+RESULT_CACHE_SIZE = int(os.getenv("VISION_RESULT_CACHE_SIZE", "256"))
+RESULT_CACHE_DIR = os.getenv("VISION_RESULT_CACHE_DIR", "")
+RESULT_CACHE_DISK_MAX = int(os.getenv("VISION_RESULT_CACHE_DISK_MAX", "10000"))
+
+# Heatmaps for /predict-with-heatmap (gradient-energy grid size; attention uses the ViT patch grid)
+HEATMAP_GRID = int(os.getenv("VISION_HEATMAP_GRID", "14"))
+HEATMAP_CACHE_SIZE = int(os.getenv("VISION_HEATMAP_CACHE_SIZE", "512"))
+
+# BiomedCLIP zero-shot predictions (downloads ~1GB of weights on first use)
+BIOMEDCLIP_ENABLED = os.getenv("VISION_BIOMEDCLIP_ENABLED", "false").lower() in ("1", "true", "yes")
+ZERO_SHOT_TOP_K = int(os.getenv("VISION_ZERO_SHOT_TOP_K", "5"))
+# "int8" = dynamically quantized Linear layers (CPU only); "none" = fp32 (any other value warns and uses none)
+QUANTIZE = os.getenv("VISION_QUANTIZE", "none").lower()
+# Vision encoder runtime: "torch", or "onnx" (image tower exported once, run by ONNX Runtime on CPU)
+MODEL_BACKEND = os.getenv("VISION_MODEL_BACKEND", "torch").lower()
+ONNX_THREADS = int(os.getenv("VISION_ONNX_THREADS", "0"))  # 0 = ONNX Runtime default
+# Load the model and run warmup batches at startup; /ready waits for it
+PRELOAD_MODEL = os.getenv("VISION_PRELOAD_MODEL", "false").lower() in ("1", "true", "yes")
+WARMUP_PASSES = int(os.getenv("VISION_WARMUP_PASSES", "3"))
+WARMUP_BATCH_SIZE = int(os.getenv("VISION_WARMUP_BATCH_SIZE", "4"))
+
+# Micro-batching of concurrent model requests
+BATCH_MAX_SIZE = int(os.getenv("VISION_BATCH_MAX_SIZE", "16"))
+BATCH_MAX_WAIT_MS = float(os.getenv("VISION_BATCH_MAX_WAIT_MS", "5"))
+
 # Logging
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO") 
\ No newline at end of file
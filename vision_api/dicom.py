@@ -0,0 +1,148 @@
+"""
+DICOM ingestion: header-only reads, lazy per-frame decoding and window/level
+
+The header is parsed with stop_before_pixels, so routing decisions based on
+modality or body part never touch pixel data. Only one representative frame
+of a multi-frame series (the middle one by default) is decoded and analyzed,
+straight from the upload buffer (pydicom.pixels), so a series of hundreds
+of slices is never materialized as one array.
+"""
+
+import io
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+import pydicom
+from pydicom.dataset import Dataset
+from pydicom.pixels import pixel_array
+
+logger = logging.getLogger(__name__)
+
+DICOM_PREAMBLE = 128
+DICOM_MAGIC = b"DICM"
+DICOM_SUFFIXES = (".dcm", ".dicom")
+
+# DICOM Modality -> words the filename-based findings logic understands
+MODALITY_HINTS = {
+    "MR": "mri",
+    "CT": "ct",
+    "SM": "pathology",  # slide microscopy
+    "GM": "pathology",  # general microscopy
+}
+
+# Header fields reported back to the client
+METADATA_FIELDS = (
+    "Modality", "BodyPartExamined", "StudyDescription", "SeriesDescription",
+    "PhotometricInterpretation", "Rows", "Columns", "BitsStored", "SamplesPerPixel"
+)
+
+def is_dicom(image_data: bytes, filename: str = "") -> bool:
+    """DICM magic after the 128-byte preamble, or a .dcm name for preamble-less files"""
+    if image_data[DICOM_PREAMBLE:DICOM_PREAMBLE + len(DICOM_MAGIC)] == DICOM_MAGIC:
+        return True
+    return (filename or "").lower().endswith(DICOM_SUFFIXES)
+
+def read_header(image_data: bytes) -> Dataset:
+    """Parse every element up to (not including) Pixel Data"""
+    return pydicom.dcmread(io.BytesIO(image_data), stop_before_pixels=True, force=True)
+
+def frame_count(ds: Dataset) -> int:
+    return int(ds.get("NumberOfFrames", 1) or 1)
+
+def header_metadata(ds: Dataset) -> Dict[str, Any]:
+    """JSON-safe summary of the header fields clients care about"""
+    metadata = {}
+    for name in METADATA_FIELDS:
+        value = ds.get(name)
+        if value is not None and value != "":
+            metadata[name] = value if isinstance(value, (int, float)) else str(value)
+    metadata["NumberOfFrames"] = frame_count(ds)
+    return metadata
+
+def routing_hint(ds: Dataset) -> str:
+    """Words describing the study, e.g. 'mri head', used alongside the filename"""
+    words = [MODALITY_HINTS.get(str(ds.get("Modality", "")).upper(), "")]
+    words.append(str(ds.get("BodyPartExamined", "")).lower())
+    return " ".join(word for word in words if word)
+
+def read_frame(image_data: bytes, index: int = 0) -> np.ndarray:
+    """Decode a single frame without decoding the rest of the series"""
+    return pixel_array(io.BytesIO(image_data), index=index)
+
+def _first(value: Any) -> Optional[float]:
+    """Window Center/Width may be multi-valued; the first pair is the default"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (list, tuple, pydicom.multival.MultiValue)):
+        value = value[0] if len(value) else None
+    return float(value) if value is not None else None
+
+def window_settings(ds: Dataset) -> Tuple[Optional[float], Optional[float]]:
+    return _first(ds.get("WindowCenter")), _first(ds.get("WindowWidth"))
+
+def apply_window(frame: np.ndarray, center: Optional[float] = None, width: Optional[float] = None,
+                 slope: float = 1.0, intercept: float = 0.0, invert: bool = False) -> np.ndarray:
+    """
+    Modality rescale + linear window/level to uint8, in place on one float32 copy
+
+    Without a window the frame's own min..max range is used.
+    """
+    values = frame.astype(np.float32)
+    if slope != 1.0:
+        values *= np.float32(slope)
+    if intercept:
+        values += np.float32(intercept)
+
+    if center is None or width is None or width <= 0:
+        low, high = float(values.min()), float(values.max())
+    else:
+        low, high = center - width / 2, center + width / 2
+    scale = 255.0 / max(high - low, 1e-6)
+
+    values -= np.float32(low)
+    values *= np.float32(scale)
+    np.clip(values, 0, 255, out=values)
+    if invert:
+        # MONOCHROME1: low values are displayed bright
+        np.subtract(255, values, out=values)
+    return values.astype(np.uint8)
+
+def frame_to_image(frame: np.ndarray, ds: Dataset) -> Image.Image:
+    """Display-ready RGB image for one decoded frame"""
+    if frame.ndim == 3:
+        # Color frames are already RGB (pydicom converts YBR)
+        if frame.dtype != np.uint8:
+            frame = apply_window(frame)
+        return Image.fromarray(frame, "RGB")
+
+    center, width = window_settings(ds)
+    gray = apply_window(
+        frame, center, width,
+        slope=float(ds.get("RescaleSlope", 1) or 1),
+        intercept=float(ds.get("RescaleIntercept", 0) or 0),
+        invert=str(ds.get("PhotometricInterpretation", "")).upper() == "MONOCHROME1"
+    )
+    return Image.fromarray(gray, "L").convert("RGB")
+
+def decode_dicom(image_data: bytes, frame_index: Optional[int] = None) -> Tuple[Image.Image, Dict[str, Any], str]:
+    """
+    Decode one representative frame of a DICOM upload
+
+    Args:
+        image_data: Raw DICOM file contents
+        frame_index: Frame to decode; defaults to the middle frame of a series
+
+    Returns:
+        Tuple of (RGB image, header metadata, routing hint)
+    """
+    ds = read_header(image_data)
+    frames = frame_count(ds)
+    index = frames // 2 if frame_index is None else min(max(frame_index, 0), frames - 1)
+    frame = read_frame(image_data, index)
+
+    metadata = header_metadata(ds)
+    metadata["analyzed_frame"] = index
+    logger.info(f"Decoded DICOM frame {index + 1}/{frames} ({metadata.get('Modality', '?')})")
+    return frame_to_image(frame, ds), metadata, routing_hint(ds)
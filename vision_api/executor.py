@@ -0,0 +1,87 @@
+"""
+Process pool that keeps CPU-bound image analysis off the asyncio event loop
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from .config import INFERENCE_WORKERS, INFERENCE_TIMEOUT, INFERENCE_MAX_PENDING
+
+logger = logging.getLogger(__name__)
+
+class InferenceTimeout(Exception):
+    """Raised when an analysis does not finish within the per-request timeout"""
+
+def _warmup() -> int:
+    # Importing here makes each worker pay its import cost at startup, not on the first request
+    from . import inference  # noqa: F401
+    return os.getpid()
+
+class InferenceExecutor:
+    """
+    Bounded process pool for analysis functions
+
+    At most `max_pending` calls are submitted at once; further callers wait
+    for a slot, so a burst of uploads cannot queue unbounded work. Each call
+    is limited to `timeout` seconds. A timed-out call still finishes in its
+    worker, but the request is answered immediately.
+    """
+
+    def __init__(self, max_workers: int = INFERENCE_WORKERS, timeout: float = INFERENCE_TIMEOUT,
+                 max_pending: int = INFERENCE_MAX_PENDING):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.max_pending = max_pending
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def start(self) -> None:
+        """Start the worker processes (idempotent)"""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+        if self._pool is not None or self.max_workers <= 0:
+            return
+        # spawn avoids forking a server process that may hold threads or model state
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+        for _ in range(self.max_workers):
+            self._pool.submit(_warmup)
+        logger.info(f"Inference pool started with {self.max_workers} workers (timeout {self.timeout}s)")
+
+    def shutdown(self) -> None:
+        """Stop accepting work, drop queued calls and wait for running ones"""
+        if self._pool is not None:
+            logger.info("Shutting down inference pool")
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run fn(*args) in the pool (or a thread when the pool is disabled) with the timeout"""
+        self.start()
+        async with self._slots:
+            if self._pool is not None:
+                future = asyncio.get_running_loop().run_in_executor(self._pool, fn, *args)
+            else:
+                future = run_in_threadpool(fn, *args)
+            try:
+                return await asyncio.wait_for(future, self.timeout)
+            except asyncio.TimeoutError:
+                raise InferenceTimeout(f"Analysis exceeded {self.timeout:g}s")
+
+    def get_info(self) -> dict:
+        return {
+            "workers": self.max_workers if self._pool is not None else 0,
+            "timeout_s": self.timeout,
+            "max_pending": self.max_pending
+        }
+
+# Global executor instance
+inference_executor = InferenceExecutor()
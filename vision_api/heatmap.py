@@ -0,0 +1,91 @@
+"""
+Compact attention/saliency heatmaps and their cache
+
+A heatmap is a small grid (14x14 for ViT-B/16 attention) quantized to
+uint8 and returned as a base64 PNG of a few hundred bytes, together with
+coarse named regions for the frontend's attention_regions list.
+
+Sources:
+- attention: CLS-token attention of the BiomedCLIP ViT's last block,
+  captured during the zero-shot forward pass (see zero_shot.py)
+- gradient_energy: block-averaged image gradient magnitude, used when the
+  model is disabled
+"""
+
+import base64
+import io
+import logging
+from typing import Any, Dict, List
+
+import numpy as np
+from PIL import Image
+
+from .config import HEATMAP_GRID, HEATMAP_CACHE_SIZE
+from .result_cache import ResultCache, content_key
+
+logger = logging.getLogger(__name__)
+
+# Region names for a 3x3 split of the heatmap, row by row
+REGION_NAMES = [
+    ["upper left", "upper center", "upper right"],
+    ["middle left", "center", "middle right"],
+    ["lower left", "lower center", "lower right"],
+]
+
+# Memory-only: heatmaps are cheap to recompute after a restart
+heatmap_cache = ResultCache(maxsize=HEATMAP_CACHE_SIZE, directory="")
+
+def heatmap_key(image_data: bytes, source: str) -> str:
+    """Heatmaps depend only on the pixels and how they were produced, not on the filename"""
+    return content_key(image_data, kind="heatmap", source=source)
+
+def attention_regions(grid: np.ndarray) -> List[Dict[str, Any]]:
+    """Mean normalized value of each 3x3 region, strongest first"""
+    rows = np.array_split(np.arange(grid.shape[0]), 3)
+    cols = np.array_split(np.arange(grid.shape[1]), 3)
+    regions = []
+    for i, row in enumerate(rows):
+        for j, col in enumerate(cols):
+            value = float(grid[np.ix_(row, col)].mean()) if row.size and col.size else 0.0
+            regions.append({"region": REGION_NAMES[i][j], "attention": round(value, 4)})
+    return sorted(regions, key=lambda region: region["attention"], reverse=True)
+
+def encode_heatmap(grid: np.ndarray, method: str) -> Dict[str, Any]:
+    """
+    Quantize a float grid to uint8 and wrap it as a small base64 PNG
+
+    Args:
+        grid: 2-D array of non-negative saliency values
+        method: 'attention' or 'gradient_energy'
+
+    Returns:
+        Dict with the PNG, grid shape, value range and named regions
+    """
+    grid = np.asarray(grid, dtype=np.float32)
+    low, high = float(grid.min()), float(grid.max())
+    normalized = (grid - low) / (high - low) if high > low else np.zeros_like(grid)
+    quantized = np.round(normalized * 255).astype(np.uint8)
+
+    buffer = io.BytesIO()
+    Image.fromarray(quantized, "L").save(buffer, format="PNG", optimize=True)
+    return {
+        "method": method,
+        "format": "png",
+        "encoding": "base64",
+        "width": int(grid.shape[1]),
+        "height": int(grid.shape[0]),
+        "value_range": [round(low, 6), round(high, 6)],
+        "data": base64.b64encode(buffer.getvalue()).decode("ascii"),
+        "attention_regions": attention_regions(normalized)
+    }
+
+def gradient_energy_map(image: Image.Image, grid: int = HEATMAP_GRID) -> np.ndarray:
+    """Mean gradient magnitude per cell of a grid x grid split, from an 8x-per-cell reduction"""
+    cell = 8
+    small = np.asarray(image.convert("L").resize((grid * cell, grid * cell), Image.Resampling.BOX), dtype=np.float32)
+    grad_y, grad_x = np.gradient(small)
+    magnitude = np.hypot(grad_x, grad_y)
+    return magnitude.reshape(grid, cell, grid, cell).mean(axis=(1, 3))
+
+def gradient_energy_heatmap(image: Image.Image, grid: int = HEATMAP_GRID) -> Dict[str, Any]:
+    return encode_heatmap(gradient_energy_map(image, grid), "gradient_energy")
@@ -0,0 +1,282 @@
+"""
+Fused image feature kernel and bounded-memory modes for large inputs
+
+All modes share one fused feature kernel (FeatureAccumulator) that fills
+preallocated float32/integer buffers instead of allocating a float64
+temporary per operation. Large images additionally avoid full-size buffers:
+- tiled: stream the image in row strips and keep running integer/float
+  accumulators; results equal the full-resolution computation
+- pyramid: analyze a box-filtered reduction of the image and estimate the
+  approximation error from a full-resolution crop
+
+In those modes only one strip or one reduced copy is materialized as an array,
+so peak memory no longer scales with the temporaries of a 4000x4000 image.
+"""
+
+import hashlib
+import logging
+import math
+from typing import Any, Dict, Iterator, Tuple
+
+import numpy as np
+from PIL import Image
+
+from .config import STATS_MODE, STATS_MAX_PIXELS, STATS_TILE_PIXELS
+
+logger = logging.getLogger(__name__)
+
+STATS_MODES = ("auto", "full", "tiled", "pyramid")
+# Features compared when estimating the pyramid error
+APPROXIMATED_FEATURES = ("brightness", "contrast", "color_variance", "texture_complexity")
+
+def select_stats_mode(size: Tuple[int, int], mode: str = STATS_MODE, max_pixels: int = STATS_MAX_PIXELS) -> str:
+    """
+    Resolve 'auto' to 'full' for images up to max_pixels and 'tiled' above
+
+    Both are exact; 'pyramid' trades accuracy for speed (its error grows with
+    high-frequency content) and is only used when asked for explicitly.
+    """
+    if mode not in STATS_MODES:
+        logger.warning(f"Unknown statistics mode {mode!r}, using auto")
+        mode = "auto"
+    width, height = size
+    if mode == "auto":
+        mode = "full" if width * height <= max_pixels else "tiled"
+    # Single-row/column images cannot take a gradient in strips or after reduction
+    if min(width, height) < 2:
+        mode = "full"
+    return mode
+
+def strip_rows(size: Tuple[int, int], tile_pixels: int = STATS_TILE_PIXELS) -> int:
+    """Rows per strip so that one strip holds about tile_pixels pixels"""
+    width, _ = size
+    return max(2, tile_pixels // max(width, 1))
+
+def iter_strips(image: Image.Image, rows: int) -> Iterator[Tuple[np.ndarray, int, int]]:
+    """
+    Yield (array, start, stop) row strips of the image
+
+    Each array carries one extra halo row above and below (where the image
+    has them); rows [start:stop] of the array are the strip itself.
+    """
+    width, height = image.size
+    for top in range(0, height, rows):
+        bottom = min(top + rows, height)
+        halo_top = max(top - 1, 0)
+        halo_bottom = min(bottom + 1, height)
+        array = np.asarray(image.crop((0, halo_top, width, halo_bottom)))
+        yield array, top - halo_top, top - halo_top + bottom - top
+
+def hash_image_pixels(image: Image.Image, tile_pixels: int = STATS_TILE_PIXELS) -> str:
+    """md5 of image.tobytes(), computed strip by strip"""
+    digest = hashlib.md5()
+    width, height = image.size
+    rows = strip_rows(image.size, tile_pixels)
+    for top in range(0, height, rows):
+        digest.update(image.crop((0, top, width, min(top + rows, height))).tobytes())
+    return digest.hexdigest()
+
+class FeatureAccumulator:
+    """
+    Fused brightness, contrast, color and texture features over row strips
+
+    Each strip is read a few times into buffers allocated once per image:
+    float32 grayscale and gradient planes, uint8 channel differences and
+    uint16 squares. Moments are summed as exact integers (so contrast
+    matches np.std), the gradient magnitude in float32 with a float64 total.
+    Expects 8-bit L or RGB pixels.
+    """
+
+    def __init__(self, width: int, max_rows: int, channels: int = 3):
+        self.width = width
+        self.channels = channels
+        # +2 rows for the halo above and below a strip
+        self._gray = np.empty((max_rows + 2, width), dtype=np.float32)
+        self._grad_x = np.empty((max_rows, width), dtype=np.float32)
+        self._grad_y = np.empty((max_rows, width), dtype=np.float32)
+        self._squares = np.empty((max_rows, width, channels) if channels > 1 else (max_rows, width), dtype=np.uint16)
+        self._diff = np.empty((max_rows, width), dtype=np.uint8) if channels > 1 else None
+
+        self.pixels = 0
+        self.channel_sums = np.zeros(channels, dtype=np.int64)
+        self.squares_sum = 0
+        # Sum and sum of squares of the (uint8) R-G and G-B differences
+        self.diff_sums = [0, 0]
+        self.diff_squares = [0, 0]
+        self.gradient_sum = 0.0
+
+    def add(self, array: np.ndarray, start: int, stop: int) -> None:
+        """Accumulate rows [start:stop] of array; rows outside that range are halo"""
+        rows = stop - start
+        core = array[start:stop]
+        self.pixels += rows * self.width
+        self._add_moments(core, rows)
+        self._add_gradient(array, start, stop, rows)
+
+    def _add_moments(self, core: np.ndarray, rows: int) -> None:
+        squares = self._squares[:rows]
+        np.multiply(core, core, out=squares, dtype=np.uint16)
+        self.squares_sum += int(squares.sum(dtype=np.uint64))
+        if self.channels == 1:
+            self.channel_sums[0] += int(core.sum(dtype=np.uint64))
+            return
+
+        self.channel_sums += core.sum(axis=(0, 1), dtype=np.uint64).astype(np.int64)
+        diff = self._diff[:rows]
+        diff_squares = squares[:, :, 0]
+        for index, (left, right) in enumerate(((0, 1), (1, 2))):
+            # Wrapping uint8 subtraction, as in compute_texture_features
+            np.subtract(core[:, :, left], core[:, :, right], out=diff)
+            np.multiply(diff, diff, out=diff_squares, dtype=np.uint16)
+            self.diff_sums[index] += int(diff.sum(dtype=np.uint64))
+            self.diff_squares[index] += int(diff_squares.sum(dtype=np.uint64))
+
+    def _add_gradient(self, array: np.ndarray, start: int, stop: int, rows: int) -> None:
+        height = array.shape[0]
+        gray = self._gray[:height]
+        if self.channels == 1:
+            np.copyto(gray, array, casting="unsafe")
+        else:
+            np.add(array[:, :, 0], array[:, :, 1], out=gray, dtype=np.float32)
+            np.add(gray, array[:, :, 2], out=gray, dtype=np.float32)
+            gray *= np.float32(1 / 3)
+
+        # np.gradient semantics: central differences, one-sided at the image edges
+        grad_x = self._grad_x[:rows]
+        core = gray[start:stop]
+        if self.width > 1:
+            np.subtract(core[:, 2:], core[:, :-2], out=grad_x[:, 1:-1])
+            grad_x[:, 1:-1] *= np.float32(0.5)
+            np.subtract(core[:, 1], core[:, 0], out=grad_x[:, 0])
+            np.subtract(core[:, -1], core[:, -2], out=grad_x[:, -1])
+        else:
+            grad_x.fill(0)
+
+        grad_y = self._grad_y[:rows]
+        if height > 1:
+            low, high = max(start, 1), min(stop, height - 1)
+            if high > low:
+                interior = grad_y[low - start:high - start]
+                np.subtract(gray[low + 1:high + 1], gray[low - 1:high - 1], out=interior)
+                interior *= np.float32(0.5)
+            if start == 0:
+                np.subtract(gray[1], gray[0], out=grad_y[0])
+            if stop == height:
+                np.subtract(gray[height - 1], gray[height - 2], out=grad_y[rows - 1])
+        else:
+            grad_y.fill(0)
+
+        np.multiply(grad_x, grad_x, out=grad_x)
+        np.multiply(grad_y, grad_y, out=grad_y)
+        np.add(grad_x, grad_y, out=grad_x)
+        np.sqrt(grad_x, out=grad_x)
+        self.gradient_sum += float(grad_x.sum(dtype=np.float64))
+
+    def _std(self, total: int, squares: int, count: int) -> float:
+        mean = total / count
+        return math.sqrt(max(squares / count - mean * mean, 0.0))
+
+    def result(self) -> Dict[str, Any]:
+        if not self.pixels:
+            raise ValueError("No pixels accumulated")
+        values = self.pixels * self.channels
+        channel_means = self.channel_sums / self.pixels
+        if self.channels == 1:
+            is_grayscale = True
+        else:
+            is_grayscale = all(
+                self._std(self.diff_sums[i], self.diff_squares[i], self.pixels) < 10 for i in (0, 1)
+            )
+        return {
+            'brightness': int(self.channel_sums.sum()) / values,
+            'contrast': self._std(int(self.channel_sums.sum()), self.squares_sum, values),
+            'color_variance': float(np.var(channel_means)) if self.channels >= 3 else 0,
+            'texture_complexity': self.gradient_sum / self.pixels,
+            'is_grayscale': is_grayscale
+        }
+
+def _channels(array: np.ndarray) -> int:
+    return array.shape[2] if array.ndim == 3 else 1
+
+def compute_features(img_array: np.ndarray, tile_pixels: int = STATS_TILE_PIXELS) -> Dict[str, Any]:
+    """
+    Fused replacement for compute_image_statistics + compute_texture_features
+
+    Walks the array in row strips (views with a one-row halo) so the
+    working buffers stay cache-sized whatever the image size.
+    """
+    height, width = img_array.shape[:2]
+    rows = min(strip_rows((width, height), tile_pixels), height)
+    accumulator = FeatureAccumulator(width, rows, _channels(img_array))
+    for top in range(0, height, rows):
+        bottom = min(top + rows, height)
+        halo_top = max(top - 1, 0)
+        accumulator.add(img_array[halo_top:min(bottom + 1, height)], top - halo_top, bottom - halo_top)
+    return accumulator.result()
+
+def compute_features_tiled(image: Image.Image, tile_pixels: int = STATS_TILE_PIXELS) -> Dict[str, Any]:
+    """
+    compute_features in row strips, reusing one set of strip-sized buffers
+
+    Strips carry one halo row on each side, so their borders use central
+    differences as well and the result equals the whole-array computation.
+    """
+    rows = min(strip_rows(image.size, tile_pixels), image.size[1])
+    accumulator = None
+    for array, start, stop in iter_strips(image, rows):
+        if accumulator is None:
+            accumulator = FeatureAccumulator(image.size[0], rows, _channels(array))
+        accumulator.add(array, start, stop)
+    return accumulator.result()
+
+def pyramid_factor(size: Tuple[int, int], max_pixels: int = STATS_MAX_PIXELS) -> int:
+    """Smallest integer reduction that brings the image to at most max_pixels"""
+    width, height = size
+    return max(1, math.ceil(math.sqrt(width * height / max_pixels)))
+
+def _full_features(image: Image.Image) -> Dict[str, Any]:
+    return compute_features(np.asarray(image))
+
+def relative_errors(approx: Dict[str, Any], exact: Dict[str, Any]) -> Dict[str, float]:
+    """|approx - exact| / |exact| for each approximated feature"""
+    errors = {}
+    for name in APPROXIMATED_FEATURES:
+        reference = float(exact[name])
+        errors[name] = round(abs(float(approx[name]) - reference) / max(abs(reference), 1e-9), 4)
+    return errors
+
+def estimate_pyramid_error(image: Image.Image, factor: int, max_pixels: int = STATS_MAX_PIXELS) -> Dict[str, Any]:
+    """
+    Relative error of pyramid features, measured on a central full-resolution crop
+
+    The crop holds at most max_pixels / 4 pixels, so the check costs a
+    fraction of the full-resolution analysis it stands in for.
+    """
+    width, height = image.size
+    side = max(factor * 2, int(math.sqrt(max_pixels / 4)) // factor * factor)
+    crop_w, crop_h = min(side, width // factor * factor), min(side, height // factor * factor)
+    left, top = (width - crop_w) // 2, (height - crop_h) // 2
+    crop = image.crop((left, top, left + crop_w, top + crop_h))
+    return {
+        "method": "central_crop",
+        "crop_size": [crop_w, crop_h],
+        "relative_error": relative_errors(_full_features(crop.reduce(factor)), _full_features(crop))
+    }
+
+def compute_features_pyramid(image: Image.Image, max_pixels: int = STATS_MAX_PIXELS) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Features of a box-filtered reduction of the image
+
+    Returns:
+        Tuple of (features, resolution info with the estimated error)
+    """
+    factor = pyramid_factor(image.size, max_pixels)
+    reduced = image.reduce(factor) if factor > 1 else image
+    features = _full_features(reduced)
+    info = {
+        "mode": "pyramid",
+        "scale": 1 / factor,
+        "analyzed_size": list(reduced.size),
+        "approximation": estimate_pyramid_error(image, factor, max_pixels) if factor > 1 else None
+    }
+    return features, info
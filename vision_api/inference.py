@@ -6,43 +6,95 @@ import io
 import logging
 import hashlib
 import random
+import re
 import time
 import asyncio
-from typing import Dict, Any, List
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Tuple
 from PIL import Image, ImageStat
 import numpy as np
 
+from .dicom import is_dicom, decode_dicom
+from .heatmap import gradient_energy_heatmap
+from .image_stats import (
+    select_stats_mode, compute_features, compute_features_tiled, compute_features_pyramid, hash_image_pixels
+)
+
 logger = logging.getLogger(__name__)
 
+# Part of the result cache key: bump whenever the analysis output changes
+ANALYSIS_VERSION = "2.3.0"
+
+class StageTimer:
+    """Records wall time per pipeline stage using a monotonic clock"""
+
+    def __init__(self):
+        self.timings_ms: Dict[str, float] = {}
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings_ms[name] = round((time.perf_counter() - start) * 1000, 3)
+
+    @property
+    def total_ms(self) -> float:
+        return round((time.perf_counter() - self._start) * 1000, 3)
+
 def get_image_hash(image_data: bytes) -> str:
     """Generate a unique hash for the image data"""
     return hashlib.md5(image_data).hexdigest()
 
-def analyze_image_properties(image: Image.Image, filename: str) -> Dict[str, Any]:
-    """Analyze image properties to determine appropriate medical analysis"""
-    
-    logger.info("Performing deep image analysis...")
-    time.sleep(0.5)  # Simulate initial processing
-    
-    # Convert to numpy array for analysis
-    img_array = np.array(image)
-    
-    # Advanced image statistics
-    logger.info("Computing image statistics...")
-    time.sleep(0.3)
-    
+def decode_image(image_data: bytes) -> Image.Image:
+    """Decode stage: open the upload and normalize it to RGB"""
+    image = Image.open(io.BytesIO(image_data))
+    # PIL decodes lazily; force it here so the cost lands in this stage
+    image.load()
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    return image
+
+def decode_upload(image_data: bytes, filename: str) -> Tuple[Image.Image, Optional[Dict[str, Any]], str]:
+    """
+    Decode stage for any supported upload (DICOM or a regular image file)
+
+    Returns:
+        Tuple of (RGB image, DICOM header metadata or None, name used for
+        routing findings: the filename plus DICOM modality/body part words)
+    """
+    if is_dicom(image_data, filename):
+        image, metadata, hint = decode_dicom(image_data)
+        return image, metadata, f"{filename} {hint}".strip()
+    return decode_image(image_data), None, filename
+
+def compute_image_statistics(img_array: np.ndarray, image: Image.Image) -> Dict[str, Any]:
+    """
+    Global brightness, contrast and color distribution
+
+    Reference implementation of image_stats.compute_features (which the
+    pipeline uses); kept for benchmarks/bench_vision_features.py.
+    """
     mean_brightness = np.mean(img_array)
     std_brightness = np.std(img_array)
     
     # Calculate more detailed statistics
     stat = ImageStat.Stat(image)
-    extrema = stat.extrema
     mean_rgb = stat.mean
     
-    # Analyze texture and patterns
-    logger.info("Analyzing texture patterns...")
-    time.sleep(0.4)
+    # Color distribution analysis
+    color_variance = np.var(mean_rgb) if len(mean_rgb) >= 3 else 0
     
+    return {
+        'brightness': mean_brightness,
+        'contrast': std_brightness,
+        'color_variance': color_variance
+    }
+
+def compute_texture_features(img_array: np.ndarray) -> Dict[str, Any]:
+    """Gradient magnitude and grayscale dominance (reference implementation, see above)"""
     # Calculate gradient magnitude for texture analysis
     if len(img_array.shape) == 3:
         gray = np.mean(img_array, axis=2)
@@ -60,12 +112,13 @@ def analyze_image_properties(image: Image.Image, filename: str) -> Dict[str, Any
         np.std(img_array[:,:,1] - img_array[:,:,2]) < 10
     )
     
-    # Color distribution analysis
-    color_variance = np.var(mean_rgb) if len(mean_rgb) >= 3 else 0
-    
-    logger.info("Processing medical context...")
-    time.sleep(0.3)
-    
+    return {
+        'texture_complexity': texture_complexity,
+        'is_grayscale': is_grayscale_dominant
+    }
+
+def determine_findings(features: Dict[str, Any], filename: str, image_hash: str) -> Dict[str, Any]:
+    """Findings stage: image type, candidate findings and calibrated confidence"""
     # Filename-based analysis
     filename_lower = filename.lower()
     
@@ -102,46 +155,70 @@ def analyze_image_properties(image: Image.Image, filename: str) -> Dict[str, Any
         else:
             primary_findings = ['chronic inflammation', 'fibrotic changes', 'cellular atypia']
             confidence_base = 0.84
+            
+    elif 'ct' in re.split(r'[^a-z0-9]+', filename_lower):
+        # Whole word only ('ct_scan.png', DICOM Modality CT): 'ct' is part of many unrelated names
+        image_type = 'CT'
+        primary_findings = ['no acute abnormality', 'degenerative changes', 'incidental findings']
+        confidence_base = 0.80
     else:
         image_type = 'Medical Image'
         primary_findings = ['normal tissue', 'benign changes', 'age-related findings']
         confidence_base = 0.70
     
-    logger.info("Correlating findings with image features...")
-    time.sleep(0.4)
-    
     # Add some randomness based on image hash for consistency
-    image_hash = get_image_hash(image.tobytes())
     random.seed(int(image_hash[:8], 16))  # Use first 8 chars of hash as seed
     
     # Adjust confidence based on actual image properties
-    brightness_factor = min(max((mean_brightness - 100) / 100, -0.1), 0.1)
-    contrast_factor = min(max((std_brightness - 50) / 100, -0.05), 0.05)
-    texture_factor = min(max((texture_complexity - 20) / 100, -0.03), 0.03)
+    brightness_factor = min(max((features['brightness'] - 100) / 100, -0.1), 0.1)
+    contrast_factor = min(max((features['contrast'] - 50) / 100, -0.05), 0.05)
+    texture_factor = min(max((features['texture_complexity'] - 20) / 100, -0.03), 0.03)
     
     final_confidence = confidence_base + brightness_factor + contrast_factor + texture_factor
     final_confidence = min(max(final_confidence, 0.60), 0.95)  # Clamp between 60-95%
     
-    logger.info(f"Analysis complete: {image_type}, confidence: {final_confidence:.2f}")
-    
     return {
         'image_type': image_type,
         'primary_findings': primary_findings,
-        'confidence_base': final_confidence,
-        'brightness': mean_brightness,
-        'contrast': std_brightness,
-        'texture_complexity': texture_complexity,
-        'color_variance': color_variance,
-        'is_grayscale': is_grayscale_dominant,
+        'confidence_base': final_confidence
+    }
+
+def analyze_image_properties(image: Image.Image, filename: str, timer: Optional[StageTimer] = None) -> Dict[str, Any]:
+    """
+    Analyze image properties to determine appropriate medical analysis
+
+    Large images are analyzed in strips or on a reduced pyramid level
+    (see image_stats); 'statistics_resolution' records which one was used.
+    """
+    timer = timer or StageTimer()
+    mode = select_stats_mode(image.size)
+    resolution = {"mode": mode, "scale": 1.0, "analyzed_size": list(image.size)}
+    
+    # The fused kernel yields the statistics and texture features in one stage
+    with timer.stage("stats"):
+        if mode == "tiled":
+            features = compute_features_tiled(image)
+        elif mode == "pyramid":
+            features, resolution = compute_features_pyramid(image)
+        else:
+            features = compute_features(np.asarray(image))
+    
+    with timer.stage("findings"):
+        image_hash = hash_image_pixels(image)
+        findings = determine_findings(features, filename, image_hash)
+    
+    logger.info(f"Analysis complete: {findings['image_type']}, confidence: {findings['confidence_base']:.2f} ({mode} statistics)")
+    
+    return {
+        **findings,
+        **features,
+        'statistics_resolution': resolution,
         'image_hash': image_hash[:12]  # For debugging
     }
 
 def generate_medical_analysis(image_props: Dict[str, Any], filename: str) -> Dict[str, Any]:
     """Generate comprehensive medical analysis based on image properties"""
     
-    logger.info("Generating clinical interpretation...")
-    time.sleep(0.5)
-    
     primary_finding = image_props['primary_findings'][0]
     confidence = image_props['confidence_base']
     
@@ -155,11 +232,8 @@ def generate_medical_analysis(image_props: Dict[str, Any], filename: str) -> Dic
             "percentage": f"{int(additional_confidence * 100)}%"
         })
     
-    logger.info("Consulting specialist databases...")
-    time.sleep(0.3)
-    
     # Generate specialty-specific analysis
-    if image_props['image_type'] in ['MRI', 'CT Abdomen']:
+    if image_props['image_type'] in ['MRI', 'CT', 'CT Abdomen']:
         specialty_analysis = {
             "Radiology": [
                 [primary_finding, confidence],
@@ -199,9 +273,6 @@ def generate_medical_analysis(image_props: Dict[str, Any], filename: str) -> Dic
     elif 'MRI' in image_props['image_type']:
         clinical_insights.append("Consider contrast-enhanced study if clinically indicated")
     
-    logger.info("Finalizing analysis report...")
-    time.sleep(0.2)
-    
     return {
         "success": True,
         "primary_prediction": {
@@ -221,29 +292,28 @@ def generate_medical_analysis(image_props: Dict[str, Any], filename: str) -> Dic
         "analysis_metadata": {
             "model": "Medical AI Analysis v2.1",
             "conditions_analyzed": len(image_props['primary_findings']),
-            "specialties_covered": 2,
-            "processing_time": "2.8s"
+            "specialties_covered": 2
         },
         "heatmap_available": True
     }
 
-def classify(image_data: bytes, filename: str) -> Dict[str, Any]:
+def classify(image_data: bytes, filename: str, heatmap: bool = False) -> Dict[str, Any]:
     """
     Main classification function for medical images
+
+    Runs the decode -> stats -> findings -> report stages (plus a
+    gradient-energy heatmap stage when requested) and reports their
+    measured timings in analysis_metadata.
     """
+    timer = StageTimer()
     try:
-        logger.info(f"Starting comprehensive analysis for {filename}")
-        logger.info(f"Image data size: {len(image_data)} bytes")
+        logger.info(f"Starting analysis for {filename} ({len(image_data)} bytes)")
         
         # Load and validate image
         try:
-            logger.info("Loading and preprocessing image...")
-            time.sleep(0.2)
-            
-            image = Image.open(io.BytesIO(image_data))
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
-            logger.info(f"Image loaded: {image.size}, mode: {image.mode}")
+            with timer.stage("decode"):
+                image, dicom_metadata, routing_name = decode_upload(image_data, filename)
+            logger.info(f"Image loaded: {image.size}, mode: {image.mode}{' (DICOM)' if dicom_metadata else ''}")
         except Exception as e:
             logger.error(f"Failed to load image: {str(e)}")
             return {
@@ -251,13 +321,26 @@ def classify(image_data: bytes, filename: str) -> Dict[str, Any]:
                 "error": f"Failed to load image: {str(e)}"
             }
         
-        # Analyze image properties (includes processing delays)
-        image_props = analyze_image_properties(image, filename)
+        image_props = analyze_image_properties(image, routing_name, timer)
         
-        # Generate medical analysis (includes processing delays)
-        result = generate_medical_analysis(image_props, filename)
+        with timer.stage("report"):
+            result = generate_medical_analysis(image_props, filename)
+            if dicom_metadata:
+                result["image_info"]["dicom"] = dicom_metadata
         
-        logger.info(f"Analysis completed for {filename}: {result['primary_prediction']['condition']} ({result['primary_prediction']['percentage']})")
+        if heatmap:
+            with timer.stage("heatmap"):
+                result["heatmap"] = gradient_energy_heatmap(image)
+        
+        total_ms = timer.total_ms
+        result["analysis_metadata"].update({
+            "processing_time": f"{total_ms / 1000:.3f}s",
+            "processing_time_ms": total_ms,
+            "stage_timings_ms": timer.timings_ms,
+            "statistics_resolution": image_props['statistics_resolution']
+        })
+        
+        logger.info(f"Analysis completed for {filename} in {total_ms:.1f}ms: {result['primary_prediction']['condition']} ({result['primary_prediction']['percentage']})")
         return result
         
     except Exception as e:
@@ -269,13 +352,12 @@ def classify(image_data: bytes, filename: str) -> Dict[str, Any]:
 
 def classify_with_heatmap(image_data: bytes, filename: str) -> Dict[str, Any]:
     """
-    Medical image classification with attention heatmap
+    Medical image classification with a gradient-energy heatmap
+
+    Used when BiomedCLIP is disabled; with the model enabled the server
+    takes the attention heatmap from the zero-shot forward pass instead.
     """
-    logger.info("Performing advanced analysis with heatmap generation...")
-    time.sleep(0.3)  # Additional processing for heatmap
-    
-    result = classify(image_data, filename)
+    result = classify(image_data, filename, heatmap=True)
     if result.get("success"):
         result["heatmap_available"] = True
-        result["analysis_metadata"]["processing_time"] = "3.2s"
-    return result 
\ No newline at end of file
+    return result
@@ -4,13 +4,32 @@ BiomedCLIP model loader with caching
 
 import os
 import logging
-import torch
-import open_clip
-from typing import Optional, Tuple
+import threading
+import time
+from typing import TYPE_CHECKING, Tuple
 import hashlib
 
+from .config import QUANTIZE, MODEL_BACKEND, ONNX_THREADS
+
+if TYPE_CHECKING:
+    import torch
+    from .onnx_encoder import OnnxImageEncoder
+
+# torch and open_clip are imported on first use: with the ONNX backend and
+# warm caches a server never needs them
+
 logger = logging.getLogger(__name__)
 
+QUANTIZATION_MODES = ("none", "int8")
+
+def resolve_quantization(value: str) -> str:
+    """Validated VISION_QUANTIZE; unknown values run (and are reported and cached as) fp32"""
+    value = value.strip().lower()
+    if value not in QUANTIZATION_MODES:
+        logger.warning(f"Unknown quantization {value!r}, using none (supported: {', '.join(QUANTIZATION_MODES)})")
+        return "none"
+    return value
+
 class BiomedCLIPLoader:
     """Singleton loader for BiomedCLIP model"""
     
@@ -18,6 +37,9 @@ class BiomedCLIPLoader:
     _model = None
     _preprocess = None
     _tokenizer = None
+    _encoder = None
+    _load_seconds = None
+    _lock = threading.Lock()
     
     def __new__(cls):
         if cls._instance is None:
@@ -26,11 +48,20 @@ class BiomedCLIPLoader:
     
     def __init__(self):
         self.model_name = "hf-hub:microsoft/BiomedCLIP-PubMedBERT_256-vit_base_patch16_224"
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.backend = MODEL_BACKEND
+        if self.backend == "onnx":
+            # ONNX Runtime's CPU provider; the torch model (label encoding, export) is fp32
+            self.device = "cpu"
+            self.quantization = "none"
+        else:
+            import torch
+            self.device = "cuda" if torch.cuda.is_available() else "cpu"
+            # Dynamic int8 kernels are CPU-only
+            self.quantization = resolve_quantization(QUANTIZE) if self.device == "cpu" else "none"
         self.cache_dir = os.path.expanduser("~/.cache/biomedclip")
         os.makedirs(self.cache_dir, exist_ok=True)
         
-    def load_model(self) -> Tuple[torch.nn.Module, callable, callable]:
+    def load_model(self) -> Tuple["torch.nn.Module", callable, callable]:
         """
         Load BiomedCLIP model, preprocess function, and tokenizer
         
@@ -38,19 +69,26 @@ class BiomedCLIPLoader:
             Tuple of (model, preprocess_fn, tokenizer)
         """
         if self._model is not None:
-            logger.info("Using cached BiomedCLIP model")
+            logger.debug("Using cached BiomedCLIP model")
             return self._model, self._preprocess, self._tokenizer
-            
+        
+        with self._lock:
+            if self._model is not None:
+                return self._model, self._preprocess, self._tokenizer
+            return self._load()
+    
+    def _load(self) -> Tuple["torch.nn.Module", callable, callable]:
+        import open_clip
+        start = time.perf_counter()
         try:
             logger.info(f"Loading BiomedCLIP model: {self.model_name}")
             logger.info(f"Device: {self.device}")
             
-            # Load the model
-            model, preprocess_fn, tokenizer = open_clip.create_model_and_transforms(
-                self.model_name,
-                cache_dir=self.cache_dir,
-                device=self.device
-            )
+            if self.quantization == "int8":
+                model, preprocess_fn = self._load_int8()
+            else:
+                model, preprocess_fn = self._load_fp32()
+            tokenizer = open_clip.get_tokenizer(self.model_name)
             
             # Set to evaluation mode
             model.eval()
@@ -59,23 +97,105 @@ class BiomedCLIPLoader:
             self._model = model
             self._preprocess = preprocess_fn
             self._tokenizer = tokenizer
+            self._load_seconds = round(time.perf_counter() - start, 3)
             
-            logger.info("BiomedCLIP model loaded successfully")
+            logger.info(f"BiomedCLIP model loaded successfully in {self._load_seconds}s")
             return model, preprocess_fn, tokenizer
             
         except Exception as e:
             logger.error(f"Failed to load BiomedCLIP model: {str(e)}")
             raise RuntimeError(f"Model loading failed: {str(e)}")
     
+    def _load_fp32(self):
+        import open_clip
+        # Load the model with its inference (not training-augmentation) transform
+        return open_clip.create_model_from_pretrained(
+            self.model_name,
+            cache_dir=self.cache_dir,
+            device=self.device
+        )
+    
+    def quantized_cache_path(self) -> str:
+        """Quantized model file, keyed by model name and the library versions that pickled it"""
+        import open_clip
+        import torch
+        key = hashlib.sha256(f"{self.model_name}|{torch.__version__}|{open_clip.__version__}".encode()).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"biomedclip_int8_{key}.pt")
+    
+    def _load_int8(self):
+        """Int8 model from the on-disk cache, or quantize the fp32 model and cache it"""
+        import torch
+        path = self.quantized_cache_path()
+        if os.path.exists(path):
+            try:
+                # Written by this loader into our own cache dir, so unpickling it is trusted
+                cached = torch.load(path, map_location="cpu", weights_only=False)
+                logger.info(f"Loaded int8 BiomedCLIP from {path}")
+                return cached["model"], cached["preprocess"]
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable quantized model {path}: {str(e)}")
+        
+        model, preprocess_fn = self._load_fp32()
+        model = quantize_int8(model.eval())
+        try:
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            torch.save({"model": model, "preprocess": preprocess_fn}, tmp_path)
+            os.replace(tmp_path, path)
+            logger.info(f"Quantized BiomedCLIP to int8, cached at {path}")
+        except OSError as e:
+            logger.warning(f"Could not cache quantized model {path}: {str(e)}")
+        return model, preprocess_fn
+    
+    def load_image_encoder(self) -> "OnnxImageEncoder":
+        """
+        ONNX Runtime image encoder, exporting the torch image tower on first use
+        
+        Returns:
+            OnnxImageEncoder over the cached .onnx file
+        """
+        if self._encoder is not None:
+            return self._encoder
+        
+        from .onnx_encoder import OnnxImageEncoder, encoder_path, export_image_encoder
+        path = encoder_path(self.cache_dir, self.model_name)
+        if not os.path.exists(path):
+            model, _, _ = self.load_model()
+            with self._lock:
+                if not os.path.exists(path):
+                    export_image_encoder(model, path)
+        
+        with self._lock:
+            if self._encoder is None:
+                start = time.perf_counter()
+                self._encoder = OnnxImageEncoder(path, ONNX_THREADS)
+                self._load_seconds = round(time.perf_counter() - start, 3)
+                logger.info(f"ONNX image encoder loaded from {path} in {self._load_seconds}s")
+            return self._encoder
+    
     def get_model_info(self) -> dict:
         """Get information about the loaded model"""
         return {
             "model_name": self.model_name,
+            "backend": self.backend,
             "device": self.device,
+            "quantization": self.quantization,
             "cache_dir": self.cache_dir,
-            "loaded": self._model is not None
+            "loaded": (self._encoder if self.backend == "onnx" else self._model) is not None,
+            "load_seconds": self._load_seconds
         }
 
+def quantize_int8(model: "torch.nn.Module") -> "torch.nn.Module":
+    """Dynamic int8 quantization of every nn.Linear (ViT blocks, text tower, projections)"""
+    import torch
+    dtypes = {name: module.weight.dtype for name, module in model.named_modules() if isinstance(module, torch.nn.Linear)}
+    quantized = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    # open_clip reads the compute dtype from a Linear's weight; quantized modules
+    # expose it through int8_original_dtype instead
+    for name, module in quantized.named_modules():
+        if name in dtypes and not isinstance(module, torch.nn.Linear):
+            module.int8_original_dtype = dtypes[name]
+    return quantized
+
 # Global loader instance
 _loader = BiomedCLIPLoader()
 
@@ -83,6 +203,10 @@ def get_model():
     """Get the BiomedCLIP model components"""
     return _loader.load_model()
 
+def get_image_encoder():
+    """Get the ONNX Runtime image encoder (VISION_MODEL_BACKEND=onnx)"""
+    return _loader.load_image_encoder()
+
 def get_model_info():
     """Get model information"""
     return _loader.get_model_info()
@@ -0,0 +1,135 @@
+"""
+ONNX Runtime backend for the BiomedCLIP image encoder
+
+The image tower is exported to ONNX once (with torch) and cached next to
+the model weights, together with its preprocessing settings. Afterwards a
+server process encodes images with ONNX Runtime's CPU execution provider
+and numpy/PIL preprocessing, without importing torch or open_clip at all,
+as long as the label embeddings are cached too (see zero_shot.py).
+"""
+
+import hashlib
+import json
+import logging
+import os
+from importlib import metadata
+from typing import Any, Dict
+
+import numpy as np
+from PIL import Image
+
+try:
+    import onnxruntime as ort
+except ImportError:  # optional: only needed for VISION_MODEL_BACKEND=onnx
+    ort = None
+
+logger = logging.getLogger(__name__)
+
+ONNX_OPSET = 17
+
+RESAMPLING = {
+    "bicubic": Image.Resampling.BICUBIC,
+    "bilinear": Image.Resampling.BILINEAR,
+    "nearest": Image.Resampling.NEAREST,
+}
+
+# Libraries whose upgrade can change the exported graph or how it runs
+KEY_PACKAGES = ("torch", "open_clip_torch", "onnxruntime")
+
+def package_version(name: str) -> str:
+    """Installed version from package metadata, without importing the package"""
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return ""
+
+def encoder_path(cache_dir: str, model_name: str) -> str:
+    """Exported encoder file for one model and library set; its preprocessing config sits next to it as .json"""
+    versions = "|".join(f"{name}={package_version(name)}" for name in KEY_PACKAGES)
+    key = hashlib.sha256(f"{model_name}|opset{ONNX_OPSET}|{versions}".encode()).hexdigest()[:16]
+    return os.path.join(cache_dir, f"image_encoder_{key}.onnx")
+
+def config_path(path: str) -> str:
+    return os.path.splitext(path)[0] + ".json"
+
+def preprocess_config(model) -> Dict[str, Any]:
+    """Input size, normalization and resampling of the model's inference transform"""
+    cfg = dict(getattr(model.visual, "preprocess_cfg", None) or {})
+    size = cfg.get("size", getattr(model.visual, "image_size", 224))
+    if isinstance(size, int):
+        size = (size, size)
+    return {
+        "size": [int(size[0]), int(size[1])],
+        "mean": [float(v) for v in cfg.get("mean", model.visual.image_mean)],
+        "std": [float(v) for v in cfg.get("std", model.visual.image_std)],
+        "interpolation": cfg.get("interpolation", "bicubic"),
+    }
+
+def export_image_encoder(model, path: str) -> None:
+    """Trace model.encode_image to ONNX with a dynamic batch axis (atomically written)"""
+    import torch
+
+    class ImageEncoder(torch.nn.Module):
+        def __init__(self, clip):
+            super().__init__()
+            self.clip = clip
+
+        def forward(self, pixels):
+            return self.clip.encode_image(pixels)
+
+    cfg = preprocess_config(model)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    # Traced with autograd on: under no_grad/inference_mode nn.MultiheadAttention
+    # takes its fused fast path, which has no ONNX export
+    torch.onnx.export(
+        ImageEncoder(model).eval(),
+        torch.zeros(1, 3, *cfg["size"]),
+        tmp_path,
+        input_names=["pixels"],
+        output_names=["features"],
+        dynamic_axes={"pixels": {0: "batch"}, "features": {0: "batch"}},
+        opset_version=ONNX_OPSET,
+        dynamo=False
+    )
+    with open(config_path(tmp_path), "w") as f:
+        json.dump(cfg, f)
+    # Config first: a present .onnx always has its settings next to it
+    os.replace(config_path(tmp_path), config_path(path))
+    os.replace(tmp_path, path)
+    logger.info(f"Exported image encoder to {path}")
+
+def preprocess_image(image: Image.Image, cfg: Dict[str, Any]) -> np.ndarray:
+    """Resize the shortest side, center crop, scale and normalize to a (3, H, W) float32 array"""
+    height, width = cfg["size"]
+    image = image.convert("RGB")
+    scale = max(width / image.width, height / image.height)
+    resized = (max(width, round(image.width * scale)), max(height, round(image.height * scale)))
+    image = image.resize(resized, RESAMPLING.get(cfg["interpolation"], Image.Resampling.BICUBIC))
+    left, top = (resized[0] - width) // 2, (resized[1] - height) // 2
+    pixels = np.asarray(image.crop((left, top, left + width, top + height)), dtype=np.float32)
+    pixels *= np.float32(1 / 255)
+    pixels -= np.asarray(cfg["mean"], dtype=np.float32)
+    pixels /= np.asarray(cfg["std"], dtype=np.float32)
+    return pixels.transpose(2, 0, 1)
+
+class OnnxImageEncoder:
+    """ONNX Runtime session over an exported image encoder"""
+
+    def __init__(self, path: str, threads: int = 0):
+        if ort is None:
+            raise RuntimeError("onnxruntime is not installed (pip install onnxruntime)")
+        options = ort.SessionOptions()
+        if threads > 0:
+            options.intra_op_num_threads = threads
+        self.path = path
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        with open(config_path(path)) as f:
+            self.config = json.load(f)
+
+    def preprocess(self, image: Image.Image) -> np.ndarray:
+        return preprocess_image(image, self.config)
+
+    def encode(self, pixels: np.ndarray) -> np.ndarray:
+        """L2-normalized image embeddings for a (batch, 3, H, W) array"""
+        features = self.session.run(None, {"pixels": np.ascontiguousarray(pixels, dtype=np.float32)})[0]
+        return features / np.linalg.norm(features, axis=-1, keepdims=True)
@@ -0,0 +1,154 @@
+"""
+Content-addressed cache of vision analysis results
+
+Results are keyed by a BLAKE2b hash of the raw upload bytes together with
+everything else that shapes the response (endpoint, filename, analysis
+version, model settings), so a re-upload of the same scan is answered
+without decoding it. Two tiers:
+- memory: bounded LRU per server process
+- disk: optional directory of JSON files shared across restarts/processes
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from .config import RESULT_CACHE_SIZE, RESULT_CACHE_DIR, RESULT_CACHE_DISK_MAX
+
+logger = logging.getLogger(__name__)
+
+def content_key(image_data: bytes, **params: Any) -> str:
+    """Hex BLAKE2b-128 of the upload bytes plus the sorted params"""
+    digest = hashlib.blake2b(digest_size=16)
+    for name in sorted(params):
+        digest.update(f"{name}={params[name]}\0".encode())
+    digest.update(b"\0")
+    digest.update(image_data)
+    return digest.hexdigest()
+
+class ResultCache:
+    """Thread-safe in-memory LRU with an optional on-disk JSON tier"""
+
+    def __init__(self, maxsize: int = RESULT_CACHE_SIZE, directory: str = RESULT_CACHE_DIR,
+                 disk_max: int = RESULT_CACHE_DISK_MAX):
+        self.maxsize = maxsize
+        self.directory = directory or None
+        self.disk_max = disk_max
+        self.hits = {"memory": 0, "disk": 0}
+        self.misses = 0
+        self._disk_writes = 0
+        self._data: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        # Two-level fan-out keeps directories small
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """(cached result, tier it came from: 'memory' or 'disk'), or (None, None)"""
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+                self.hits["memory"] += 1
+                return value, "memory"
+
+        value = self._read_disk(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None, None
+            self.hits["disk"] += 1
+        self._remember(key, value)
+        return value, "disk"
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        self._remember(key, value)
+        self._write_disk(key, value)
+
+    def _remember(self, key: str, value: Dict[str, Any]) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def _read_disk(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.directory:
+            return None
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable cached result {path}: {e}")
+            return None
+
+    def _write_disk(self, key: str, value: Dict[str, Any]) -> None:
+        if not self.directory:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(value, f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"Could not write cached result {path}: {e}")
+            return
+        self._prune_disk()
+
+    def _disk_files(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".json"):
+                    yield os.path.join(root, name)
+
+    def _prune_disk(self) -> None:
+        """Drop the least recently written tenth once the disk tier exceeds disk_max files"""
+        if self.disk_max <= 0:
+            return
+        # Listing the directory is O(files), so only check every disk_max / 10 writes
+        self._disk_writes += 1
+        if self._disk_writes % max(self.disk_max // 10, 1):
+            return
+        files = list(self._disk_files())
+        if len(files) <= self.disk_max:
+            return
+        files.sort(key=lambda path: os.stat(path).st_mtime_ns)
+        for path in files[:len(files) - self.disk_max + self.disk_max // 10]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.hits["memory"] + self.hits["disk"]
+        lookups = hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "disk_dir": self.directory,
+            "memory_hits": self.hits["memory"],
+            "disk_hits": self.hits["disk"],
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0
+        }
+
+# Global cache instance
+result_cache = ResultCache()
@@ -0,0 +1,69 @@
+"""
+Whole-slide histopathology route
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+from fastapi import APIRouter, File, UploadFile, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+
+from ..config import SLIDE_MAX_IN_FLIGHT
+from ..executor import inference_executor, InferenceTimeout
+from ..slide import analyze_slide
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+@router.post("/predict-slide")
+async def predict_slide(file: UploadFile = File(...)):
+    """
+    Tiled analysis of a whole-slide image (SVS/NDPI/MRXS via OpenSlide, or TIFF/PNG/JPEG)
+    
+    Returns:
+        - Primary prediction and ranked tile-level patterns
+        - Slide info: dimensions, tiles analyzed and skipped as background
+    """
+    if not file.filename:
+        raise HTTPException(status_code=400, detail="No file provided")
+    
+    tmp_path = None
+    try:
+        # Worker processes read tiles from disk, so the slide is spooled to a file, not to memory
+        suffix = os.path.splitext(file.filename)[1]
+        with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
+            tmp_path = tmp.name
+            await run_in_threadpool(shutil.copyfileobj, file.file, tmp, UPLOAD_CHUNK_SIZE)
+        
+        start = time.perf_counter()
+        logger.info(f"Processing slide: {file.filename}, size: {os.path.getsize(tmp_path)} bytes")
+        result = await analyze_slide(tmp_path, inference_executor.run, SLIDE_MAX_IN_FLIGHT)
+        result["processing_time_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        logger.info(f"Slide analysis completed for {file.filename}: {result['slide_info']}")
+        
+        return JSONResponse(content={
+            "status": "success",
+            "filename": file.filename,
+            "analysis": result
+        })
+    
+    except InferenceTimeout as e:
+        logger.error(f"Timed out analyzing slide tile of {file.filename}: {str(e)}")
+        raise HTTPException(status_code=504, detail="Slide analysis timed out - please try again")
+    except ValueError as e:
+        # Slides PIL cannot decode within the memory limit (OpenSlide not available)
+        logger.error(f"Cannot analyze slide {file.filename}: {str(e)}")
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error processing slide {file.filename}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Slide analysis failed - please try again")
+    finally:
+        if tmp_path is not None:
+            os.remove(tmp_path)
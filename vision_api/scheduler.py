@@ -0,0 +1,188 @@
+"""
+Micro-batching scheduler that coalesces concurrent model requests
+
+Requests are queued and collected into a batch until either `max_batch_size`
+items are waiting or the oldest one has waited `max_wait_ms`. Each batch is
+handed to a single batch function (one forward pass) on a dedicated thread,
+and the per-item results fan back out to the waiting callers.
+"""
+
+import asyncio
+import logging
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from .config import BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS
+
+logger = logging.getLogger(__name__)
+
+# Recent queue waits kept for the percentile metrics
+_WAIT_WINDOW = 1024
+
+BatchFn = Callable[[List[Any]], Sequence[Any]]
+
+class BatchMetrics:
+    """Batch-size and queue-wait counters for one scheduler"""
+
+    def __init__(self):
+        self.batches = 0
+        self.items = 0
+        self.failed_batches = 0
+        self.batch_sizes: Counter = Counter()
+        self.forward_ms_total = 0.0
+        self._waits_ms: deque = deque(maxlen=_WAIT_WINDOW)
+
+    def record(self, size: int, waits_ms: List[float], forward_ms: float, failed: bool) -> None:
+        self.batches += 1
+        self.items += size
+        self.batch_sizes[size] += 1
+        self.forward_ms_total += forward_ms
+        self._waits_ms.extend(waits_ms)
+        if failed:
+            self.failed_batches += 1
+
+    def snapshot(self) -> dict:
+        waits = sorted(self._waits_ms)
+
+        def percentile(p: float) -> float:
+            if not waits:
+                return 0.0
+            return round(waits[min(len(waits) - 1, int(p * len(waits)))], 3)
+
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "failed_batches": self.failed_batches,
+            "mean_batch_size": round(self.items / self.batches, 3) if self.batches else 0.0,
+            "batch_size_histogram": {str(size): count for size, count in sorted(self.batch_sizes.items())},
+            "mean_forward_ms": round(self.forward_ms_total / self.batches, 3) if self.batches else 0.0,
+            "queue_wait_ms": {
+                "mean": round(sum(waits) / len(waits), 3) if waits else 0.0,
+                "p50": percentile(0.50),
+                "p95": percentile(0.95),
+                "max": round(waits[-1], 3) if waits else 0.0
+            }
+        }
+
+class MicroBatchScheduler:
+    """
+    Coalesce concurrent `submit` calls into batched calls of `batch_fn`
+
+    `batch_fn` receives a list of items and returns one result per item, in
+    order. A result that is an Exception instance is raised to that item's
+    caller only; an exception raised by `batch_fn` fails the whole batch.
+    Batches run one at a time, so requests arriving during a forward pass
+    are collected into the next batch.
+    """
+
+    def __init__(self, batch_fn: BatchFn, max_batch_size: int = BATCH_MAX_SIZE,
+                 max_wait_ms: float = BATCH_MAX_WAIT_MS, name: str = "model"):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_ms = max_wait_ms
+        self.name = name
+        self.metrics = BatchMetrics()
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._thread: Optional[ThreadPoolExecutor] = None
+        # Entries taken off the queue for the batch being collected or run
+        self._batch: List[Tuple[Any, asyncio.Future, float]] = []
+
+    def start(self) -> None:
+        """Start the batching loop on the running event loop (idempotent)"""
+        if self._worker is not None and not self._worker.done():
+            return
+        self._queue = asyncio.Queue()
+        # One thread: the model is not re-entrant and batches run back to back
+        self._thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"{self.name}-batch")
+        self._worker = asyncio.get_running_loop().create_task(self._run())
+        logger.info(f"{self.name} batching started (max batch {self.max_batch_size}, max wait {self.max_wait_ms:g}ms)")
+
+    async def shutdown(self) -> None:
+        """Stop the loop, failing requests that are still queued or in the interrupted batch"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        pending = [future for _, future, _ in self._batch]
+        self._batch = []
+        if self._queue is not None:
+            while not self._queue.empty():
+                pending.append(self._queue.get_nowait()[1])
+        for future in pending:
+            if not future.done():
+                future.set_exception(RuntimeError(f"{self.name} scheduler shut down"))
+        if self._thread is not None:
+            self._thread.shutdown(wait=True)
+            self._thread = None
+
+    async def submit(self, item: Any) -> Any:
+        """Queue one item and wait for its result from the next batch"""
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self) -> List[Tuple[Any, asyncio.Future, float]]:
+        """Wait for one item, then gather more until the batch is full or the wait expires"""
+        batch = self._batch = []
+        batch.append(await self._queue.get())
+        deadline = batch[0][2] + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            # Take whatever is already queued without yielding
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            # Callers that gave up (timeout, disconnect) are not worth a forward pass
+            batch = [entry for entry in batch if not entry[1].cancelled()]
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            waits_ms = [(started - queued) * 1000 for _, _, queued in batch]
+            items = [item for item, _, _ in batch]
+            try:
+                results = await loop.run_in_executor(self._thread, self.batch_fn, items)
+                if len(results) != len(items):
+                    raise RuntimeError(f"{self.name} batch returned {len(results)} results for {len(items)} items")
+                error = None
+            except Exception as e:
+                logger.error(f"{self.name} batch of {len(items)} failed: {str(e)}")
+                results, error = None, e
+            self.metrics.record(len(items), waits_ms, (time.perf_counter() - started) * 1000, error is not None)
+
+            for index, (_, future, _) in enumerate(batch):
+                if future.done():
+                    continue
+                result = error if error is not None else results[index]
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def get_info(self) -> dict:
+        return {
+            "running": self._worker is not None and not self._worker.done(),
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            **self.metrics.snapshot()
+        }
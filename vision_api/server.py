@@ -3,14 +3,29 @@ FastAPI server for BiomedCLIP vision analysis with Gemini integration
 """
 
 import os
+import asyncio
 import logging
+from contextlib import ExitStack
+from typing import List, Optional, Tuple
 from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 import uvicorn
 
-from .inference import classify, classify_with_heatmap
+from .inference import classify, classify_with_heatmap, ANALYSIS_VERSION
+from .executor import inference_executor, InferenceTimeout
+from .result_cache import result_cache, content_key
+from .heatmap import heatmap_cache, heatmap_key
+from .scheduler import MicroBatchScheduler
+from .batch import expand_uploads, stream_batch
+from .config import (
+    BIOMEDCLIP_ENABLED, INFERENCE_TIMEOUT, PRELOAD_MODEL, WARMUP_PASSES, WARMUP_BATCH_SIZE,
+    PREDICT_BATCH_CONCURRENCY, PREDICT_BATCH_MAX_FILES
+)
+from .warmup import ModelWarmup
 from .routes.explain import router as explain_router
+from .routes.slide import router as slide_router
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -33,6 +48,103 @@ app.add_middleware(
 
 # Include routes
 app.include_router(explain_router, tags=["Gemini Explanations"])
+app.include_router(slide_router, tags=["Whole-Slide Analysis"])
+
+# Concurrent /predict calls share batched BiomedCLIP forward passes
+zero_shot_scheduler: Optional[MicroBatchScheduler] = None
+if BIOMEDCLIP_ENABLED:
+    from .zero_shot import classify_batch, zero_shot_signature
+    from .loader import get_model_info
+    zero_shot_scheduler = MicroBatchScheduler(classify_batch, name="biomedclip")
+model_warmup = ModelWarmup(zero_shot_scheduler, PRELOAD_MODEL, WARMUP_PASSES, WARMUP_BATCH_SIZE)
+
+@app.on_event("startup")
+async def start_inference_pool():
+    inference_executor.start()
+    if zero_shot_scheduler is not None:
+        zero_shot_scheduler.start()
+    model_warmup.start()
+
+@app.on_event("shutdown")
+async def stop_inference_pool():
+    inference_executor.shutdown()
+    if zero_shot_scheduler is not None:
+        await zero_shot_scheduler.shutdown()
+
+async def zero_shot_predictions(file_content: bytes, filename: str) -> Optional[dict]:
+    """BiomedCLIP top predictions via the batching scheduler (None when disabled)"""
+    if zero_shot_scheduler is None:
+        return None
+    try:
+        return await asyncio.wait_for(zero_shot_scheduler.submit(file_content), INFERENCE_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.error(f"Timed out running BiomedCLIP on {filename}")
+        return {"error": "Model prediction timed out"}
+    except Exception as e:
+        logger.error(f"BiomedCLIP prediction failed for {filename}: {str(e)}")
+        return {"error": "Model prediction failed"}
+
+# Hashing releases the GIL, but large uploads are still hashed off the event loop
+INLINE_HASH_BYTES = 1 << 20
+
+async def hash_upload(key_fn, file_content: bytes, **params) -> str:
+    if len(file_content) <= INLINE_HASH_BYTES:
+        return key_fn(file_content, **params)
+    return await run_in_threadpool(lambda: key_fn(file_content, **params))
+
+async def result_cache_key(file_content: bytes, filename: str, endpoint: str) -> str:
+    """Content-addressed key: upload bytes plus everything else that shapes the result"""
+    params = {"endpoint": endpoint, "filename": filename or "", "analysis": ANALYSIS_VERSION}
+    if zero_shot_scheduler is not None:
+        params["zero_shot"] = zero_shot_signature()
+    return await hash_upload(content_key, file_content, **params)
+
+async def heatmap_cache_key(file_content: bytes) -> str:
+    """Heatmaps come from BiomedCLIP attention when enabled, else from image gradients"""
+    source = zero_shot_signature() if zero_shot_scheduler is not None else "gradient_energy"
+    return await hash_upload(heatmap_key, file_content, source=source)
+
+async def remember_heatmap(file_content: bytes, model_predictions: Optional[dict]) -> Optional[dict]:
+    """Move the attention heatmap out of the model predictions into the heatmap cache"""
+    heatmap = (model_predictions or {}).pop("heatmap", None)
+    if heatmap is not None:
+        heatmap_cache.put(await heatmap_cache_key(file_content), heatmap)
+    return heatmap
+
+def is_cacheable(result: dict) -> bool:
+    """Only complete, successful analyses are cached (with model predictions when the model is enabled)"""
+    if not result.get("success"):
+        return False
+    if zero_shot_scheduler is not None and "model_predictions" not in result:
+        return False
+    return "error" not in (result.get("model_predictions") or {})
+
+async def analyze_upload(file_content: bytes, filename: str) -> Tuple[dict, Optional[str]]:
+    """
+    /predict analysis of one upload, through the result cache
+    
+    Returns:
+        Tuple of (analysis, cache tier it came from or None when computed)
+    """
+    # Re-uploads of the same scan are answered without decoding it
+    key = await result_cache_key(file_content, filename, "predict")
+    result, tier = result_cache.get(key)
+    if result is None:
+        # Perform enhanced classification in the process pool, alongside the batched model pass
+        result, model_predictions = await asyncio.gather(
+            inference_executor.run(classify, file_content, filename),
+            zero_shot_predictions(file_content, filename)
+        )
+        # Kept for a later /predict-with-heatmap of the same image
+        await remember_heatmap(file_content, model_predictions)
+        if model_predictions is not None and result.get("success"):
+            result["model_predictions"] = model_predictions
+        if is_cacheable(result):
+            result_cache.put(key, result)
+        logger.info(f"Analysis completed for {filename}")
+    else:
+        logger.info(f"Analysis for {filename} served from the {tier} cache")
+    return result, tier
 
 @app.get("/")
 async def root():
@@ -46,16 +158,32 @@ async def root():
             "Gemini AI explanations",
             "Image categorization",
             "Confidence scoring",
-            "DICOM support"
+            "DICOM support",
+            "Tiled whole-slide analysis",
+            "Streaming batch prediction"
         ]
     }
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness for traffic: 503 until the preloaded model has finished warming up"""
+    status = {
+        **model_warmup.status(),
+        "model": get_model_info() if zero_shot_scheduler is not None else None
+    }
+    return JSONResponse(status_code=200 if model_warmup.ready else 503, content=status)
+
 @app.get("/health")
 async def health_check():
     return {
         "status": "healthy",
         "service": "BiomedCLIP Vision API",
-        "version": "2.1.0"
+        "version": "2.1.0",
+        "inference": inference_executor.get_info(),
+        "batching": zero_shot_scheduler.get_info() if zero_shot_scheduler is not None else None,
+        "result_cache": result_cache.stats(),
+        "heatmap_cache": heatmap_cache.stats(),
+        "readiness": model_warmup.status()
     }
 
 @app.post("/predict")
@@ -75,22 +203,57 @@ async def predict_image(file: UploadFile = File(...)):
         
         # Read file content
         file_content = await file.read()
-        
-        # Perform enhanced classification
-        result = classify(file_content, file.filename)
-        
-        logger.info(f"Analysis completed for {file.filename}")
+        result, tier = await analyze_upload(file_content, file.filename)
         
         return JSONResponse(content={
             "status": "success",
             "filename": file.filename,
+            "cached": tier,
             "analysis": result
         })
         
+    except InferenceTimeout as e:
+        logger.error(f"Timed out processing file {file.filename}: {str(e)}")
+        raise HTTPException(status_code=504, detail="Analysis timed out - please try again")
     except Exception as e:
         logger.error(f"Error processing file: {str(e)}")
         raise HTTPException(status_code=500, detail="Analysis failed - please try again")
 
+@app.post("/predict/batch")
+async def predict_batch(files: List[UploadFile] = File(...)):
+    """
+    Analyze many images, or zip archives of images, in one request
+    
+    Images are analyzed concurrently (VISION_PREDICT_BATCH_CONCURRENCY at
+    a time) through the same cache, process pool and batched model path
+    as /predict.
+    
+    Returns:
+        application/x-ndjson stream: one line per image as it finishes
+        ({index, filename, status, cached, analysis} or {index, filename,
+        status: "error", error}), then a {"summary": ...} line
+    """
+    uploads = [(file.filename or "", file.file) for file in files]
+    items, archives = await run_in_threadpool(expand_uploads, uploads)
+    if not items:
+        for archive in archives:
+            archive.close()
+        raise HTTPException(status_code=400, detail="No images provided")
+    if len(items) > PREDICT_BATCH_MAX_FILES:
+        for archive in archives:
+            archive.close()
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {PREDICT_BATCH_MAX_FILES} images")
+    logger.info(f"Processing batch of {len(items)} images from {len(files)} uploads")
+    
+    async def lines():
+        with ExitStack() as stack:
+            for archive in archives:
+                stack.enter_context(archive)
+            async for line in stream_batch(items, analyze_upload, PREDICT_BATCH_CONCURRENCY):
+                yield line
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 @app.post("/predict-with-heatmap")
 async def predict_with_heatmap(file: UploadFile = File(...)):
     """
@@ -107,17 +270,49 @@ async def predict_with_heatmap(file: UploadFile = File(...)):
         # Read file content
         file_content = await file.read()
         
-        # Perform enhanced classification with heatmap
-        result = classify_with_heatmap(file_content, file.filename)
-        
-        logger.info(f"Heatmap analysis completed for {file.filename}")
+        key = await result_cache_key(file_content, file.filename, "predict-with-heatmap")
+        result, tier = result_cache.get(key)
+        if result is None:
+            heatmap_lookup_key = await heatmap_cache_key(file_content)
+            heatmap, _ = heatmap_cache.get(heatmap_lookup_key)
+            if heatmap is not None or zero_shot_scheduler is not None:
+                # The /predict analysis, shared through its cache entry; a fresh model
+                # pass also leaves the attention heatmap in the heatmap cache
+                analysis, _ = await analyze_upload(file_content, file.filename)
+                # Copy: the cached /predict result must not gain heatmap fields
+                result = dict(analysis)
+                if heatmap is None:
+                    heatmap, _ = heatmap_cache.get(heatmap_lookup_key)
+                if heatmap is None and result.get("success"):
+                    # /predict came from the cache but the heatmap was evicted: rerun the model pass for it
+                    heatmap = await remember_heatmap(file_content, await zero_shot_predictions(file_content, file.filename))
+            else:
+                # Gradient-energy heatmap computed alongside the analysis in the process pool
+                result = await inference_executor.run(classify_with_heatmap, file_content, file.filename)
+                heatmap = result.pop("heatmap", None)
+                if heatmap is not None:
+                    heatmap_cache.put(heatmap_lookup_key, heatmap)
+            
+            if result.get("success"):
+                result["heatmap"] = heatmap
+                result["heatmap_available"] = heatmap is not None
+                result["attention_regions"] = heatmap["attention_regions"] if heatmap else []
+            if is_cacheable(result) and result.get("heatmap_available"):
+                result_cache.put(key, result)
+            logger.info(f"Heatmap analysis completed for {file.filename}")
+        else:
+            logger.info(f"Heatmap analysis for {file.filename} served from the {tier} cache")
         
         return JSONResponse(content={
             "status": "success",
             "filename": file.filename,
+            "cached": tier,
             "analysis": result
         })
         
+    except InferenceTimeout as e:
+        logger.error(f"Timed out processing file {file.filename} with heatmap: {str(e)}")
+        raise HTTPException(status_code=504, detail="Analysis timed out - please try again")
     except Exception as e:
         logger.error(f"Error processing file with heatmap: {str(e)}")
         raise HTTPException(status_code=500, detail="Analysis failed - please try again")
@@ -126,7 +321,7 @@ async def predict_with_heatmap(file: UploadFile = File(...)):
 async def get_capabilities():
     """Get API capabilities and supported features"""
     return {
-        "supported_formats": ["PNG", "JPG", "JPEG", "DICOM", "DCM"],
+        "supported_formats": ["PNG", "JPG", "JPEG", "DICOM", "DCM", "TIFF", "SVS", "NDPI"],
         "image_categories": [
             "Histology", "Radiology", "Endoscopy", 
             "Dermatology", "Ophthalmology", "Cardiology", "General"
@@ -143,7 +338,9 @@ async def get_capabilities():
             "Confidence scoring",
             "Image categorization",
             "Top-5 predictions",
-            "Attention heatmaps"
+            "Attention heatmaps",
+            "Tiled whole-slide analysis",
+            "Streaming batch prediction (files or zip)"
         ]
     }
 
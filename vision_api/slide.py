@@ -0,0 +1,307 @@
+"""
+Tiled whole-slide histopathology analysis
+
+A slide is never held in memory as one image:
+1. a low-resolution thumbnail gives a cheap tissue mask
+2. fixed-size tiles that contain enough tissue are read and analyzed in
+   worker processes (background tiles are skipped)
+3. tile-level pattern scores are folded into running totals and reported
+   in the usual primary_prediction / top_predictions shape
+
+Gigapixel formats (SVS, NDPI, MRXS, ...) are read through OpenSlide when it
+is installed: each worker call opens the slide, reads a run of tiles lazily
+and closes it again, so no reader outlives the call. Without OpenSlide, PIL
+decodes the image once in the server process (up to SLIDE_MAX_PIL_PIXELS)
+and the workers receive tile pixels. Either way memory is bounded by the
+tiles in flight, not by the slide.
+"""
+
+import asyncio
+import logging
+import math
+from dataclasses import dataclass
+from itertools import islice
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from .config import (
+    SLIDE_TILE_SIZE, SLIDE_MIN_TISSUE, SLIDE_THUMBNAIL_SIZE, SLIDE_TILES_PER_TASK, SLIDE_MAX_PIL_PIXELS
+)
+from .image_stats import compute_features
+
+try:
+    import openslide
+except ImportError:  # optional: only needed for vendor whole-slide formats
+    openslide = None
+
+logger = logging.getLogger(__name__)
+
+# Thumbnail pixels count as tissue when stained (saturated) and not blank glass
+TISSUE_MIN_SATURATION = 20
+TISSUE_MAX_GRAY = 230
+
+Tile = Tuple[int, int, int, int]  # x, y, width, height at full resolution
+
+class SlideReader:
+    """
+    Region reads from a slide via OpenSlide, or from a PIL image as a fallback
+
+    OpenSlide reads regions lazily. PIL decodes the whole image on the first
+    read, so it is refused above `max_pil_pixels` with a ValueError.
+    """
+
+    def __init__(self, path: str, max_pil_pixels: int = SLIDE_MAX_PIL_PIXELS):
+        self.path = path
+        self._slide = None
+        self._image: Optional[Image.Image] = None
+        if openslide is not None:
+            try:
+                self._slide = openslide.OpenSlide(path)
+            except openslide.OpenSlideError:
+                self._slide = None
+        if self._slide is None:
+            try:
+                image = Image.open(path)
+            except Image.DecompressionBombError as e:
+                raise ValueError(f"Slide is too large to decode without OpenSlide: {str(e)}")
+            width, height = image.size
+            if width * height > max_pil_pixels:
+                image.close()
+                raise ValueError(
+                    f"Slide of {width}x{height} pixels needs OpenSlide "
+                    f"(without it the limit is {max_pil_pixels} pixels)"
+                )
+            self._image = image
+
+    @property
+    def backend(self) -> str:
+        return "openslide" if self._slide is not None else "pil"
+
+    @property
+    def dimensions(self) -> Tuple[int, int]:
+        return self._slide.dimensions if self._slide is not None else self._image.size
+
+    def read_tile(self, tile: Tile) -> Image.Image:
+        x, y, width, height = tile
+        if self._slide is not None:
+            return self._slide.read_region((x, y), 0, (width, height)).convert("RGB")
+        return self._image.crop((x, y, x + width, y + height)).convert("RGB")
+
+    def thumbnail(self, max_size: int) -> Image.Image:
+        if self._slide is not None:
+            return self._slide.get_thumbnail((max_size, max_size)).convert("RGB")
+        if self._image.mode not in ("RGB", "RGBA", "L"):
+            self._image = self._image.convert("RGB")
+        # Box-reduce the decoded image directly instead of copying it at full size first
+        factor = max(1, math.ceil(max(self._image.size) / max_size))
+        image = self._image.reduce(factor) if factor > 1 else self._image.copy()
+        image.thumbnail((max_size, max_size), Image.Resampling.BOX)
+        return image.convert("RGB")
+
+    def close(self) -> None:
+        if self._slide is not None:
+            self._slide.close()
+        if self._image is not None:
+            self._image.close()
+
+def tissue_mask(thumbnail: Image.Image) -> np.ndarray:
+    """Boolean mask of stained, non-background thumbnail pixels"""
+    saturation = np.asarray(thumbnail.convert("HSV"))[:, :, 1]
+    gray = np.asarray(thumbnail.convert("L"))
+    return (saturation >= TISSUE_MIN_SATURATION) & (gray <= TISSUE_MAX_GRAY)
+
+@dataclass
+class SlidePlan:
+    """Tile grid of one slide plus the tissue mask used to filter it"""
+
+    path: str
+    backend: str
+    dimensions: Tuple[int, int]
+    tile_size: int
+    mask: np.ndarray
+    min_tissue: float
+
+    def __post_init__(self):
+        # Summed-area table: tissue fraction of any rectangle in O(1)
+        self._integral = np.pad(self.mask.astype(np.int64).cumsum(0).cumsum(1), ((1, 0), (1, 0)))
+        self._scale_x = self.mask.shape[1] / self.dimensions[0]
+        self._scale_y = self.mask.shape[0] / self.dimensions[1]
+
+    @property
+    def tile_count(self) -> int:
+        width, height = self.dimensions
+        return math.ceil(width / self.tile_size) * math.ceil(height / self.tile_size)
+
+    def tissue_fraction(self, tile: Tile) -> float:
+        x, y, width, height = tile
+        left, top = int(x * self._scale_x), int(y * self._scale_y)
+        right = max(left + 1, min(self.mask.shape[1], math.ceil((x + width) * self._scale_x)))
+        bottom = max(top + 1, min(self.mask.shape[0], math.ceil((y + height) * self._scale_y)))
+        table = self._integral
+        tissue = table[bottom, right] - table[top, right] - table[bottom, left] + table[top, left]
+        return float(tissue) / ((right - left) * (bottom - top))
+
+    def tissue_tiles(self) -> Iterator[Tuple[Tile, float]]:
+        """Lazily yield (tile, tissue fraction) for tiles with enough tissue, row by row"""
+        width, height = self.dimensions
+        for y in range(0, height, self.tile_size):
+            for x in range(0, width, self.tile_size):
+                tile = (x, y, min(self.tile_size, width - x), min(self.tile_size, height - y))
+                fraction = self.tissue_fraction(tile)
+                if fraction >= self.min_tissue:
+                    yield tile, fraction
+
+def plan_slide(reader: SlideReader, tile_size: int = SLIDE_TILE_SIZE, min_tissue: float = SLIDE_MIN_TISSUE,
+               thumbnail_size: int = SLIDE_THUMBNAIL_SIZE) -> SlidePlan:
+    """Build the tile grid and tissue mask of an open slide"""
+    mask = tissue_mask(reader.thumbnail(thumbnail_size))
+    return SlidePlan(reader.path, reader.backend, reader.dimensions, tile_size, mask, min_tissue)
+
+def tile_pattern_scores(features: Dict[str, Any]) -> Dict[str, float]:
+    """
+    Heuristic 0..1 scores of histology patterns for one H&E tile
+
+    Hematoxylin-dense (dark) tiles suggest nuclei, texture suggests
+    pleomorphism, and a spread between channel means suggests eosin-rich
+    stroma.
+    """
+    nuclear = min(max((200 - features['brightness']) / 100, 0.0), 1.0)
+    texture = min(max(features['texture_complexity'] / 40, 0.0), 1.0)
+    stroma = min(max(features['color_variance'] / 400, 0.0), 1.0)
+    return {
+        "normal tissue architecture": (1 - nuclear) * (1 - texture),
+        "cellular atypia": nuclear * texture,
+        "inflammatory infiltrate": nuclear * (1 - stroma),
+        "fibrotic changes": (1 - nuclear) * stroma,
+        "necrotic tissue": (1 - texture) * (1 - stroma) * (1 - nuclear) * 0.5,
+    }
+
+def score_tile(pixels: np.ndarray, tile: Tile, tissue: float) -> Dict[str, Any]:
+    return {"tile": tile, "tissue": tissue, "scores": tile_pattern_scores(compute_features(pixels))}
+
+def analyze_tiles(path: str, tiles: List[Tuple[Tile, float]]) -> List[Dict[str, Any]]:
+    """Worker entry point (OpenSlide): open the slide, read and score a run of tiles, close it"""
+    reader = SlideReader(path)
+    try:
+        return [score_tile(np.asarray(reader.read_tile(tile)), tile, tissue) for tile, tissue in tiles]
+    finally:
+        reader.close()
+
+def analyze_tile_pixels(pixels: np.ndarray, tile: Tile, tissue: float) -> List[Dict[str, Any]]:
+    """Worker entry point (PIL fallback): score one tile read by the server process"""
+    return [score_tile(pixels, tile, tissue)]
+
+def chunked(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, max(size, 1)))
+        if not chunk:
+            return
+        yield chunk
+
+class TileAggregator:
+    """Tissue-weighted running totals of tile pattern scores"""
+
+    def __init__(self):
+        self.tiles = 0
+        self.weight = 0.0
+        self.totals: Dict[str, float] = {}
+        self.dominant: Dict[str, int] = {}
+
+    def add(self, result: Dict[str, Any]) -> None:
+        self.tiles += 1
+        self.weight += result["tissue"]
+        scores = result["scores"]
+        for pattern, score in scores.items():
+            self.totals[pattern] = self.totals.get(pattern, 0.0) + score * result["tissue"]
+        top = max(scores, key=scores.get)
+        self.dominant[top] = self.dominant.get(top, 0) + 1
+
+    def predictions(self) -> List[Dict[str, Any]]:
+        """Patterns ranked by mean score, as condition/confidence/percentage entries"""
+        if not self.tiles:
+            return []
+        means = {pattern: total / self.weight for pattern, total in self.totals.items()}
+        share_total = sum(means.values()) or 1.0
+        ranked = sorted(means.items(), key=lambda item: item[1], reverse=True)
+        predictions = []
+        for pattern, mean in ranked:
+            # Same 60-95% band as the whole-image analysis
+            confidence = round(0.60 + 0.35 * mean / share_total, 4)
+            predictions.append({
+                "condition": pattern,
+                "confidence": confidence,
+                "percentage": f"{int(confidence * 100)}%",
+                "tile_fraction": round(self.dominant.get(pattern, 0) / self.tiles, 4)
+            })
+        return predictions
+
+RunFn = Callable[..., Awaitable[Any]]
+
+async def analyze_slide(path: str, run: RunFn, max_in_flight: int,
+                        tiles_per_task: int = SLIDE_TILES_PER_TASK) -> Dict[str, Any]:
+    """
+    Analyze a slide tile by tile
+
+    Args:
+        path: Slide file readable by the worker processes
+        run: Async callable running fn(*args) in a worker (InferenceExecutor.run)
+        max_in_flight: Most worker calls submitted at once; bounds memory and queueing
+        tiles_per_task: OpenSlide tiles read per worker call (the PIL fallback sends one)
+
+    Returns:
+        Analysis with primary_prediction / top_predictions and slide_info
+    """
+    loop = asyncio.get_running_loop()
+    reader = await loop.run_in_executor(None, SlideReader, path)
+    aggregator = TileAggregator()
+    pending = set()
+
+    def add_results(done) -> None:
+        for task in done:
+            for result in task.result():
+                aggregator.add(result)
+
+    try:
+        plan = await loop.run_in_executor(None, plan_slide, reader)
+        lazy = reader.backend == "openslide"
+        for chunk in chunked(plan.tissue_tiles(), tiles_per_task if lazy else 1):
+            if len(pending) >= max_in_flight:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                add_results(done)
+            if lazy:
+                call = run(analyze_tiles, path, chunk)
+            else:
+                (tile, tissue), = chunk
+                image = await loop.run_in_executor(None, reader.read_tile, tile)
+                call = run(analyze_tile_pixels, np.asarray(image), tile, tissue)
+            pending.add(asyncio.ensure_future(call))
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            add_results(done)
+    finally:
+        for task in pending:
+            task.cancel()
+        reader.close()
+
+    predictions = aggregator.predictions()
+    slide_info = {
+        "backend": plan.backend,
+        "dimensions": list(plan.dimensions),
+        "tile_size": plan.tile_size,
+        "tiles_total": plan.tile_count,
+        "tiles_analyzed": aggregator.tiles,
+        "tiles_skipped_background": plan.tile_count - aggregator.tiles,
+        "tissue_fraction": round(float(plan.mask.mean()), 4)
+    }
+    if not predictions:
+        return {"success": False, "error": "No tissue detected on the slide", "slide_info": slide_info}
+    return {
+        "success": True,
+        "primary_prediction": {key: predictions[0][key] for key in ("condition", "confidence", "percentage")},
+        "top_predictions": predictions[1:],
+        "image_info": {"category": "Histopathology", "mode": "RGB", "size": "Tiled"},
+        "slide_info": slide_info
+    }
@@ -0,0 +1,90 @@
+"""
+Startup preload and warmup of the BiomedCLIP path, and readiness reporting
+
+With preloading on, the server loads the model and runs a few synthetic
+batches through the same scheduler real requests use (so the first user
+request doesn't pay for model construction, the label embeddings or the
+first-forward warmup). /ready reports ready only once that has finished.
+"""
+
+import asyncio
+import io
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from PIL import Image
+
+from .scheduler import MicroBatchScheduler
+
+logger = logging.getLogger(__name__)
+
+def synthetic_image(size: int = 256, seed: int = 0) -> bytes:
+    """PNG of random noise, decoded and preprocessed like a real upload"""
+    rng = np.random.default_rng(seed)
+    buffer = io.BytesIO()
+    Image.fromarray(rng.integers(0, 256, (size, size, 3), dtype=np.uint8)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+class ModelWarmup:
+    """
+    Tracks model readiness: pending -> loading -> ready | failed
+
+    Without preloading the model stays lazy and the server counts as
+    ready immediately (state 'lazy'); without the model at all the state
+    is 'disabled'.
+    """
+
+    def __init__(self, scheduler: Optional[MicroBatchScheduler], preload: bool, passes: int, batch_size: int):
+        self.scheduler = scheduler
+        self.preload = preload and scheduler is not None
+        self.passes = passes
+        self.batch_size = max(1, batch_size)
+        if scheduler is None:
+            self.state = "disabled"
+        else:
+            self.state = "pending" if self.preload else "lazy"
+        self.error: Optional[str] = None
+        self.warmup_ms: List[float] = []
+        self.total_seconds: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state in ("disabled", "lazy", "ready")
+
+    def start(self) -> None:
+        """Run the preload in the background so startup (and /health) isn't blocked"""
+        if self.preload and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def run(self) -> None:
+        self.state = "loading"
+        start = time.perf_counter()
+        image = synthetic_image()
+        try:
+            # The first pass also loads the model and the label embeddings
+            for _ in range(self.passes):
+                pass_start = time.perf_counter()
+                await asyncio.gather(*[self.scheduler.submit(image) for _ in range(self.batch_size)])
+                self.warmup_ms.append(round((time.perf_counter() - pass_start) * 1000, 3))
+        except Exception as e:
+            self.state = "failed"
+            self.error = str(e)
+            logger.error(f"Model warmup failed: {str(e)}")
+            return
+        finally:
+            self.total_seconds = round(time.perf_counter() - start, 3)
+        self.state = "ready"
+        logger.info(f"Model warm after {self.total_seconds}s (passes: {self.warmup_ms} ms)")
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "state": self.state,
+            "preload": self.preload,
+            "warmup_passes_ms": self.warmup_ms,
+            "warmup_seconds": self.total_seconds,
+            "error": self.error
+        }
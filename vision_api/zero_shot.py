@@ -0,0 +1,272 @@
+"""
+Batched BiomedCLIP zero-shot classification against MEDICAL_CONDITIONS
+
+Images are encoded either by the torch model (with CLS-attention heatmaps)
+or, with VISION_MODEL_BACKEND=onnx, by the exported ONNX image encoder.
+torch is only imported when the torch model is actually used.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .config import ZERO_SHOT_TOP_K
+from .heatmap import encode_heatmap, gradient_energy_heatmap
+from .inference import decode_upload
+from .loader import get_model, get_model_info, get_image_encoder, MEDICAL_CONDITIONS
+
+if TYPE_CHECKING:
+    import torch
+
+logger = logging.getLogger(__name__)
+
+# Each label's embedding is the normalized mean over these prompts
+PROMPT_TEMPLATES = [
+    "this is a photo of {}",
+    "a medical image showing {}",
+    "an image of {}",
+]
+# CLIP's learned logit scale for BiomedCLIP is ~100
+LOGIT_SCALE = 100.0
+
+_label_matrix: Optional[np.ndarray] = None
+_label_features: Optional["torch.Tensor"] = None
+_label_lock = threading.Lock()
+
+def label_cache_path(cache_dir: str, model_name: str, labels: Sequence[str],
+                     templates: Sequence[str] = PROMPT_TEMPLATES) -> str:
+    """Cache file for one model + label list + template list; any change gets a new file"""
+    digest = hashlib.sha256("\0".join([model_name, *templates, "", *labels]).encode()).hexdigest()[:16]
+    return os.path.join(cache_dir, f"label_features_{digest}.npy")
+
+def encode_labels(model, tokenizer, labels: Sequence[str], templates: Sequence[str] = PROMPT_TEMPLATES) -> np.ndarray:
+    """Run every label prompt through the text tower; returns an L2-normalized (labels, dim) float32 matrix"""
+    import torch
+    device = next(model.parameters()).device
+    prompts = [template.format(label) for label in labels for template in templates]
+    with torch.inference_mode():
+        features = model.encode_text(tokenizer(prompts).to(device)).float()
+        features = features / features.norm(dim=-1, keepdim=True)
+        features = features.reshape(len(labels), len(templates), -1).mean(dim=1)
+        features = features / features.norm(dim=-1, keepdim=True)
+    return features.cpu().numpy()
+
+def load_label_features(model, tokenizer, model_name: str, cache_dir: str,
+                        labels: Sequence[str] = MEDICAL_CONDITIONS) -> np.ndarray:
+    """
+    Label embedding matrix from the on-disk cache, encoding and saving it on a miss
+
+    Args:
+        model: Loaded CLIP model
+        tokenizer: Its tokenizer
+        model_name: Model identifier, part of the cache key
+        cache_dir: Directory holding the cached matrices
+        labels: Label list, part of the cache key
+
+    Returns:
+        Normalized float32 matrix with one row per label
+    """
+    path = label_cache_path(cache_dir, model_name, labels)
+    features = read_label_cache(path, len(labels))
+    if features is not None:
+        return features
+
+    features = encode_labels(model, tokenizer, labels)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, features)
+    os.replace(tmp_path, path)
+    logger.info(f"Encoded {len(labels)} labels x {len(PROMPT_TEMPLATES)} prompts, cached at {path}")
+    return features
+
+def read_label_cache(path: str, count: int) -> Optional[np.ndarray]:
+    """Cached label matrix with `count` rows, or None if missing or unusable"""
+    if not os.path.exists(path):
+        return None
+    try:
+        features = np.load(path)
+        if features.ndim == 2 and features.shape[0] == count:
+            logger.info(f"Loaded label embeddings from {path}")
+            return features
+        logger.warning(f"Ignoring label embedding cache {path} with shape {features.shape}")
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable label embedding cache {path}: {e}")
+    return None
+
+def get_label_matrix() -> np.ndarray:
+    """
+    Label embedding matrix as numpy, loaded once per process
+
+    A cache hit needs neither the model nor torch; only a miss loads the
+    torch model to run the text tower.
+    """
+    global _label_matrix
+    with _label_lock:
+        if _label_matrix is None:
+            info = get_model_info()
+            # Quantized text towers give slightly different embeddings, so they get their own cache
+            model_key = f"{info['model_name']}|{info['quantization']}"
+            features = read_label_cache(label_cache_path(info["cache_dir"], model_key, MEDICAL_CONDITIONS), len(MEDICAL_CONDITIONS))
+            if features is None:
+                model, _, tokenizer = get_model()
+                features = load_label_features(model, tokenizer, model_key, info["cache_dir"])
+            _label_matrix = features
+        return _label_matrix
+
+def get_label_features() -> "torch.Tensor":
+    """Label embedding matrix on the torch model's device"""
+    global _label_features
+    if _label_features is None:
+        import torch
+        model, _, _ = get_model()
+        _label_features = torch.from_numpy(get_label_matrix()).to(next(model.parameters()).device)
+    return _label_features
+
+def zero_shot_signature(top_k: int = ZERO_SHOT_TOP_K) -> str:
+    """Identity of the zero-shot settings, for result cache keys"""
+    labels = hashlib.sha256("\0".join([*PROMPT_TEMPLATES, "", *MEDICAL_CONDITIONS]).encode()).hexdigest()[:12]
+    info = get_model_info()
+    return f"{info['model_name']}|{info['backend']}|{info['quantization']}|top{top_k}|{labels}"
+
+def last_attention_block(model) -> Tuple[Optional["torch.nn.Module"], str, int]:
+    """
+    (attention module, kind, prefix tokens) of the image tower's last block
+
+    BiomedCLIP's tower is a timm ViT ('timm'); open_clip's own ViTs use
+    nn.MultiheadAttention ('mha'). Other towers have no usable attention.
+    """
+    visual = model.visual
+    trunk = getattr(visual, "trunk", None)
+    if trunk is not None and hasattr(trunk, "blocks"):
+        return trunk.blocks[-1].attn, "timm", getattr(trunk, "num_prefix_tokens", 1)
+    transformer = getattr(visual, "transformer", None)
+    if transformer is not None and hasattr(transformer, "resblocks"):
+        return transformer.resblocks[-1].attn, "mha", 1
+    return None, "", 0
+
+def cls_attention(attention: "torch.nn.Module", kind: str, x: "torch.Tensor", prefix: int) -> "torch.Tensor":
+    """Head-averaged attention of the CLS token to each patch, (batch, patches), recomputed from the block input"""
+    import torch
+    if kind == "mha" and not attention.batch_first:
+        x = x.transpose(0, 1)
+    batch, tokens, dim = x.shape
+    heads = attention.num_heads
+    if kind == "timm":
+        qkv = attention.qkv(x)
+    else:
+        qkv = torch.nn.functional.linear(x, attention.in_proj_weight, attention.in_proj_bias)
+    q, k, _ = qkv.reshape(batch, tokens, 3, heads, dim // heads).permute(2, 0, 3, 1, 4)
+    if kind == "timm":
+        q, k = attention.q_norm(q), attention.k_norm(k)
+    # Only the CLS query row is needed: (batch, heads, 1, tokens)
+    weights = ((q[:, :, :1] @ k.transpose(-2, -1)) * (dim // heads) ** -0.5).softmax(dim=-1)
+    return weights.mean(dim=1)[:, 0, prefix:]
+
+def attention_grids(cls: "torch.Tensor") -> List[Optional[np.ndarray]]:
+    """Reshape per-image patch attention to square grids (None if the patches are not square)"""
+    patches = cls.shape[-1]
+    side = int(round(patches ** 0.5))
+    if side * side != patches:
+        return [None] * cls.shape[0]
+    return list(cls.float().cpu().numpy().reshape(-1, side, side))
+
+def decode_batch(images: List[bytes], preprocess) -> Tuple[List[Union[Dict[str, Any], Exception]], List[Any], List[int], List[Any]]:
+    """
+    Decode and preprocess each upload
+
+    Returns:
+        (results with a ValueError at each undecodable position, preprocessed
+        inputs, their positions, the decoded images)
+    """
+    results: List[Union[Dict[str, Any], Exception]] = [None] * len(images)
+    inputs, positions, decoded = [], [], []
+    for position, image_data in enumerate(images):
+        try:
+            image, _, _ = decode_upload(image_data, "")
+            inputs.append(preprocess(image))
+            positions.append(position)
+            decoded.append(image)
+        except Exception as e:
+            results[position] = ValueError(f"Failed to load image: {str(e)}")
+    return results, inputs, positions, decoded
+
+def prediction(batch_size: int, scores: Sequence[float], labels: Sequence[int], heatmap: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "model": get_model_info()["model_name"],
+        "batch_size": batch_size,
+        "top_predictions": [
+            {"condition": MEDICAL_CONDITIONS[label], "confidence": round(float(score), 4)}
+            for score, label in zip(scores, labels)
+        ],
+        "heatmap": heatmap
+    }
+
+def classify_batch(images: List[bytes], top_k: int = ZERO_SHOT_TOP_K) -> List[Union[Dict[str, Any], Exception]]:
+    """
+    Zero-shot classify a batch of encoded images in one forward pass
+
+    Args:
+        images: Raw image file contents
+        top_k: Number of labels returned per image
+
+    Returns:
+        One result per input, in order; an image that cannot be decoded
+        yields its exception instead, without failing the rest of the batch.
+        Each result carries a 'heatmap': the last block's CLS attention,
+        captured during the same forward pass (torch backend), or the
+        image's gradient energy (ONNX backend, which has no attention output).
+    """
+    if get_model_info()["backend"] == "onnx":
+        return classify_batch_onnx(images, top_k)
+    return classify_batch_torch(images, top_k)
+
+def classify_batch_torch(images: List[bytes], top_k: int) -> List[Union[Dict[str, Any], Exception]]:
+    import torch
+    model, preprocess, _ = get_model()
+    label_features = get_label_features()
+    device = label_features.device
+
+    results, tensors, positions, _ = decode_batch(images, preprocess)
+    if tensors:
+        attention, kind, prefix = last_attention_block(model)
+        captured = []
+        hook = attention.register_forward_pre_hook(lambda module, args: captured.append(args[0])) if attention is not None else None
+        try:
+            with torch.inference_mode():
+                features = model.encode_image(torch.stack(tensors).to(device)).float()
+                features = features / features.norm(dim=-1, keepdim=True)
+                probs = (LOGIT_SCALE * features @ label_features.T).softmax(dim=-1)
+                top = probs.topk(min(top_k, probs.shape[-1]), dim=-1)
+                grids = attention_grids(cls_attention(attention, kind, captured[-1], prefix)) if captured else [None] * len(tensors)
+        finally:
+            if hook is not None:
+                hook.remove()
+
+        for row, position in enumerate(positions):
+            heatmap = encode_heatmap(grids[row], "attention") if grids[row] is not None else None
+            results[position] = prediction(len(tensors), top.values[row].tolist(), top.indices[row].tolist(), heatmap)
+    return results
+
+def classify_batch_onnx(images: List[bytes], top_k: int) -> List[Union[Dict[str, Any], Exception]]:
+    encoder = get_image_encoder()
+    label_features = get_label_matrix()
+
+    results, arrays, positions, decoded = decode_batch(images, encoder.preprocess)
+    if arrays:
+        features = encoder.encode(np.stack(arrays))
+        logits = LOGIT_SCALE * features @ label_features.T
+        logits -= logits.max(axis=-1, keepdims=True)
+        probs = np.exp(logits)
+        probs /= probs.sum(axis=-1, keepdims=True)
+        k = min(top_k, probs.shape[-1])
+        top = np.argsort(-probs, axis=-1, kind="stable")[:, :k]
+
+        for row, position in enumerate(positions):
+            labels = top[row].tolist()
+            results[position] = prediction(len(arrays), probs[row, labels].tolist(), labels, gradient_energy_heatmap(decoded[row]))
+    return results